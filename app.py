@@ -4,8 +4,8 @@ import json
 import networkx as nx
 from pyvis.network import Network
 import streamlit.components.v1 as components
-import os
-import base64
+import hashlib
+import time
 
 # Page Config
 st.set_page_config(
@@ -76,13 +76,18 @@ with st.sidebar:
     st.markdown("---")
     
     st.subheader("Visualization Settings")
-    show_physics = st.toggle("Enable Physics", value=True)
+    show_physics = st.toggle("Enable Physics", value=False, help="When off, the graph is drawn at the positions computed by the server.")
     show_labels = st.toggle("Show Node Labels", value=True)
     layout_type = st.selectbox("Layout Algorithm", ["Barnes Hut", "Force Atlas 2 Based", "Repulsion", "Hierarchical (Mind Map)"])
     
     st.markdown("---")
     st.subheader("Filters")
     max_edges = st.slider("Max Edges to Display", min_value=10, max_value=500, value=100)
+    max_nodes = st.slider("Level of Detail (max nodes)", min_value=10, max_value=500, value=150,
+                          help="Larger graphs are shown as communities of related entities; zoom into one below.")
+    focus_query = st.text_input("Find Entity", placeholder="Name or alias, e.g. harry pot",
+                                help="Search the graph, then focus the view on a match and its neighbours.")
+    focus_hops = st.slider("Focus Radius (hops)", min_value=1, max_value=3, value=1)
     
     st.markdown("---")
     st.markdown("Powered by **Google Gemini** & **ADK**")
@@ -105,83 +110,55 @@ if "graph_data" not in st.session_state:
     st.session_state.graph_data = None
 if "summary" not in st.session_state:
     st.session_state.summary = None
-if "image_base64" not in st.session_state:
-    st.session_state.image_base64 = None
+if "image" not in st.session_state:
+    st.session_state.image = None
+if "graph_key" not in st.session_state:
+    st.session_state.graph_key = None
+if "graph_id" not in st.session_state:
+    st.session_state.graph_id = None
 
-# Logic
-if generate_btn and topic:
-    with st.spinner("🤖 Agents are researching and building the graph..."):
-        try:
-            # Reset session state before new generation
-            st.session_state.graph_data = None
-            st.session_state.summary = None
-            st.session_state.image_base64 = None
-            
-            response = requests.post(
-                "http://localhost:8000/generate",
-                json={"topic": topic},
-                timeout=300 # 5 min timeout
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                st.session_state.graph_data = data.get("graph_state")
-                st.session_state.summary = data.get("summary")
-                st.session_state.image_base64 = data.get("image_base64")
-                st.success("Graph generated successfully!")
-            else:
-                st.error(f"Error: {response.text}")
-                
-        except Exception as e:
-            st.error(f"Connection Error: {str(e)}")
-
-# Display Results
-if st.session_state.graph_data:
-    st.markdown("---")
-    
-    # Stats Row
-    nodes = st.session_state.graph_data["nodes"]
-    edges = st.session_state.graph_data["edges"]
-    
-    # Calculate most connected node
-    if nodes and edges:
-        node_degrees = {}
-        for edge in edges:
-            node_degrees[edge["source"]] = node_degrees.get(edge["source"], 0) + 1
-            node_degrees[edge["target"]] = node_degrees.get(edge["target"], 0) + 1
-        most_connected = max(node_degrees, key=node_degrees.get) if node_degrees else "N/A"
-    else:
-        most_connected = "N/A"
-
-    c1, c2, c3 = st.columns(3)
-    with c1:
-        st.markdown(f"""<div class="metric-card"><div class="metric-value">{len(nodes)}</div><div class="metric-label">Nodes</div></div>""", unsafe_allow_html=True)
-    with c2:
-        st.markdown(f"""<div class="metric-card"><div class="metric-value">{len(edges)}</div><div class="metric-label">Edges</div></div>""", unsafe_allow_html=True)
-    with c3:
-        st.markdown(f"""<div class="metric-card"><div class="metric-value">{most_connected}</div><div class="metric-label">Top Entity</div></div>""", unsafe_allow_html=True)
-
-    st.markdown("### 🕸️ Interactive Graph")
-    
-    # PyVis Visualization
-    # Create a subset of edges based on slider
-    display_edges = edges[:max_edges]
-    
+def build_graph_html(nodes, edges, positions, importance, layout_type, show_physics, show_labels, communities=None):
+    """
+    Builds the PyVis network for the given nodes/edges and returns it as an HTML string.
+    `communities` maps super-node IDs to their summary entries (label, member count).
+    """
     net = Network(height="700px", width="100%", bgcolor="#1e1e24", font_color="white")
+    importance = importance or {}
+    communities = communities or {}
+    largest = max((c["size"] for c in communities.values()), default=1)
+    
+    # Server-side coordinates for the selected layout (unit spacing, scaled to pixels).
+    # With them we can skip browser physics entirely; without them physics has to place the nodes.
+    layout_key = "hierarchical" if layout_type == "Hierarchical (Mind Map)" else "force"
+    coords = (positions or {}).get(layout_key)
+    physics = show_physics or not coords
     
     # Add nodes with improved styling
     for node in nodes:
+        position = {}
+        if coords and node in coords:
+            x, y = coords[node]
+            position = {"x": x * 150, "y": -y * 150}
+        if node in communities:
+            # Super-nodes: area grows with the number of entities they stand for
+            label = communities[node]["label"]
+            size = 15 + 45 * (communities[node]["size"] / largest) ** 0.5
+        else:
+            label = node
+            # Scale by server-side importance when we have it
+            size = 15 + 30 * importance[node]["score"] if node in importance else 25
         net.add_node(
             node, 
-            label=node if show_labels else " ", 
-            title=node, 
+            label=label if show_labels else " ", 
+            title=label, 
             color="#8b5cf6",
-            size=25,
-            font={'size': 20, 'color': 'white'}
+            size=size,
+            font={'size': 20, 'color': 'white'},
+            **position
         )
         
     # Add edges with improved styling
-    for edge in display_edges:
+    for edge in edges:
         net.add_edge(
             edge["source"], 
             edge["target"], 
@@ -195,13 +172,16 @@ if st.session_state.graph_data:
     # Physics options
     if layout_type == "Barnes Hut":
         net.barnes_hut(gravity=-8000, central_gravity=0.3, spring_length=250, spring_strength=0.001, damping=0.09, overlap=0)
-        net.toggle_physics(show_physics)
+        net.toggle_physics(physics)
     elif layout_type == "Force Atlas 2 Based":
         net.force_atlas_2based(gravity=-50, central_gravity=0.01, spring_length=100, spring_strength=0.08, damping=0.4, overlap=0)
-        net.toggle_physics(show_physics)
+        net.toggle_physics(physics)
     elif layout_type == "Repulsion":
         net.repulsion(node_distance=200, central_gravity=0.2, spring_length=200, spring_strength=0.05, damping=0.09)
-        net.toggle_physics(show_physics)
+        net.toggle_physics(physics)
+    elif layout_type == "Hierarchical (Mind Map)" and coords:
+        # The server already placed nodes level by level
+        net.toggle_physics(physics)
     elif layout_type == "Hierarchical (Mind Map)":
         options = {
             "layout": {
@@ -218,7 +198,7 @@ if st.session_state.graph_data:
                 }
             },
             "physics": {
-                "enabled": show_physics,
+                "enabled": physics,
                 "hierarchicalRepulsion": {
                     "nodeDistance": 150,
                     "centralGravity": 0.0,
@@ -232,44 +212,312 @@ if st.session_state.graph_data:
         var options = {json.dumps(options)}
         """)
     
-    # Save and display
+    # Generate in memory: no temp file, so concurrent sessions cannot clobber each other
+    return net.generate_html(notebook=False)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_graph_html(graph_key, max_edges, layout_type, show_physics, show_labels,
+                      _nodes, _edges, _positions, _importance, _communities):
+    """
+    HTML for a finished graph, cached by graph hash plus display options.
+    Arguments starting with "_" are not hashed by Streamlit; `graph_key` stands in for them.
+    """
+    return build_graph_html(_nodes, _edges, _positions, _importance, layout_type, show_physics, show_labels,
+                            _communities)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def fetch_summary(graph_id, max_nodes, max_edges, community=None):
+    """Community-level view of a big graph from the API, bounded by `max_nodes`."""
+    params = {"max_nodes": max_nodes, "max_edges": max_edges}
+    if community:
+        params["community"] = community
+    response = requests.get(f"http://localhost:8000/graphs/{graph_id}/summary", params=params, timeout=60)
+    response.raise_for_status()
+    return response.json()
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def fetch_layout(graph_id, mode):
+    """Server-side coordinates for one layout mode; the API computes them on the first request."""
+    response = requests.get(f"http://localhost:8000/graphs/{graph_id}/layout", params={"mode": mode}, timeout=120)
+    response.raise_for_status()
+    return response.json()["positions"]
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def fetch_importance(graph_id):
+    """Node importance and the edges ranked by it, most important first."""
+    response = requests.get(f"http://localhost:8000/graphs/{graph_id}/importance", timeout=120)
+    response.raise_for_status()
+    return response.json()
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def fetch_search(graph_id, query):
+    """Entities matching `query` by name or alias, ranked by the API's search index."""
+    response = requests.get(f"http://localhost:8000/graphs/{graph_id}/search",
+                            params={"q": query, "kind": "entity", "limit": 20}, timeout=10)
+    response.raise_for_status()
+    return response.json()["results"]
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def fetch_neighborhood(graph_id, node, hops, max_nodes, max_edges):
+    """An entity and everything within `hops` of it, from the API."""
+    response = requests.get(f"http://localhost:8000/graphs/{graph_id}/subgraph",
+                            params={"node": node, "hops": hops, "max_nodes": max_nodes, "max_edges": max_edges},
+                            timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+# Download formats offered by /graphs/{id}/export
+EXPORT_FORMATS = {
+    "json": "JSON",
+    "compact": "Compact JSON (dictionary-encoded)",
+    "ndjson": "NDJSON (one record per line)",
+    "graphml": "GraphML (Gephi, Cytoscape, yEd)",
+    "columnar": "Columnar (numpy .npz)",
+}
+EXPORT_EXTENSIONS = {"json": "json", "compact": "json", "ndjson": "ndjson", "graphml": "graphml", "columnar": "npz"}
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def fetch_export(graph_id, export_format):
+    """The graph exported by the API in `export_format`, as (bytes, media type)."""
+    response = requests.get(f"http://localhost:8000/graphs/{graph_id}/export",
+                            params={"format": export_format}, timeout=120)
+    response.raise_for_status()
+    return response.content, response.headers["content-type"]
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def fetch_artifact(url):
+    """An artifact's bytes; artifacts are immutable, so the URL is the whole cache key."""
+    response = requests.get(f"http://localhost:8000{url}", timeout=30)
+    response.raise_for_status()
+    return response.content
+
+def render_graph(nodes, edges, positions=None, importance=None, graph_key=None, communities=None):
+    """Embeds the graph in the page. With a `graph_key` the HTML is reused across reruns."""
     try:
-        path = "tmp_graph.html"
-        net.save_graph(path)
-        with open(path, 'r', encoding='utf-8') as f:
-            html_string = f.read()
+        if graph_key is None:
+            html_string = build_graph_html(nodes, edges, positions, importance, layout_type, show_physics, show_labels,
+                                           communities)
+        else:
+            html_string = cached_graph_html(graph_key, len(edges), layout_type, show_physics, show_labels,
+                                            nodes, edges, positions, importance, communities)
         # Use a larger height and scrolling to ensure visibility
         components.html(html_string, height=700, scrolling=False)
-        os.remove(path)
     except Exception as e:
         st.error(f"Error rendering graph: {e}")
 
+
+# Logic
+if generate_btn and topic:
+    with st.spinner("🤖 Agents are researching and building the graph..."):
+        try:
+            # Reset session state before new generation
+            st.session_state.graph_data = None
+            st.session_state.summary = None
+            st.session_state.image = None
+            st.session_state.graph_id = None
+            
+            # Stream the pipeline's events and draw the graph as triplets land
+            status = st.empty()
+            live_graph = st.empty()
+            live_nodes, live_edges = {}, []  # dict keeps insertion order with O(1) membership
+            last_render = 0.0
+            
+            with requests.post(
+                "http://localhost:8000/generate/stream",
+                json={"topic": topic},
+                stream=True,
+                timeout=(10, 300) # connect timeout, then max 5 min between events
+            ) as response:
+                if response.status_code != 200:
+                    st.error(f"Error: {response.text}")
+                else:
+                    event_type = None
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line.startswith("event:"):
+                            event_type = line[len("event:"):].strip()
+                            continue
+                        if not line.startswith("data:"):
+                            continue
+                        data = json.loads(line[len("data:"):])
+                    
+                        if event_type == "text":
+                            status.info(f"**{data['agent']}**: {data['text'][:300]}")
+                        elif event_type == "triplet":
+                            live_nodes.setdefault(data["subject"])
+                            live_nodes.setdefault(data["object"])
+                            live_edges.append({"source": data["subject"], "target": data["object"], "relation": data["predicate"]})
+                            # Re-render at most twice per second so a burst of triplets stays cheap
+                            if time.time() - last_render > 0.5:
+                                with live_graph.container():
+                                    render_graph(list(live_nodes), live_edges[:max_edges])
+                                last_render = time.time()
+                        elif event_type == "artifact":
+                            status.info("🎨 Visualization saved, finishing up...")
+                        elif event_type == "done":
+                            result = data["result"]
+                            st.session_state.graph_data = result.get("graph_state")
+                            # Hash once per result; it keys the cached HTML on every rerun after this
+                            st.session_state.graph_key = hashlib.sha256(
+                                json.dumps(st.session_state.graph_data, sort_keys=True).encode("utf-8")
+                            ).hexdigest()
+                            st.session_state.graph_id = result.get("graph_id")
+                            st.session_state.summary = result.get("summary")
+                            st.session_state.image = result.get("image")
+                            ttfn = result.get("stats", {}).get("time_to_first_node_s")
+                            status.empty()
+                            live_graph.empty()
+                            st.success("Graph generated successfully!" + (f" First node after {ttfn:.1f}s." if ttfn else ""))
+                        elif event_type == "error":
+                            st.error(f"Error: {data['detail']}")
+                
+        except Exception as e:
+            st.error(f"Connection Error: {str(e)}")
+
+# Display Results
+if st.session_state.graph_data:
+    st.markdown("---")
+    
+    # Stats Row
+    nodes = st.session_state.graph_data["nodes"]
+    edges = st.session_state.graph_data["edges"]
+    
+    # Importance and layouts come from the API on demand rather than with every run
+    importance = st.session_state.graph_data.get("node_importance")
+    positions = st.session_state.graph_data.get("positions")
+    if st.session_state.graph_id:
+        try:
+            ranked = fetch_importance(st.session_state.graph_id)
+            importance, edges = ranked["nodes"], ranked["edges"]
+            layout_mode = "hierarchical" if layout_type == "Hierarchical (Mind Map)" else "force"
+            positions = {layout_mode: fetch_layout(st.session_state.graph_id, layout_mode)}
+        except requests.RequestException as e:
+            st.warning(f"Server-side ranking and layout unavailable ({e}); placing nodes with browser physics.")
+    
+    # Most important node, ranked server-side (fall back to degree for older results)
+    if importance:
+        most_connected = max(importance, key=lambda node: importance[node]["score"])
+    elif nodes and edges:
+        node_degrees = {}
+        for edge in edges:
+            node_degrees[edge["source"]] = node_degrees.get(edge["source"], 0) + 1
+            node_degrees[edge["target"]] = node_degrees.get(edge["target"], 0) + 1
+        most_connected = max(node_degrees, key=node_degrees.get) if node_degrees else "N/A"
+    else:
+        most_connected = "N/A"
+
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        st.markdown(f"""<div class="metric-card"><div class="metric-value">{len(nodes)}</div><div class="metric-label">Nodes</div></div>""", unsafe_allow_html=True)
+    with c2:
+        st.markdown(f"""<div class="metric-card"><div class="metric-value">{len(edges)}</div><div class="metric-label">Edges</div></div>""", unsafe_allow_html=True)
+    with c3:
+        st.markdown(f"""<div class="metric-card"><div class="metric-value">{most_connected}</div><div class="metric-label">Top Entity</div></div>""", unsafe_allow_html=True)
+
+    st.markdown("### 🕸️ Interactive Graph")
+    
+    # Focus on an entity found through the search index
+    focus = None
+    if focus_query and st.session_state.graph_id:
+        try:
+            matches = fetch_search(st.session_state.graph_id, focus_query)
+            if matches:
+                labels = {match["name"]: match["name"] + (f" (as \"{match['matched']}\")" if "matched" in match else "")
+                          for match in matches}
+                focus_node = st.selectbox("Focus on", [None, *labels],
+                                          format_func=lambda n: "Whole graph" if n is None else labels[n])
+                if focus_node:
+                    focus = fetch_neighborhood(st.session_state.graph_id, focus_node, focus_hops, max_nodes, max_edges)
+            else:
+                st.caption(f"No entity matches \"{focus_query}\".")
+        except requests.RequestException as e:
+            st.warning(f"Search unavailable ({e}); showing the whole graph.")
+    
+    # PyVis Visualization
+    summary = None
+    if focus is None and len(nodes) > max_nodes and st.session_state.graph_id:
+        # Too many entities to draw: show communities, with a picker to zoom into one
+        try:
+            overview = fetch_summary(st.session_state.graph_id, max_nodes, max_edges)
+            zoomable = {node["id"]: node["label"] for node in overview["nodes"] if node["id"] != "other"
+                        and node["size"] > 1}
+            focus = st.selectbox("Zoom into community", [None, *zoomable],
+                                 format_func=lambda c: "Whole graph" if c is None else zoomable[c])
+            summary = fetch_summary(st.session_state.graph_id, max_nodes, max_edges, focus) if focus else overview
+            st.caption(f"Showing {len(summary['nodes'])} communities at level {summary['level']}"
+                       + (" (smallest communities merged into 'Other')" if summary["truncated"] else ""))
+        except requests.RequestException as e:
+            st.warning(f"Community view unavailable ({e}); showing the top edges instead.")
+    
+    if focus:
+        render_graph([node["id"] for node in focus["nodes"]], focus["edges"],
+                     positions, importance,
+                     graph_key=f"{st.session_state.graph_key}:focus:{focus['center']}:{focus_hops}:{max_nodes}")
+        st.caption(f"Showing {len(focus['nodes'])} entities within {focus_hops} hop(s) of {focus['center']}"
+                   + (" (cut off at the node and edge limits)" if focus["truncated"] else ""))
+    elif summary:
+        communities = {node["id"]: node for node in summary["nodes"]}
+        render_graph(list(communities), summary["edges"], importance=None,
+                     graph_key=f"{st.session_state.graph_key}:{max_nodes}:{summary.get('community')}",
+                     communities=communities)
+    else:
+        # Edges arrive ranked by importance, so the slider keeps the top k
+        display_edges = edges[:max_edges]
+        display_nodes = nodes
+        if len(display_edges) < len(edges):
+            # Only draw nodes the kept edges touch
+            kept = {edge["source"] for edge in display_edges} | {edge["target"] for edge in display_edges}
+            display_nodes = [node for node in nodes if node in kept]
+        render_graph(display_nodes, display_edges, positions,
+                     importance, graph_key=st.session_state.graph_key)
+
     # Downloads
     st.markdown("### 📥 Downloads")
     d1, d2 = st.columns(2)
     
     with d1:
-        # Download JSON
-        json_str = json.dumps(st.session_state.graph_data, indent=2)
+        # Download the graph; the backend exports it in the chosen format
+        export_format = st.selectbox(
+            "Export format", EXPORT_FORMATS, format_func=lambda name: EXPORT_FORMATS[name],
+            label_visibility="collapsed",
+        )
+        export_data = None
+        if st.session_state.get("graph_id"):
+            try:
+                export_data, mime = fetch_export(st.session_state.graph_id, export_format)
+            except requests.RequestException as e:
+                # Evicted from the server or the server restarted; the JSON we hold is still good
+                st.warning(f"Export from the server unavailable ({e}); offering the JSON held by this page.")
+        if export_data is None:
+            # Compact separators; indent=2 repeated the whole layout for every edge record
+            export_format = "json"
+            export_data = json.dumps(st.session_state.graph_data, ensure_ascii=False, separators=(",", ":"))
+            mime = "application/json"
         st.download_button(
-            label="Download Graph JSON",
-            data=json_str,
-            file_name="knowledge_graph.json",
-            mime="application/json",
+            label="Download Graph",
+            data=export_data,
+            file_name=f"knowledge_graph.{EXPORT_EXTENSIONS[export_format]}",
+            mime=mime,
             use_container_width=True
         )
         
     with d2:
         # Download PNG (from backend)
-        if st.session_state.image_base64:
-            img_bytes = base64.b64decode(st.session_state.image_base64)
-            st.download_button(
-                label="Download Graph PNG",
-                data=img_bytes,
-                file_name="knowledge_graph.png",
-                mime="image/png",
-                use_container_width=True
-            )
+        # The API returns a reference; fetch the bytes (browser-cacheable, ETag'd) on demand
+        if st.session_state.image:
+            try:
+                img_bytes = fetch_artifact(st.session_state.image["url"])
+            except requests.RequestException as e:
+                # Evicted (404) or the server is gone; never offer an error body as a PNG
+                img_bytes = None
+                st.warning(f"Graph PNG unavailable ({e}).")
+            if img_bytes is not None:
+                st.download_button(
+                    label="Download Graph PNG",
+                    data=img_bytes,
+                    file_name="knowledge_graph.png",
+                    mime="image/png",
+                    use_container_width=True
+                )
 
     # Summary
     with st.expander("📝 Agent Summary", expanded=False):
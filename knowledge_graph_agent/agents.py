@@ -1,21 +1,20 @@
 from google.adk.agents import LlmAgent
-from google.adk.models.google_llm import Gemini
+from knowledge_graph_agent.ratelimit import RateLimitedGemini
 from google.adk.code_executors import BuiltInCodeExecutor
 from google.genai import types
-from knowledge_graph_agent.graph_tools import add_triplet, get_graph_state, save_graph_image
+from knowledge_graph_agent.graph_tools import add_triplet, add_triplets, get_graph_state, save_graph_image
 
-# Retry config for robustness
-retry_config = types.HttpRetryOptions(
-    attempts=5,
-    exp_base=7,
-    initial_delay=1,
-    http_status_codes=[429, 500, 503, 504]
-)
+# Model shared by every agent in the pipeline
+MODEL_NAME = "gemini-2.5-flash-lite"
+
+# The client makes a single attempt: retries go through the process-wide
+# limiter in ratelimit.py, which coordinates backoff across every run.
+retry_config = types.HttpRetryOptions(attempts=1)
 
 # 1. Research Agent: The Librarian
 research_agent = LlmAgent(
     name="ResearchAgent",
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    model=RateLimitedGemini(model=MODEL_NAME, retry_options=retry_config),
     instruction="""
     You are an expert researcher. Your goal is to provide a comprehensive but concise summary of the user's topic.
     Focus on identifying key entities and their relationships.
@@ -26,26 +25,32 @@ research_agent = LlmAgent(
 # 2. Ontology Agent: The Structurer
 ontology_agent = LlmAgent(
     name="OntologyAgent",
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    model=RateLimitedGemini(model=MODEL_NAME, retry_options=retry_config),
     instruction="""
     You are a Knowledge Graph Ontology expert.
     Your task is to read the provided research text and extract structured knowledge triplets.
     
-    Use the `add_triplet` tool to save every important relationship you find.
-    - Subject: The source entity
-    - Predicate: The relationship (keep it short, e.g., "is_a", "located_in", "authored_by")
-    - Object: The target entity
+    Use the `add_triplets` tool to save every important relationship you find.
+    Send all of your triplets together in as few `add_triplets` calls as possible
+    (ideally one) instead of saving them one at a time. Each triplet has:
+    - subject: The source entity
+    - predicate: The relationship (keep it short, e.g., "is_a", "located_in", "authored_by")
+    - object: The target entity
+    Only fall back to `add_triplet` for a single late addition.
     
     Extract as many meaningful triplets as possible to build a rich graph.
-    Finally, call `get_graph_state` and **include the full JSON output in your final response** so the next agent can use it.
+    Call `get_graph_state` to review what is stored. On later calls, pass the `version` you got
+    back as `since_version` so you only receive what changed.
+    Do NOT paste the graph JSON into your response: the next agent reads the graph directly.
+    Finish with a one-line summary of the graph (number of nodes and edges, and its version).
     """,
-    tools=[add_triplet, get_graph_state]
+    tools=[add_triplets, add_triplet, get_graph_state]
 )
 
 # 3. Visualization Agent: The Artist (Code Execution)
 viz_agent = LlmAgent(
     name="VisualizationAgent",
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    model=RateLimitedGemini(model=MODEL_NAME, retry_options=retry_config),
     instruction="""
     You are a Data Visualization expert.
     Your goal is to visualize the Knowledge Graph that has been built.
@@ -55,3 +60,31 @@ viz_agent = LlmAgent(
     """,
     tools=[save_graph_image]
 )
+
+# 4. Topic Planner (fan-out mode): splits a broad topic into sub-topics researched in parallel
+planner_agent = LlmAgent(
+    name="TopicPlannerAgent",
+    model=RateLimitedGemini(model=MODEL_NAME, retry_options=retry_config),
+    instruction="""
+    You plan research on the user's topic. Split it into distinct, non-overlapping sub-topics
+    that together cover the topic's key entities and relationships.
+    Reply with ONLY a JSON array of short sub-topic strings, e.g. ["...", "..."].
+    """,
+)
+
+# 5. Chunk Ontology Agent (fan-out mode): one copy per text chunk, all writing into the same graph
+chunk_ontology_agent = LlmAgent(
+    name="ChunkOntologyAgent",
+    model=RateLimitedGemini(model=MODEL_NAME, retry_options=retry_config),
+    instruction="""
+    You are a Knowledge Graph Ontology expert.
+    Extract structured knowledge triplets from the research text below, and only from it.
+    Save them with a single `add_triplets` call. Each triplet has:
+    - subject: The source entity
+    - predicate: The relationship (keep it short, e.g., "is_a", "located_in", "authored_by")
+    - object: The target entity
+    Use the entities' full, common names so they match those extracted from other chunks.
+    Finish with a one-line note saying how many triplets you saved.
+    """,
+    tools=[add_triplets, add_triplet]
+)
@@ -1,5 +1,69 @@
-from google.adk.agents import SequentialAgent
-from .agents import research_agent, ontology_agent, viz_agent
+import asyncio
+import json
+import os
+import re
+from typing import AsyncGenerator, Dict, List
+
+from google.adk.agents import BaseAgent, ParallelAgent, SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.genai import types
+from .checkpoint import find_checkpoint
+from .agents import research_agent, ontology_agent, viz_agent, planner_agent, chunk_ontology_agent
+
+# Bump whenever prompts, tools or the agent lineup change,
+# so cached results from an older pipeline are not served.
+PIPELINE_VERSION = "5"
+
+
+def _final_text(event: Event) -> str:
+    if event.partial or not event.is_final_response() or not event.content or not event.content.parts:
+        return ""
+    return "".join(part.text or "" for part in event.content.parts)
+
+
+def _replayed(ctx: InvocationContext, author: str, text: str) -> Event:
+    """A finished stage's saved output, standing in for running it again."""
+    return Event(invocation_id=ctx.invocation_id, author=author, branch=ctx.branch,
+                 content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+async def _run_stage(agent: BaseAgent, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+    """
+    Runs one stage of a checkpointed run (see checkpoint.py). If the run's
+    checkpoint has the stage's output, that is replayed as a single event and
+    the agent is skipped; otherwise the agent runs and its final text is saved
+    once it finishes.
+    """
+    checkpoint = find_checkpoint(ctx.session.state.get("checkpoint"))
+    saved = checkpoint.output(agent.name) if checkpoint else None
+    if saved is not None:
+        yield _replayed(ctx, agent.name, saved)
+        return
+    text = ""
+    async for event in agent.run_async(ctx):
+        text = _final_text(event) or text
+        yield event
+    if checkpoint:
+        # fsyncs the journal and the stage file, so off the event loop
+        await asyncio.to_thread(checkpoint.complete, agent.name, text)
+
+
+class CheckpointedSequentialAgent(SequentialAgent):
+    """
+    SequentialAgent whose sub-agents are checkpointed stages: a resumed run
+    skips the ones that finished. The last one always runs, since what it
+    produces (the rendered image) belongs to the run rather than the transcript.
+    """
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        *stages, last = self.sub_agents
+        for sub_agent in stages:
+            async for event in _run_stage(sub_agent, ctx):
+                yield event
+        async for event in last.run_async(ctx):
+            yield event
+
 
 # The Graph Architect
 # A Sequential Agent that orchestrates the entire pipeline.
@@ -7,10 +71,143 @@ from .agents import research_agent, ontology_agent, viz_agent
 # 2. OntologyAgent: Structures it into the graph.
 # 3. VisualizationAgent: Draws the graph.
 
-graph_architect = SequentialAgent(
+graph_architect = CheckpointedSequentialAgent(
     name="GraphArchitect",
     description="A pipeline that researches a topic, builds a knowledge graph, and visualizes it.",
     sub_agents=[research_agent, ontology_agent, viz_agent],
     # We don't strictly need output_keys here because SequentialAgent passes the previous output
     # as part of the prompt history to the next agent automatically.
 )
+
+
+def parse_subtopics(text: str, topic_fallback: str, limit: int) -> List[str]:
+    """Reads the planner's JSON array, tolerating code fences; falls back to the whole topic."""
+    match = re.search(r"\[.*\]", text or "", re.DOTALL)
+    try:
+        items = json.loads(match.group(0)) if match else []
+    except json.JSONDecodeError:
+        items = []
+    subtopics = list(dict.fromkeys(str(item).strip() for item in items if str(item).strip()))
+    return subtopics[:limit] or [topic_fallback]
+
+
+def chunk_text(text: str, chunk_chars: int = 3000) -> List[str]:
+    """Splits text on paragraph boundaries into chunks of roughly `chunk_chars` characters."""
+    chunks, current, size = [], [], 0
+    for paragraph in (p.strip() for p in re.split(r"\n\s*\n", text)):
+        if not paragraph:
+            continue
+        if current and size + len(paragraph) > chunk_chars:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _with_context(instruction: str, heading: str, context: str):
+    # An instruction provider, so the context is passed verbatim rather than
+    # going through ADK's {state} templating.
+    return lambda _ctx: f"{instruction}\n\n{heading}\n{context}"
+
+
+class FanOutArchitect(BaseAgent):
+    """
+    Fan-out version of the pipeline for broad topics.
+
+    1. TopicPlannerAgent splits the topic into up to `max_subtopics` sub-topics.
+    2. One ResearchAgent per sub-topic, run concurrently.
+    3. The combined research is cut into chunks of about `chunk_chars`, and one
+       ChunkOntologyAgent per chunk extracts triplets concurrently. They all
+       write into the run's KnowledgeBase, whose entity index merges the
+       partial graphs and deduplicates entities as triplets arrive.
+    4. VisualizationAgent draws the merged graph.
+
+    Concurrent agents run as ParallelAgents of at most `fan_out` members, so
+    `fan_out` bounds the number of in-flight model calls. Every copy of an
+    agent gets its own branch, so parallel conversations never see each
+    other's history.
+
+    When the run is checkpointed, the planner and every researcher and chunk
+    extractor are stages of their own, so a resumed run only redoes the ones
+    that had not finished.
+    """
+
+    fan_out: int = 4
+    max_subtopics: int = 4
+    chunk_chars: int = 3000
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        topic = ctx.user_content.parts[0].text if ctx.user_content and ctx.user_content.parts else ""
+
+        planner = planner_agent.clone(update={"instruction": _with_context(
+            planner_agent.instruction, "Maximum number of sub-topics:", str(self.max_subtopics))})
+        plan_text = ""
+        async for event in _run_stage(planner, ctx):
+            plan_text = _final_text(event) or plan_text
+            yield event
+        subtopics = parse_subtopics(plan_text, topic, self.max_subtopics)
+
+        researchers = [
+            research_agent.clone(update={
+                "name": f"{research_agent.name}_{i}",
+                "instruction": _with_context(research_agent.instruction,
+                                             "Focus only on this aspect of the user's topic:", subtopic),
+            })
+            for i, subtopic in enumerate(subtopics)
+        ]
+        findings: Dict[str, str] = {}
+        async for event in self._run_parallel("ParallelResearch", researchers, ctx):
+            text = _final_text(event)
+            if text:
+                findings[event.author] = text
+            yield event
+        research = "\n\n".join(findings[agent.name] for agent in researchers if agent.name in findings)
+
+        chunks = chunk_text(research, self.chunk_chars) or [topic]
+        extractors = [
+            chunk_ontology_agent.clone(update={
+                "name": f"{chunk_ontology_agent.name}_{i}",
+                "instruction": _with_context(chunk_ontology_agent.instruction, "Research text:", chunk),
+            })
+            for i, chunk in enumerate(chunks)
+        ]
+        async for event in self._run_parallel("ParallelExtraction", extractors, ctx):
+            yield event
+
+        async for event in viz_agent.clone().run_async(ctx):
+            yield event
+
+    async def _run_parallel(self, name: str, agents: List[BaseAgent],
+                            ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        # Agents that finished in an earlier attempt of this run are replayed, not rerun.
+        checkpoint = find_checkpoint(ctx.session.state.get("checkpoint"))
+        if checkpoint:
+            pending = []
+            for agent in agents:
+                saved = checkpoint.output(agent.name)
+                if saved is None:
+                    pending.append(agent)
+                else:
+                    yield _replayed(ctx, agent.name, saved)
+            agents = pending
+        names = {agent.name for agent in agents}
+        for start in range(0, len(agents), self.fan_out):
+            wave = ParallelAgent(name=f"{name}_{start // self.fan_out}",
+                                 sub_agents=agents[start:start + self.fan_out])
+            async for event in wave.run_async(ctx):
+                yield event
+                # A parallel agent's final response is its last event.
+                text = _final_text(event)
+                if checkpoint and text and event.author in names:
+                    await asyncio.to_thread(checkpoint.complete, event.author, text)
+
+
+fanout_architect = FanOutArchitect(
+    name="FanOutGraphArchitect",
+    description="Researches sub-topics and extracts triplets from text chunks in parallel, then visualizes the graph.",
+    fan_out=int(os.environ.get("KG_FAN_OUT", "4")),
+    max_subtopics=int(os.environ.get("KG_MAX_SUBTOPICS", "4")),
+)
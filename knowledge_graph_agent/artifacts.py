@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+_SUFFIX = ".png"
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for rendered artifacts.
+
+    Each artifact is a file named by its content hash, so identical renders
+    share one file and an ID is a stable cache validator (ETag). The store
+    keeps an in-memory index ordered by age and evicts the oldest artifacts
+    once the total size passes `max_bytes` or an artifact is older than
+    `max_age_seconds`, checked whenever an artifact is registered or looked
+    up. Lookups never scan the directory.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 512 * 1024 * 1024,
+                 max_age_seconds: float = 7 * 24 * 3600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._index: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()  # id -> (created, size)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(root, exist_ok=True)
+        # One scan at startup rebuilds the index from what is already on disk.
+        existing = []
+        for entry in os.scandir(root):
+            if entry.is_file() and entry.name.endswith(_SUFFIX):
+                stat = entry.stat()
+                existing.append((stat.st_mtime, entry.name[:-len(_SUFFIX)], stat.st_size))
+        for created, artifact_id, size in sorted(existing):
+            self._index[artifact_id] = (created, size)
+            self._total_bytes += size
+        self.evict()
+
+    def path(self, artifact_id: str) -> str:
+        """Where the artifact's file lives (or should be written)."""
+        if not artifact_id.isalnum():
+            raise ValueError(f"Invalid artifact id: {artifact_id!r}")
+        return os.path.join(self.root, artifact_id + _SUFFIX)
+
+    def exists(self, artifact_id: str) -> bool:
+        # Age out on lookups too: a quiet server may not register anything for days.
+        self.evict()
+        with self._lock:
+            if artifact_id not in self._index:
+                return False
+        # The index can outlive a file deleted behind our back.
+        if os.path.exists(self.path(artifact_id)):
+            return True
+        self._forget(artifact_id)
+        return False
+
+    def register(self, artifact_id: str):
+        """Records a file just written at `path(artifact_id)` and applies eviction."""
+        size = os.path.getsize(self.path(artifact_id))
+        with self._lock:
+            previous = self._index.pop(artifact_id, None)
+            if previous is not None:
+                self._total_bytes -= previous[1]
+            self._index[artifact_id] = (time.time(), size)
+            self._total_bytes += size
+        self.evict()
+
+    def describe(self, artifact_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The reference returned to clients in place of the artifact's bytes."""
+        if not artifact_id:
+            return None
+        with self._lock:
+            entry = self._index.get(artifact_id)
+        if entry is None:
+            return None
+        return {
+            "id": artifact_id,
+            "url": f"/artifacts/{artifact_id}",
+            "content_type": "image/png",
+            "size": entry[1],
+        }
+
+    def evict(self):
+        cutoff = time.time() - self.max_age_seconds
+        with self._lock:
+            victims = []
+            # Oldest first, until we are under both the size and the age limit.
+            for artifact_id, (created, size) in self._index.items():
+                if created >= cutoff and self._total_bytes <= self.max_bytes:
+                    break
+                victims.append(artifact_id)
+                self._total_bytes -= size
+            for artifact_id in victims:
+                del self._index[artifact_id]
+        for artifact_id in victims:
+            try:
+                os.remove(self.path(artifact_id))
+            except FileNotFoundError:
+                pass
+
+    def _forget(self, artifact_id: str):
+        with self._lock:
+            entry = self._index.pop(artifact_id, None)
+            if entry is not None:
+                self._total_bytes -= entry[1]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"artifacts": len(self._index), "bytes": self._total_bytes, "max_bytes": self.max_bytes}
+
+
+_store: Optional[ArtifactStore] = None
+
+
+def get_artifact_store() -> ArtifactStore:
+    """The process-wide store, created on first use (render workers never need it)."""
+    global _store
+    if _store is None:
+        _store = ArtifactStore(
+            root=os.environ.get("KG_ARTIFACT_DIR", ".kg_artifacts"),
+            max_bytes=int(os.environ.get("KG_ARTIFACT_MAX_BYTES", str(512 * 1024 * 1024))),
+            max_age_seconds=float(os.environ.get("KG_ARTIFACT_MAX_AGE", str(7 * 24 * 3600))),
+        )
+    return _store
@@ -0,0 +1,394 @@
+"""
+End-to-end benchmark suite, runnable offline:
+
+    python -m knowledge_graph_agent.bench --out results.json
+    python -m knowledge_graph_agent.bench --compare before.json --out after.json
+
+Covers KnowledgeBase inserts, get_state serialization, export formats, layout, rendering and
+/generate latency/throughput at several concurrency levels, a soak run of
+sequential requests that tracks resident memory, server start-up time, and
+recovery of a run killed mid-ontology. The pipeline runs
+against the replay model (see replay.py) with injected latency, and caches and
+artifacts go to a temporary directory, so results only reflect this code.
+Results are written as JSON, one record per benchmark, for comparison across commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+_workdir = tempfile.mkdtemp(prefix="kg_bench_")
+# Must be set before main.py is imported.
+os.environ.setdefault("KG_REPLAY", "synthetic")
+os.environ.setdefault("KG_REPLAY_LATENCY", "0.2")
+os.environ.setdefault("KG_REPLAY_LATENCY_PER_CHAR", "0.0002")
+os.environ.setdefault("KG_CACHE_DIR", os.path.join(_workdir, "cache"))
+os.environ.setdefault("KG_ARTIFACT_DIR", os.path.join(_workdir, "artifacts"))
+
+
+def _timed(fn: Callable[[], Any], repeat: int = 5) -> float:
+    """Best-of-`repeat` wall time of `fn`, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _random_triplets(count: int, seed: int = 0) -> List[tuple]:
+    rng = random.Random(seed)
+    entities = [f"Entity {i}" for i in range(max(2, count // 2))]
+    predicates = ["part_of", "created_by", "located_in", "influenced", "related_to"]
+    return [(rng.choice(entities), rng.choice(predicates), rng.choice(entities)) for _ in range(count)]
+
+
+def bench_kb_insert(sizes=(1_000, 10_000)) -> List[Dict[str, Any]]:
+    from knowledge_graph_agent.graph_tools import KnowledgeBase
+
+    results = []
+    for size in sizes:
+        triplets = _random_triplets(size)
+
+        def insert():
+            kb = KnowledgeBase()
+            # Batches of 50, like an add_triplets tool call
+            for start in range(0, len(triplets), 50):
+                kb.add_triplets(triplets[start:start + 50])
+
+        seconds = _timed(insert, repeat=3)
+        results.append({"name": "kb_insert", "params": {"triplets": size},
+                        "metrics": {"seconds": seconds, "us_per_triplet": seconds / size * 1e6}})
+    return results
+
+
+def bench_get_state(sizes=(1_000, 10_000)) -> List[Dict[str, Any]]:
+    from knowledge_graph_agent.graph_tools import KnowledgeBase
+
+    results = []
+    for size in sizes:
+        kb = KnowledgeBase()
+        kb.add_triplets(_random_triplets(size))
+        metrics = {}
+        for form, build in (("full", kb.get_state), ("compact", kb.get_compact_state)):
+            def serialize():
+                kb._snapshots.clear()  # measure a cold snapshot, not the per-version cache
+                return json.dumps(build())
+            metrics[f"{form}_seconds"] = _timed(serialize)
+            metrics[f"{form}_bytes"] = len(serialize())
+        metrics["delta_10_seconds"] = _timed(lambda: json.dumps(kb.get_delta(kb.version - 10)))
+        results.append({"name": "get_state", "params": {"triplets": size}, "metrics": metrics})
+    return results
+
+
+def bench_export(sizes=(1_000, 10_000)) -> List[Dict[str, Any]]:
+    from knowledge_graph_agent import export
+    from knowledge_graph_agent.graph_tools import KnowledgeBase
+
+    results = []
+    for size in sizes:
+        kb = KnowledgeBase()
+        kb.add_triplets(_random_triplets(size))
+        writers = {"pretty_json": lambda: json.dumps(kb.get_state(), indent=2).encode("utf-8")}
+        writers.update({name: (lambda name=name: b"".join(export.export(kb, name))) for name in export.FORMATS})
+        metrics = {}
+        for name, write in writers.items():
+            def serialize():
+                kb._snapshots.clear()  # include encoding, not just the cached snapshot
+                return write()
+            metrics[f"{name}_seconds"] = _timed(serialize)
+            metrics[f"{name}_bytes"] = len(serialize())
+        results.append({"name": "export", "params": {"triplets": size}, "metrics": metrics})
+    return results
+
+
+def bench_layout(sizes=(1_000, 5_000)) -> List[Dict[str, Any]]:
+    from knowledge_graph_agent.layout import LAYOUT_MODES, compute_layout
+
+    results = []
+    for size in sizes:
+        rng = random.Random(size)
+        nodes = [f"n{i}" for i in range(size)]
+        edges = [(f"n{rng.randrange(size)}", f"n{rng.randrange(size)}") for _ in range(2 * size)]
+        metrics = {f"{mode}_seconds": _timed(lambda: compute_layout(nodes, edges, mode=mode), repeat=1)
+                   for mode in LAYOUT_MODES}
+        results.append({"name": "layout", "params": {"nodes": size, "edges": len(edges)}, "metrics": metrics})
+    return results
+
+
+def bench_render(nodes: int = 60) -> List[Dict[str, Any]]:
+    from knowledge_graph_agent.rendering import render_graph
+
+    triplets = _random_triplets(nodes * 2, seed=int(time.time()))  # fresh graph, so the first render is cold
+    names = sorted({s for s, _, _ in triplets} | {o for _, _, o in triplets})
+    edges = [(s, o, p) for s, p, o in triplets]
+
+    async def run():
+        # The first call also pays for spawning the render pool; warm it on another graph.
+        await render_graph(["warm-up"], [])
+        start = time.perf_counter()
+        _, cold = await render_graph(names, edges)
+        cold_s = time.perf_counter() - start
+        start = time.perf_counter()
+        _, warm = await render_graph(names, edges)
+        return {"cold_seconds": cold_s, "cold_layout_s": cold["layout_s"], "cold_rasterize_s": cold["rasterize_s"],
+                "cached_seconds": time.perf_counter() - start, "cached_hit": warm["cache_hit"]}
+
+    return [{"name": "render", "params": {"nodes": len(names), "edges": len(edges)}, "metrics": asyncio.run(run())}]
+
+
+def bench_generate(concurrency_levels=(1, 4, 16), requests_per_level: int = 16) -> List[Dict[str, Any]]:
+    import httpx
+    from knowledge_graph_agent.server import app
+
+    async def run(concurrency: int) -> Dict[str, Any]:
+        latencies: List[float] = []
+        semaphore = asyncio.Semaphore(concurrency)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            async def one(i: int):
+                async with semaphore:
+                    start = time.perf_counter()
+                    # Unique topics, so every request runs the whole pipeline.
+                    response = await client.post("/generate", json={"topic": f"bench {concurrency} {i} {time.time()}"})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(requests_per_level)))
+            elapsed = time.perf_counter() - start
+        return {
+            "requests": requests_per_level,
+            "throughput_rps": requests_per_level / elapsed,
+            "p50_seconds": statistics.median(latencies),
+            "p95_seconds": _percentile(latencies, 0.95),
+            "max_seconds": max(latencies),
+        }
+
+    return [{"name": "generate", "params": {"concurrency": level}, "metrics": asyncio.run(run(level))}
+            for level in concurrency_levels]
+
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux), in MB."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def bench_soak(requests: int = 200, sample_every: int = 25) -> List[Dict[str, Any]]:
+    import httpx
+    from google.adk.memory import InMemoryMemoryService
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+    from knowledge_graph_agent.main import APP_NAME, pipeline_agent, runtime
+    from knowledge_graph_agent.observability import GraphBuilderPlugin
+    from knowledge_graph_agent.server import app
+
+    async def soak() -> Dict[str, Any]:
+        rss: List[float] = []
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            start = time.perf_counter()
+            for i in range(requests):
+                response = await client.post("/generate", json={"topic": f"soak {i} {time.time()}"})
+                response.raise_for_status()
+                if (i + 1) % sample_every == 0:
+                    rss.append(_rss_mb())
+            elapsed = time.perf_counter() - start
+        return {
+            "requests": requests,
+            "throughput_rps": requests / elapsed,
+            "rss_first_mb": rss[0],
+            "rss_last_mb": rss[-1],
+            # Growth after warm-up; flat when per-run state is released.
+            "rss_growth_mb": rss[-1] - rss[0],
+            "sessions_retained": runtime.session_service.get_stats()["sessions"],
+        }
+
+    async def setup() -> Dict[str, Any]:
+        # Per-request setup: what each run used to build, against a session on the shared runtime.
+        async def fresh():
+            session_service = InMemorySessionService()
+            Runner(agent=pipeline_agent, app_name=APP_NAME, session_service=session_service,
+                   memory_service=InMemoryMemoryService(), plugins=[GraphBuilderPlugin()])
+            await session_service.create_session(app_name=APP_NAME, user_id="bench")
+
+        async def shared():
+            runtime.runner(pipeline_agent, APP_NAME)
+            await runtime.session_service.create_session(app_name=APP_NAME, user_id="bench")
+
+        timings = {}
+        for name, fn in (("fresh", fresh), ("shared", shared)):
+            start = time.perf_counter()
+            for _ in range(500):
+                await fn()
+            timings[f"setup_{name}_ms"] = (time.perf_counter() - start) / 500 * 1e3
+        return timings
+
+    return [{"name": "soak", "params": {"requests": requests}, "metrics": asyncio.run(soak())},
+            {"name": "soak", "params": {"phase": "setup"}, "metrics": asyncio.run(setup())}]
+
+
+def bench_startup(runs: int = 3) -> List[Dict[str, Any]]:
+    from knowledge_graph_agent.warmup import measure_startup
+
+    samples = [measure_startup() for _ in range(runs)]
+    return [{"name": "startup", "params": {"runs": runs}, "metrics": {
+        "import_seconds": statistics.median(s["import_s"] for s in samples),
+        "warmup_seconds": statistics.median(s["warmup_s"] for s in samples),
+        "ready_seconds": statistics.median(s["ready_s"] for s in samples),
+    }}]
+
+
+# One pipeline run in a child process; prints its stats as JSON.
+_RUN_SCRIPT = """
+import asyncio, contextlib, io, json, sys
+from knowledge_graph_agent.main import run_agent
+with contextlib.redirect_stdout(io.StringIO()):
+    result = asyncio.run(run_agent(sys.argv[1]))
+print(json.dumps({"stats": result["stats"], "edges": sorted(map(json.dumps, result["graph_state"]["edges"]))}))
+"""
+
+
+def recovery_runs(topic: str = "Recovery benchmark topic") -> Dict[str, Any]:
+    """
+    Runs `topic` cold, then kills a second run once its triplets are journaled
+    but the OntologyAgent has not finished, and runs it again. Each run is a
+    child process; returns {"cold", "resumed"} (their stats, sorted edges and
+    wall time) and "killed_after_seconds" (None if the run finished first).
+    """
+    import shutil
+    import signal
+
+    def run(env: Dict[str, str]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, "-c", _RUN_SCRIPT, topic], env=env,
+                                 capture_output=True, text=True, check=True)
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    def env_for(name: str) -> Dict[str, str]:
+        # A fixed hash seed, so both processes iterate sets and dicts of strings in the same order.
+        return {**os.environ, "KG_CACHE_DIR": os.path.join(_workdir, name), "KG_REPLAY_LATENCY": "1.0",
+                "PYTHONHASHSEED": "0"}
+
+    cold = run(env_for("recovery_cold"))
+
+    env = env_for("recovery")
+    shutil.rmtree(env["KG_CACHE_DIR"], ignore_errors=True)
+    checkpoints = os.path.join(env["KG_CACHE_DIR"], "checkpoints")
+    process = subprocess.Popen([sys.executable, "-c", _RUN_SCRIPT, topic], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    start, killed_after = time.perf_counter(), None
+    while process.poll() is None and killed_after is None:
+        time.sleep(0.02)
+        for key in os.listdir(checkpoints) if os.path.isdir(checkpoints) else ():
+            journal = os.path.join(checkpoints, key, "triplets.journal")
+            stages = os.path.join(checkpoints, key, "stages.json")
+            if os.path.exists(journal) and os.path.getsize(journal) and os.path.exists(stages):
+                with open(stages, encoding="utf-8") as f:
+                    if "OntologyAgent" not in json.load(f)["stages"]:
+                        process.send_signal(signal.SIGKILL)
+                        killed_after = time.perf_counter() - start
+    process.wait()
+    return {"cold": cold, "resumed": run(env), "killed_after_seconds": killed_after}
+
+
+def bench_recovery(topic: str = "Recovery benchmark topic") -> List[Dict[str, Any]]:
+    runs = recovery_runs(topic)
+    cold, resumed = runs["cold"], runs["resumed"]
+    checkpoint = resumed["stats"].get("checkpoint", {})
+    return [{"name": "recovery", "params": {"topic": topic}, "metrics": {
+        "killed_mid_ontology": runs["killed_after_seconds"] is not None,
+        "killed_after_seconds": runs["killed_after_seconds"],
+        "cold_seconds": cold["seconds"],
+        "resumed_seconds": resumed["seconds"],
+        "replayed_triplets": checkpoint.get("replayed_triplets", 0),
+        "replay_seconds": checkpoint.get("replay_s", 0.0),
+        "resumed_stages": ",".join(checkpoint.get("resumed_stages", [])),
+        "same_graph": resumed["edges"] == cold["edges"],
+    }}]
+
+
+BENCHMARKS = {
+    "kb_insert": bench_kb_insert,
+    "get_state": bench_get_state,
+    "export": bench_export,
+    "layout": bench_layout,
+    "render": bench_render,
+    "generate": bench_generate,
+    "soak": bench_soak,
+    "startup": bench_startup,
+    "recovery": bench_recovery,
+}
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]) -> List[str]:
+    """One line per numeric metric present in both runs, with the after/before ratio."""
+    def index(report):
+        return {(r["name"], json.dumps(r["params"], sort_keys=True)): r["metrics"] for r in report["results"]}
+
+    old, lines = index(before), []
+    for key, metrics in index(after).items():
+        for metric, value in metrics.items():
+            previous = old.get(key, {}).get(metric)
+            if isinstance(value, (int, float)) and isinstance(previous, (int, float)) \
+                    and not isinstance(value, bool) and previous:
+                lines.append(f"{key[0]:<10} {key[1]:<32} {metric:<20} {previous:>12.4g} -> {value:<12.4g} x{value / previous:.2f}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), help="benchmarks to run (default: all)")
+    parser.add_argument("--out", help="write JSON results to this file")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    report = {
+        "commit": _commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [],
+    }
+    for name in args.only or BENCHMARKS:
+        print(f"⏱️ Running {name}...", file=sys.stderr)
+        report["results"].extend(BENCHMARKS[name]())
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print("\n".join(compare(json.load(f), report)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
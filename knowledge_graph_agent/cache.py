@@ -0,0 +1,250 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+def normalize_topic(topic: str) -> str:
+    """Normalizes a topic so trivially different spellings share a cache entry."""
+    text = unicodedata.normalize("NFKC", topic).casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+class _SharedRun:
+    """
+    The updates of one in-flight run, for every caller that asks for its key.
+
+    The run is a task of its own rather than any one caller's, so each follower
+    gets every update from the first on, however late it attaches. It is
+    cancelled once the last follower leaves before it has finished.
+    """
+
+    def __init__(self, updates: AsyncIterator[Dict[str, Any]], on_finish: Callable[["_SharedRun"], None]):
+        self.updates: List[Dict[str, Any]] = []
+        self.error: Optional[BaseException] = None
+        self.finished = False
+        self.abandoned = False
+        self._followers = 0
+        self._changed = asyncio.Event()
+        self._on_finish = on_finish
+        self._task = asyncio.get_running_loop().create_task(self._pump(updates))
+        self._task.add_done_callback(self._finish)
+
+    async def _pump(self, updates: AsyncIterator[Dict[str, Any]]):
+        async for update in updates:
+            self.updates.append(update)
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _finish(self, task: asyncio.Task):
+        # Retrieving the exception here also keeps asyncio from logging it as unhandled.
+        self.error = asyncio.CancelledError() if task.cancelled() else task.exception()
+        self.finished = True
+        self._notify()
+        self._on_finish(self)
+
+    async def follow(self) -> AsyncIterator[Dict[str, Any]]:
+        self._followers += 1
+        try:
+            seen = 0
+            while True:
+                while seen < len(self.updates):
+                    seen += 1
+                    yield self.updates[seen - 1]
+                if self.finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self._followers -= 1
+            if not self._followers and not self.finished:
+                self.abandoned = True
+                self._task.cancel()
+
+
+class TopicCache:
+    """
+    Caches finished pipeline results per topic.
+
+    Entries live in a bounded in-memory LRU and in a SQLite index on disk,
+    so they survive restarts; the disk keeps the newest `max_disk_entries`.
+    Both tiers expire entries after `ttl_seconds`, and an entry whose image
+    was evicted from `artifacts` counts as a miss. Concurrent requests for the
+    same key share a single pipeline run. `get` and `put` block on SQLite, so
+    the async paths call them in a worker thread.
+    """
+
+    def __init__(self, cache_dir: str = ".kg_cache", max_entries: int = 128,
+                 ttl_seconds: float = 24 * 3600, version: str = "", artifacts=None,
+                 max_disk_entries: int = 10000):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = version
+        self.artifacts = artifacts
+
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, _SharedRun] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, "topics.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, created REAL NOT NULL, payload TEXT NOT NULL)"
+        )
+        # Expiry and the row cap both delete oldest first.
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created)")
+        self._db.commit()
+
+    def key(self, topic: str) -> str:
+        raw = f"{self.version}\0{normalize_topic(topic)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return time.time() - created > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, result = entry
+                if not self._expired(created) and self._image_available(result):
+                    self._memory.move_to_end(key)
+                    return result
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT created, payload FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            created, payload = row
+            result = json.loads(payload)
+            if self._expired(created) or not self._image_available(result):
+                self._delete(key)
+                return None
+            self._remember(key, created, result)
+            return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        result = dict(result)
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, result)
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, created, payload) VALUES (?, ?, ?)",
+                (key, created, json.dumps(result)),
+            )
+            self._purge()
+            self._db.commit()
+        return result
+
+    def _remember(self, key: str, created: float, result: Dict[str, Any]):
+        self._memory[key] = (created, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _delete(self, key: str):
+        self._memory.pop(key, None)
+        self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._db.commit()
+
+    def _image_available(self, result: Dict[str, Any]) -> bool:
+        image = result.get("image")
+        return image is None or self.artifacts is None or self.artifacts.exists(image["id"])
+
+    def _purge(self):
+        """Drops expired rows, then the oldest beyond `max_disk_entries`; both are index range scans."""
+        self._db.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM entries WHERE created <= ("
+            "SELECT created FROM entries ORDER BY created DESC LIMIT 1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
+
+    async def get_or_compute(
+        self, topic: str, compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Returns (result, hit). On a miss, runs `compute` once per key even if
+        several callers ask for the same topic concurrently, here or through
+        `stream_or_follow`.
+        """
+        async def produce():
+            yield {"type": "done", "result": await compute()}
+
+        result, hit = None, False
+        async for update, hit in self.stream_or_follow(topic, produce):
+            if update["type"] == "done":
+                result = update["result"]
+        return result, hit
+
+    async def stream_or_follow(
+        self, topic: str, produce: Callable[[], AsyncIterator[Dict[str, Any]]]
+    ) -> AsyncIterator[Tuple[Dict[str, Any], bool]]:
+        """
+        Streaming `get_or_compute`: yields (update, hit) for the updates of
+        `produce()`, which end with {"type": "done", "result": ...}; that result
+        is cached. A cached result comes back as its "done" update alone. On a
+        miss `produce` runs once per key, and callers asking for the same topic
+        meanwhile follow that run, replaying the updates they missed.
+        """
+        key = self.key(topic)
+        cached = await asyncio.to_thread(self.get, key)
+        if cached is not None:
+            self.hits += 1
+            yield {"type": "done", "result": cached}, True
+            return
+
+        run = self._inflight.get(key)
+        hit = run is not None and not run.abandoned
+        if hit:
+            self.shared += 1
+        else:
+            self.misses += 1
+            run = _SharedRun(self._caching(key, produce()), lambda run: self._forget(key, run))
+            self._inflight[key] = run
+        # Closed explicitly, so a caller that stops early stops following right away.
+        async with aclosing(run.follow()) as updates:
+            async for update in updates:
+                yield update, hit
+
+    async def _caching(self, key: str, updates: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        async for update in updates:
+            if update["type"] == "done":
+                update = {**update, "result": await asyncio.to_thread(self.put, key, update["result"])}
+            yield update
+
+    def _forget(self, key: str, run: _SharedRun):
+        if self._inflight.get(key) is run:
+            del self._inflight[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.shared
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_inflight": self.shared,
+            "hit_rate": (self.hits + self.shared) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
@@ -0,0 +1,289 @@
+"""
+Stage checkpoints for pipeline runs, so a failed run can be resumed.
+
+Each run of a topic gets a directory under KG_CHECKPOINT_DIR, named after its
+topic-cache key:
+
+- stages.json: the final text of every stage (agent) that has finished,
+  written atomically when the stage ends.
+- triplets.journal: a write-ahead log of every `add_triplets` batch, in the
+  order the KnowledgeBase applied them, one JSON line per batch. A writer
+  thread hands lines to the OS as soon as they are queued, so they survive
+  the process being killed; fsync is batched (every `sync_every` batches or
+  `sync_interval_s` seconds, and at the end of each stage) to survive a
+  machine crash too.
+
+When a run of the same topic starts while a checkpoint exists, the journal is
+replayed into the new KnowledgeBase (same batches, same order, so the same
+canonical entities and aliases), and the pipeline skips every stage that
+already finished (see architect.py). A finished run deletes its checkpoint,
+since the topic cache holds its result from then on; checkpoints of runs
+that failed are deleted once they are KG_CHECKPOINT_TTL seconds old.
+"""
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; the in-process registry still applies
+    fcntl = None
+
+Triplet = Tuple[str, str, str]
+
+
+class TripletJournal:
+    """
+    Append-only journal of triplet batches with batched fsync.
+
+    `append` only serializes the batch and queues it; a writer thread writes
+    and flushes whatever has queued up in one go, so appends never wait on
+    the disk (they are called from tools, on the event loop).
+    """
+
+    def __init__(self, path: str, sync_every: int = 32, sync_interval_s: float = 1.0):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval_s = sync_interval_s
+        self._file = open(path, "a", encoding="utf-8")
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+        self._io_lock = threading.Lock()
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="triplet-journal", daemon=True)
+        self._writer.start()
+        self.batches = 0
+        self.syncs = 0
+
+    def append(self, triplets: Sequence[Triplet]):
+        self._lines.put(json.dumps([list(t) for t in triplets], ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.batches += 1
+
+    def _write_loop(self):
+        while True:
+            lines = [self._lines.get()]
+            while True:
+                try:
+                    lines.append(self._lines.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in lines
+            batch = [line for line in lines if line is not None]
+            try:
+                if batch:
+                    with self._io_lock:
+                        self._file.write("".join(batch))
+                        self._file.flush()  # in the OS from here on, even if the process dies
+                        self._unsynced += len(batch)
+                        if self._unsynced >= self.sync_every \
+                                or time.monotonic() - self._synced_at >= self.sync_interval_s:
+                            self._fsync()
+            finally:
+                for _ in lines:
+                    self._lines.task_done()
+            if stop:
+                return
+
+    def _fsync(self):
+        if self._unsynced and not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.syncs += 1
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def sync(self):
+        """Blocks until every appended batch is written and fsynced."""
+        self._lines.join()
+        with self._io_lock:
+            self._fsync()
+
+    def close(self):
+        if self._writer.is_alive():
+            self._lines.put(None)
+            self._writer.join()
+        with self._io_lock:
+            if not self._file.closed:
+                self._fsync()
+                self._file.close()
+
+    @staticmethod
+    def read(path: str) -> Iterator[List[Triplet]]:
+        """Yields the journaled batches; a torn last line (the writer was killed mid-write) is dropped."""
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    return
+                try:
+                    batch = json.loads(line)
+                except json.JSONDecodeError:
+                    return
+                yield [tuple(t) for t in batch]
+
+
+# Checkpoints held by runs in this process, by key.
+_open: Dict[str, "RunCheckpoint"] = {}
+
+
+class RunCheckpoint:
+    def __init__(self, key: str, directory: str, lock_file=None):
+        self.key = key
+        self.directory = directory
+        self._lock_file = lock_file
+        self.journal: Optional[TripletJournal] = None
+        self._kb = None
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.resumed_stages: List[str] = []
+        # Parallel stages may finish at once, each from its own thread.
+        self._stages_lock = threading.Lock()
+        path = os.path.join(directory, "stages.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.stages = json.load(f).get("stages", {})
+
+    @property
+    def journal_path(self) -> str:
+        return os.path.join(self.directory, "triplets.journal")
+
+    def output(self, stage: str) -> Optional[str]:
+        """The saved final text of `stage`, or None if it has not finished."""
+        entry = self.stages.get(stage)
+        if entry is None:
+            return None
+        if stage not in self.resumed_stages:
+            self.resumed_stages.append(stage)
+        return entry["output"]
+
+    def complete(self, stage: str, output: str):
+        # The stage's triplets must be durable before the stage is marked done.
+        if self.journal is not None:
+            self.journal.sync()
+        with self._stages_lock:
+            self.stages[stage] = {"output": output, "completed_at": time.time()}
+            path = os.path.join(self.directory, "stages.json")
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"key": self.key, "stages": self.stages}, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+
+    def restore(self, kb) -> Dict[str, Any]:
+        """Replays the journal into `kb`, then journals its further changes. Returns replay stats."""
+        started = time.perf_counter()
+        batches = triplets = 0
+        for batch in TripletJournal.read(self.journal_path):
+            kb.add_triplets(batch)
+            batches += 1
+            triplets += len(batch)
+        # Reopen after a torn tail, so new batches start on a fresh line.
+        self._truncate_torn_tail()
+        self.journal = TripletJournal(self.journal_path)
+        self._kb = kb
+        kb.journal = self.journal
+        return {"replayed_batches": batches, "replayed_triplets": triplets,
+                "replay_s": time.perf_counter() - started}
+
+    def _truncate_torn_tail(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end != len(data):
+                f.truncate(end)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "resumed_stages": list(self.resumed_stages),
+            "journal_batches": self.journal.batches if self.journal else 0,
+            "journal_syncs": self.journal.syncs if self.journal else 0,
+        }
+
+    def close(self, keep: bool = True):
+        """Releases the checkpoint; with keep=False (the run finished) its files are deleted."""
+        if self.journal is not None:
+            self.journal.close()
+        if self._kb is not None:
+            self._kb.journal = None
+        if not keep:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        if self._lock_file is not None:
+            self._lock_file.close()  # drops the flock
+        _open.pop(self.key, None)
+
+
+class CheckpointStore:
+    def __init__(self, root: str, ttl_seconds: float = 24 * 3600):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(root, exist_ok=True)
+        self.sweep()
+
+    def _expired(self, directory: str) -> bool:
+        paths = [os.path.join(directory, name) for name in ("stages.json", "triplets.journal")]
+        modified = max((os.path.getmtime(p) for p in paths if os.path.exists(p)), default=None)
+        if modified is None:
+            modified = os.path.getmtime(directory)
+        return time.time() - modified > self.ttl_seconds
+
+    def sweep(self) -> int:
+        """
+        Deletes every checkpoint untouched for `ttl_seconds` that no run holds,
+        whatever its topic, so topics that fail and are never retried do not
+        pile up. Returns how many were deleted.
+        """
+        removed = 0
+        for key in os.listdir(self.root):
+            directory = os.path.join(self.root, key)
+            if key in _open or not os.path.isdir(directory):
+                continue
+            try:
+                if not self._expired(directory):
+                    continue
+                lock_file = open(os.path.join(directory, "lock"), "w")
+            except OSError:
+                continue  # deleted meanwhile
+            try:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+            except OSError:
+                pass  # held by a run in another process
+            finally:
+                lock_file.close()
+        return removed
+
+    def open(self, key: str) -> Optional[RunCheckpoint]:
+        """
+        The checkpoint for `key`, resuming a previous run's if there is a fresh
+        one. Returns None while another run (in this or another process) holds
+        it: that run goes without checkpoints rather than interleaving journals.
+        Expired checkpoints of every key are swept first.
+        """
+        if key in _open:
+            return None
+        self.sweep()
+        directory = os.path.join(self.root, key)
+        os.makedirs(directory, exist_ok=True)
+        lock_file = open(os.path.join(directory, "lock"), "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return None
+        checkpoint = _open[key] = RunCheckpoint(key, directory, lock_file)
+        return checkpoint
+
+
+def find_checkpoint(key: Optional[str]) -> Optional[RunCheckpoint]:
+    """The open checkpoint named in a session's state, if any."""
+    return _open.get(key) if key else None
@@ -0,0 +1,344 @@
+"""
+Persistent corpus graph shared by every run.
+
+Each run builds its own KnowledgeBase, which is dropped once it falls out of
+KG_GRAPH_RETENTION, so related topics are extracted from scratch every time.
+With KG_CORPUS_PATH set, every finished run (topic or ingestion) is also
+merged into one long-lived graph in SQLite:
+
+- WAL journal with synchronous=NORMAL: API reads go on while a run merges,
+  and a crash never leaves a half-written transaction behind.
+- Entities are matched across runs by their normalized name (see
+  `canonical.normalize_entity`), so "Harry Potter" from one topic and
+  "harry potter" from another are the same node; every surface form is kept
+  as an alias.
+- Terms are interned to integer IDs and triples are indexed SPO, POS and OSP,
+  as in the in-memory TripleStore, so a pattern costs time proportional to its
+  results.
+- Provenance: every triple lists the runs (ID, topic, time) that added it.
+- Merges are upserts, batched into transactions of `batch_size` triples.
+
+Nothing is loaded at start-up: the file is memory-mapped (KG_CORPUS_MMAP
+bytes) and queries page in only the subgraph they need (`load_subgraph`), as
+an ordinary KnowledgeBase that graph_queries works on.
+
+    python -m knowledge_graph_agent.corpus   # merge throughput, open time and query latency
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .canonical import normalize_entity
+from .graph_queries import UnknownEntityError
+from .graph_tools import KnowledgeBase
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, name TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS predicates (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS aliases (
+    node INTEGER NOT NULL, alias TEXT NOT NULL, PRIMARY KEY (node, alias)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS triples (
+    s INTEGER NOT NULL, p INTEGER NOT NULL, o INTEGER NOT NULL, PRIMARY KEY (s, p, o)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS triples_pos ON triples (p, o, s);
+CREATE INDEX IF NOT EXISTS triples_osp ON triples (o, s, p);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY, run_id TEXT NOT NULL UNIQUE, topic TEXT NOT NULL, created REAL NOT NULL,
+    triples INTEGER NOT NULL DEFAULT 0, new_triples INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS provenance (
+    s INTEGER NOT NULL, p INTEGER NOT NULL, o INTEGER NOT NULL, run INTEGER NOT NULL,
+    PRIMARY KEY (s, p, o, run)) WITHOUT ROWID;
+"""
+
+# Bound parameters per IN (...) list, well under SQLite's limit.
+_MAX_PARAMS = 500
+
+
+def _placeholders(count: int) -> str:
+    return ",".join("?" * count)
+
+
+def _select_in(db: sqlite3.Connection, sql: str, values: Sequence[Any], *args: Any) -> Iterator[tuple]:
+    """Runs `sql` with its {} replaced by an IN list, in chunks; `args` are bound after the list."""
+    for start in range(0, len(values), _MAX_PARAMS):
+        chunk = list(values[start:start + _MAX_PARAMS])
+        yield from db.execute(sql.format(_placeholders(len(chunk))), chunk + list(args))
+
+
+class CorpusStore:
+    def __init__(self, path: str, batch_size: int = 5000, mmap_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.batch_size = batch_size
+        self.mmap_bytes = mmap_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One connection writes and one reads; under WAL, readers never wait for a merge.
+        self._db = self._connect()
+        self._db.executescript(_SCHEMA)
+        self._reader = self._connect()
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+        return db
+
+    def close(self):
+        self._db.close()
+        self._reader.close()
+
+    # Writes
+
+    def merge(self, kb: KnowledgeBase, run_id: str, topic: str) -> Dict[str, Any]:
+        """
+        Upserts a finished run's graph, recording the run as the provenance of
+        each of its triples. Merging the same run again changes nothing.
+        """
+        started = time.perf_counter()
+        nodes = kb.store.nodes()
+        triples = list(kb.store.match())
+        # The run normalized every name it resolved already.
+        keys = kb.entities.keys()
+        with self._write_lock:
+            with self._db:
+                self._db.execute("INSERT OR IGNORE INTO runs (run_id, topic, created) VALUES (?, ?, ?)",
+                                 (run_id, topic, time.time()))
+                run = self._db.execute("SELECT id FROM runs WHERE run_id = ?", (run_id,)).fetchone()[0]
+            node_ids: Dict[str, int] = {}
+            for start in range(0, len(nodes), self.batch_size):
+                with self._db:
+                    node_ids.update(self._upsert_nodes(nodes[start:start + self.batch_size], keys, kb.aliases))
+            with self._db:
+                predicate_ids = self._upsert_predicates(sorted({p for _, p, _ in triples}))
+            new_triples = 0
+            for start in range(0, len(triples), self.batch_size):
+                # In key order, so the inserts walk the SPO B-tree instead of jumping around it.
+                rows = sorted((node_ids[s], predicate_ids[p], node_ids[o])
+                              for s, p, o in triples[start:start + self.batch_size])
+                with self._db:
+                    before = self._db.total_changes
+                    self._db.executemany("INSERT OR IGNORE INTO triples (s, p, o) VALUES (?, ?, ?)", rows)
+                    new_triples += self._db.total_changes - before
+                    self._db.executemany("INSERT OR IGNORE INTO provenance (s, p, o, run) VALUES (?, ?, ?, ?)",
+                                         [(s, p, o, run) for s, p, o in rows])
+            with self._db:
+                self._db.execute("UPDATE runs SET triples = ?, new_triples = new_triples + ? WHERE id = ?",
+                                 (len(triples), new_triples, run))
+        return {"merged_triples": len(triples), "new_triples": new_triples, "merge_s": time.perf_counter() - started}
+
+    def _upsert_nodes(self, names: List[str], known_keys: Dict[str, str],
+                      aliases: Dict[str, List[str]]) -> Dict[str, int]:
+        keys = {name: known_keys.get(name) or normalize_entity(name) or name for name in names}
+        # The first run to see an entity names it; later runs add aliases.
+        self._db.executemany("INSERT OR IGNORE INTO nodes (key, name) VALUES (?, ?)",
+                             [(key, name) for name, key in keys.items()])
+        ids = dict(_select_in(self._db, "SELECT key, id FROM nodes WHERE key IN ({})", list(set(keys.values()))))
+        self._db.executemany("INSERT OR IGNORE INTO aliases (node, alias) VALUES (?, ?)",
+                             [(ids[key], alias) for name, key in keys.items() for alias in aliases.get(name, [name])])
+        return {name: ids[key] for name, key in keys.items()}
+
+    def _upsert_predicates(self, predicates: List[str]) -> Dict[str, int]:
+        self._db.executemany("INSERT OR IGNORE INTO predicates (name) VALUES (?)", [(p,) for p in predicates])
+        return dict(_select_in(self._db, "SELECT name, id FROM predicates WHERE name IN ({})", predicates))
+
+    # Reads
+
+    def _node_id(self, name: str) -> Optional[int]:
+        row = self._reader.execute("SELECT id FROM nodes WHERE key = ?", (normalize_entity(name) or name,)).fetchone()
+        return row[0] if row else None
+
+    def load_subgraph(self, node: str, hops: int = 1, max_nodes: int = 200,
+                      max_edges: int = 500) -> KnowledgeBase:
+        """
+        Pages in the entities within `hops` of `node` (BFS order, at most
+        `max_nodes`) and up to `max_edges` edges among them. Hubs cost no more
+        than leaves: every neighbour scan is cut off by a LIMIT.
+        """
+        with self._read_lock:
+            center = self._node_id(node)
+            if center is None:
+                raise UnknownEntityError(node)
+            visited = {center: None}
+            frontier = [center]
+            for _ in range(hops):
+                next_frontier = []
+                for start in range(0, len(frontier), _MAX_PARAMS // 2):
+                    chunk = frontier[start:start + _MAX_PARAMS // 2]
+                    budget = max_nodes - len(visited)
+                    if budget <= 0:
+                        break
+                    # Direction does not matter here. UNION ALL streams, so the LIMIT bounds the scan;
+                    # over-fetch a little, since some neighbours repeat.
+                    rows = self._reader.execute(
+                        f"SELECT o FROM triples WHERE s IN ({_placeholders(len(chunk))}) "
+                        f"UNION ALL SELECT s FROM triples WHERE o IN ({_placeholders(len(chunk))}) LIMIT ?",
+                        chunk + chunk + [budget + len(chunk)],
+                    )
+                    for (other,) in rows:
+                        if other not in visited and len(visited) < max_nodes:
+                            visited[other] = None
+                            next_frontier.append(other)
+                frontier = next_frontier
+                if not frontier or len(visited) >= max_nodes:
+                    break
+
+            ids = list(visited)
+            # Induced edges: the kept nodes fit in one IN list as objects, subjects go in chunks.
+            edges = []
+            for start in range(0, len(ids), _MAX_PARAMS):
+                chunk = ids[start:start + _MAX_PARAMS]
+                edges += self._reader.execute(
+                    f"SELECT s, p, o FROM triples WHERE s IN ({_placeholders(len(chunk))}) "
+                    f"AND o IN ({_placeholders(len(ids))}) LIMIT ?",
+                    chunk + ids + [max_edges - len(edges)],
+                ).fetchall()
+                if len(edges) >= max_edges:
+                    break
+            names = dict(_select_in(self._reader, "SELECT id, name FROM nodes WHERE id IN ({})", ids))
+            predicates = dict(_select_in(self._reader, "SELECT id, name FROM predicates WHERE id IN ({})",
+                                         list({p for _, p, _ in edges})))
+            aliases: Dict[str, List[str]] = {}
+            for node_id, alias in _select_in(self._reader, "SELECT node, alias FROM aliases WHERE node IN ({})", ids):
+                aliases.setdefault(names[node_id], []).append(alias)
+        return KnowledgeBase.from_state({
+            "nodes": [names[i] for i in ids],
+            "edges": [{"source": names[s], "target": names[o], "relation": predicates[p]} for s, p, o in edges],
+            "aliases": aliases,
+        })
+
+    def provenance(self, subject: Optional[str] = None, predicate: Optional[str] = None,
+                   object_: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+        """
+        The triples matching a pattern (None is a wildcard), each with the runs
+        that added it. Returns at most `limit` (triple, run) pairs.
+        """
+        conditions, args = [], []
+        with self._read_lock:
+            for column, name in (("s", subject), ("o", object_)):
+                if name is not None:
+                    node_id = self._node_id(name)
+                    if node_id is None:
+                        raise UnknownEntityError(name)
+                    conditions.append(f"t.{column} = ?")
+                    args.append(node_id)
+            if predicate is not None:
+                conditions.append("t.p = (SELECT id FROM predicates WHERE name = ?)")
+                args.append(predicate)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            rows = self._reader.execute(
+                "SELECT s.name, p.name, o.name, r.run_id, r.topic, r.created FROM triples t "
+                "JOIN provenance v ON v.s = t.s AND v.p = t.p AND v.o = t.o JOIN runs r ON r.id = v.run "
+                "JOIN nodes s ON s.id = t.s JOIN predicates p ON p.id = t.p JOIN nodes o ON o.id = t.o "
+                f"{where} LIMIT ?",
+                args + [limit],
+            ).fetchall()
+        triplets: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        for s, p, o, run_id, topic, created in rows:
+            triplets.setdefault((s, p, o), []).append({"run_id": run_id, "topic": topic, "added_at": created})
+        return {
+            "triplets": [{"subject": s, "predicate": p, "object": o, "sources": sources}
+                         for (s, p, o), sources in triplets.items()],
+            "truncated": len(rows) >= limit,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        # Nodes are never deleted and every run records its new triples, so no table is scanned.
+        with self._read_lock:
+            nodes = self._reader.execute("SELECT max(id) FROM nodes").fetchone()[0] or 0
+            runs, triples = self._reader.execute("SELECT count(*), total(new_triples) FROM runs").fetchone()
+        size = sum(os.path.getsize(p) for p in (self.path, f"{self.path}-wal") if os.path.exists(p))
+        return {"nodes": nodes, "triples": int(triples), "runs": runs, "bytes": size}
+
+
+_corpus: Optional[CorpusStore] = None
+
+
+def get_corpus() -> Optional[CorpusStore]:
+    """The process-wide corpus, or None unless KG_CORPUS_PATH is set."""
+    global _corpus
+    if _corpus is None and os.environ.get("KG_CORPUS_PATH"):
+        _corpus = CorpusStore(
+            os.environ["KG_CORPUS_PATH"],
+            batch_size=int(os.environ.get("KG_CORPUS_BATCH", "5000")),
+            mmap_bytes=int(os.environ.get("KG_CORPUS_MMAP", str(256 * 1024 * 1024))),
+        )
+    return _corpus
+
+
+async def merge_run(kb: KnowledgeBase, run_id: str, topic: str) -> Optional[Dict[str, Any]]:
+    """
+    Merges a finished run into the corpus, if there is one, off the event loop.
+    A failed merge is reported rather than raised: the run itself succeeded.
+    """
+    corpus = get_corpus()
+    if corpus is None:
+        return None
+    try:
+        return await asyncio.to_thread(corpus.merge, kb, run_id, topic)
+    except sqlite3.Error as e:
+        print(f"⚠️ Corpus merge failed: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+
+    rng = random.Random(0)
+    entities = [f"Entity number {i}" for i in range(200_000)]
+    predicates = ["part_of", "created_by", "located_in", "influenced", "related_to"]
+
+    def run_kb(size: int) -> KnowledgeBase:
+        # Straight into the store, so merges normalize every name here (pipeline runs have them already).
+        kb = KnowledgeBase()
+        for _ in range(size):
+            kb.store.add(rng.choice(entities), rng.choice(predicates), rng.choice(entities))
+        return kb
+
+    with tempfile.TemporaryDirectory() as directory:
+        # One transaction per triple (what autocommit upserts would cost) against batched ones.
+        sample = run_kb(5_000)
+        for batch_size in (1, 5_000):
+            corpus = CorpusStore(os.path.join(directory, f"batch{batch_size}.sqlite3"), batch_size=batch_size)
+            stats = corpus.merge(sample, "run", "sample")
+            print(f"batch_size {batch_size:>5}: {stats['merged_triples'] / stats['merge_s']:10.0f} triples/s")
+            corpus.close()
+
+        path = os.path.join(directory, "corpus.sqlite3")
+        corpus = CorpusStore(path)
+        runs = 10
+        for run in range(runs):
+            stats = corpus.merge(run_kb(100_000), f"run-{run}", f"topic {run}")
+            print(f"run {run}: {stats['merged_triples']} triples ({stats['new_triples']} new) "
+                  f"in {stats['merge_s']:.2f}s, {stats['merged_triples'] / stats['merge_s']:.0f} triples/s")
+        corpus.close()
+
+        start = time.perf_counter()
+        corpus = CorpusStore(path)
+        opened = time.perf_counter() - start
+        print(f"{corpus.get_stats()}; opened in {opened * 1e3:.1f} ms")
+        for hops in (1, 2):
+            probes = rng.sample(entities, 50)
+            start = time.perf_counter()
+            sizes = [corpus.load_subgraph(name, hops=hops).num_edges() for name in probes]
+            elapsed = (time.perf_counter() - start) / len(probes)
+            print(f"load_subgraph hops={hops}: {elapsed * 1e3:6.2f} ms, {sum(sizes) / len(sizes):.0f} edges on average")
+        start = time.perf_counter()
+        for name in probes:
+            corpus.provenance(subject=name)
+        print(f"provenance(subject=...): {(time.perf_counter() - start) / len(probes) * 1e3:.2f} ms")
+
+        # What loading the whole corpus at start-up would cost instead.
+        start = time.perf_counter()
+        with sqlite3.connect(path) as db:
+            names = dict(db.execute("SELECT id, name FROM nodes"))
+            predicate_names = dict(db.execute("SELECT id, name FROM predicates"))
+            kb = KnowledgeBase()
+            for s, p, o in db.execute("SELECT s, p, o FROM triples"):
+                kb.store.add(names[s], predicate_names[p], names[o])
+        print(f"full load instead: {time.perf_counter() - start:.2f}s for {kb.num_edges()} triples")
+        corpus.close()
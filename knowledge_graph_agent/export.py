@@ -0,0 +1,228 @@
+"""
+Graph export formats.
+
+Every format is written from the knowledge base's dictionary-encoded snapshot
+(`KnowledgeBase.get_encoded_state`), so entity names are looked up once, not
+once per edge:
+
+- "json": the `get_state` dict ({"nodes": [...], "edges": [{source, target, relation}]}).
+- "compact": the encoded snapshot as JSON; nodes and predicates are listed
+  once and edges are [source, predicate, target] index triples.
+- "ndjson": one JSON object per line (a header, then nodes, then edges),
+  streamed in batches for very large graphs.
+- "graphml": GraphML XML, for Gephi, Cytoscape, yEd or networkx.
+- "columnar": Arrow-style columns in a numpy .npz archive: int32 subject,
+  predicate and object columns, plus the node and predicate dictionaries as
+  UTF-8 data with int64 offsets. Optionally deflate-compressed. Load it back
+  with `read_columnar`.
+
+The API picks a format from ?format= or the Accept header (see `negotiate`).
+
+    python -m knowledge_graph_agent.export   # size and speed against pretty-printed JSON
+"""
+import io
+import json
+import time
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+
+from .graph_tools import KnowledgeBase
+
+# Format name -> media type, in order of preference when the client accepts anything.
+FORMATS: Dict[str, str] = {
+    "json": "application/json",
+    "compact": "application/vnd.kg.compact+json",
+    "ndjson": "application/x-ndjson",
+    "graphml": "application/graphml+xml",
+    "columnar": "application/vnd.kg.columnar+npz",
+}
+EXTENSIONS = {"json": "json", "compact": "json", "ndjson": "ndjson", "graphml": "graphml", "columnar": "npz"}
+# Binary formats are compressed by the writer, the rest can be gzipped in transit.
+TEXT_FORMATS = ("json", "compact", "ndjson", "graphml")
+
+_BATCH = 10_000
+
+
+class UnsupportedFormatError(ValueError):
+    """Raised when no export format matches the request."""
+
+
+def negotiate(accept: Optional[str] = None, format: Optional[str] = None) -> str:
+    """
+    The export format for a request: `format` by name if given, else the
+    best match for the Accept header (quality values honoured, */* is "json").
+    """
+    if format:
+        if format not in FORMATS:
+            raise UnsupportedFormatError(f"Unknown format {format!r}; choose one of {', '.join(FORMATS)}")
+        return format
+    if not accept:
+        return "json"
+    by_type = {media_type: name for name, media_type in FORMATS.items()}
+    ranges = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((-quality, position, media_type.strip().lower()))
+    for negative_quality, _, media_type in sorted(ranges):
+        if negative_quality == 0:
+            break
+        if media_type in by_type:
+            return by_type[media_type]
+        if media_type in ("*/*", "application/*"):
+            return "json"
+    raise UnsupportedFormatError(f"None of {accept!r} is available; supported: {', '.join(FORMATS.values())}")
+
+
+def to_compact(kb: KnowledgeBase) -> Dict[str, Any]:
+    encoded = kb.get_encoded_state()
+    compact = {"format": "kg-compact", **encoded}
+    aliases = {node: forms for node, forms in kb.aliases.items() if len(forms) > 1}
+    if aliases:
+        compact["aliases"] = aliases
+    return compact
+
+
+def from_compact(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Expands a compact export back into the `get_state` form."""
+    nodes, predicates = data["nodes"], data["predicates"]
+    return {
+        "nodes": list(nodes),
+        "edges": [{"source": nodes[s], "target": nodes[o], "relation": predicates[p]} for s, p, o in data["edges"]],
+    }
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def iter_ndjson(kb: KnowledgeBase) -> Iterator[str]:
+    encoded = kb.get_encoded_state()
+    nodes, predicates, edges = encoded["nodes"], encoded["predicates"], encoded["edges"]
+    yield _dumps({"type": "graph", "version": encoded["version"], "nodes": len(nodes), "edges": len(edges)}) + "\n"
+    for start in range(0, len(nodes), _BATCH):
+        yield "".join(_dumps({"type": "node", "id": node}) + "\n" for node in nodes[start:start + _BATCH])
+    # Each node and predicate is JSON-encoded once, not once per edge.
+    node_json = [_dumps(node) for node in nodes]
+    predicate_json = [_dumps(predicate) for predicate in predicates]
+    for start in range(0, len(edges), _BATCH):
+        yield "".join(
+            f'{{"type":"edge","source":{node_json[s]},"target":{node_json[o]},"relation":{predicate_json[p]}}}\n'
+            for s, p, o in edges[start:start + _BATCH]
+        )
+
+
+def iter_graphml(kb: KnowledgeBase) -> Iterator[str]:
+    encoded = kb.get_encoded_state()
+    nodes, predicates, edges = encoded["nodes"], encoded["predicates"], encoded["edges"]
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+           '  <key id="relation" for="edge" attr.name="relation" attr.type="string"/>\n'
+           '  <graph id="G" edgedefault="directed">\n')
+    node_ids = [quoteattr(node) for node in nodes]
+    for start in range(0, len(nodes), _BATCH):
+        yield "".join(f"    <node id={node_id}/>\n" for node_id in node_ids[start:start + _BATCH])
+    relations = [escape(predicate) for predicate in predicates]
+    for start in range(0, len(edges), _BATCH):
+        yield "".join(
+            f'    <edge source={node_ids[s]} target={node_ids[o]}><data key="relation">{relations[p]}</data></edge>\n'
+            for s, p, o in edges[start:start + _BATCH]
+        )
+    yield "  </graph>\n</graphml>\n"
+
+
+def _string_column(values: List[str]) -> Dict[str, np.ndarray]:
+    # Arrow's layout for strings: one UTF-8 buffer plus offsets into it.
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return {"offsets": offsets, "data": np.frombuffer(b"".join(encoded), dtype=np.uint8)}
+
+
+def _read_strings(offsets: np.ndarray, data: np.ndarray) -> List[str]:
+    buffer = data.tobytes()
+    return [buffer[start:end].decode("utf-8") for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def to_columnar(kb: KnowledgeBase, compress: bool = True) -> bytes:
+    encoded = kb.get_encoded_state()
+    triples = encoded["edges"]
+    edges = np.fromiter(chain.from_iterable(triples), dtype=np.int32, count=3 * len(triples)).reshape(-1, 3)
+    nodes, predicates = _string_column(encoded["nodes"]), _string_column(encoded["predicates"])
+    buffer = io.BytesIO()
+    (np.savez_compressed if compress else np.savez)(
+        buffer,
+        version=np.array([encoded["version"]]),
+        subject=edges[:, 0], predicate=edges[:, 1], object=edges[:, 2],
+        node_offsets=nodes["offsets"], node_data=nodes["data"],
+        predicate_offsets=predicates["offsets"], predicate_data=predicates["data"],
+    )
+    return buffer.getvalue()
+
+
+def read_columnar(data: bytes) -> Dict[str, Any]:
+    """Loads a columnar export into the compact form (see `from_compact` for the full one)."""
+    with np.load(io.BytesIO(data)) as columns:
+        return {
+            "format": "kg-compact",
+            "version": int(columns["version"][0]),
+            "nodes": _read_strings(columns["node_offsets"], columns["node_data"]),
+            "predicates": _read_strings(columns["predicate_offsets"], columns["predicate_data"]),
+            "edges": np.stack([columns["subject"], columns["predicate"], columns["object"]], axis=1).tolist(),
+        }
+
+
+def export(kb: KnowledgeBase, format: str, compress: bool = True) -> Iterator[bytes]:
+    """The graph in `format`, as byte chunks ready to stream."""
+    if format == "json":
+        yield json.dumps(kb.get_state(), ensure_ascii=False).encode("utf-8")
+    elif format == "compact":
+        yield _dumps(to_compact(kb)).encode("utf-8")
+    elif format == "ndjson":
+        yield from (chunk.encode("utf-8") for chunk in iter_ndjson(kb))
+    elif format == "graphml":
+        yield from (chunk.encode("utf-8") for chunk in iter_graphml(kb))
+    elif format == "columnar":
+        yield to_columnar(kb, compress)
+    else:
+        raise UnsupportedFormatError(f"Unknown format {format!r}")
+
+
+if __name__ == "__main__":
+    import gzip
+    import random
+
+    for size in (1_000, 10_000, 100_000):
+        rng = random.Random(size)
+        entities = [f"Entity number {i}" for i in range(size // 2)]
+        predicates = ["part_of", "created_by", "located_in", "influenced", "related_to"]
+        kb = KnowledgeBase()
+        for _ in range(size):
+            kb.store.add(rng.choice(entities), rng.choice(predicates), rng.choice(entities))
+        writers = {
+            # What app.py offered for download until now
+            "pretty json": lambda: json.dumps(kb.get_state(), indent=2).encode("utf-8"),
+            **{name: (lambda name=name: b"".join(export(kb, name))) for name in FORMATS},
+            "columnar raw": lambda: to_columnar(kb, compress=False),
+        }
+        print(f"{len(kb.store)} edges, {kb.num_nodes()} nodes")
+        baseline = None
+        for name, write in writers.items():
+            kb._snapshots.clear()  # time the encoding too, not just the cached snapshot
+            start = time.perf_counter()
+            payload = write()
+            elapsed = time.perf_counter() - start
+            baseline = baseline or len(payload)
+            gzipped = len(gzip.compress(payload, 6)) if name != "columnar" else len(payload)
+            print(f"  {name:<13} {len(payload) / 1e3:10.1f} kB ({len(payload) / baseline:5.1%})  "
+                  f"gzip {gzipped / 1e3:9.1f} kB  {elapsed * 1e3:8.1f} ms")
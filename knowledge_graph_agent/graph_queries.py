@@ -0,0 +1,222 @@
+"""
+Read queries over a KnowledgeBase with bounded cost.
+
+Neighbourhoods and paths walk the triple store's SPO (out-edges) and OSP
+(in-edges) indexes lazily, and every query has a node budget plus a scan
+budget on the number of triples it may look at. Neighbourhood queries only
+touch the nodes they return, so a hub with a million edges costs the same
+as a leaf and latency does not grow with the graph; path searches are
+capped by their scan budget. Listings page through the knowledge base's
+insertion logs with integer cursors.
+"""
+import time
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .graph_tools import KnowledgeBase
+
+Triple = Tuple[str, str, str]
+
+
+class UnknownEntityError(KeyError):
+    """Raised when a query names an entity that is not in the graph."""
+
+
+def _resolve(kb: KnowledgeBase, name: str) -> str:
+    node = kb.entities.lookup(name) or name
+    if not kb.store.has_node(node):
+        raise UnknownEntityError(name)
+    return node
+
+
+def _incident(kb: KnowledgeBase, node: str) -> Iterator[Triple]:
+    return chain(kb.store.match(subject=node), kb.store.match(object_=node))
+
+
+def _edge(triple: Triple) -> Dict[str, str]:
+    s, p, o = triple
+    return {"source": s, "target": o, "relation": p}
+
+
+def neighborhood(kb: KnowledgeBase, node: str, hops: int = 1, max_nodes: int = 100,
+                 max_edges: int = 500, max_scan: Optional[int] = None) -> Dict[str, Any]:
+    """
+    The subgraph within `hops` of `node` (edges in either direction); hops=1 is
+    the ego network. Nodes are taken in BFS order up to `max_nodes`, then every
+    edge among them is collected up to `max_edges`. `truncated` is set when a
+    budget cut the result short.
+    """
+    center = _resolve(kb, node)
+    budget = max_scan if max_scan is not None else 50 * (max_nodes + max_edges)
+    visited = {center: 0}
+    frontier = [center]
+    truncated = False
+
+    for depth in range(1, hops + 1):
+        next_frontier = []
+        for current in frontier:
+            for s, _, o in _incident(kb, current):
+                budget -= 1
+                if budget < 0:
+                    truncated = True
+                    break
+                other = o if s == current else s
+                if other in visited:
+                    continue
+                if len(visited) >= max_nodes:
+                    truncated = True  # a node within reach is left out
+                    break
+                visited[other] = depth
+                next_frontier.append(other)
+            if truncated:
+                break
+        frontier = next_frontier
+        if truncated or not frontier:
+            break
+
+    # Induced edges among the kept nodes. For each node, either scan its out-edges
+    # or probe the SPO index once per kept node, whichever touches fewer triples,
+    # so hubs cost O(max_nodes) rather than O(degree).
+    edges: List[Dict[str, str]] = []
+    for current in visited:
+        if kb.store.out_degree(current) <= len(visited):
+            candidates = kb.store.match(subject=current)
+        else:
+            candidates = chain.from_iterable(kb.store.match(current, None, other) for other in visited)
+        full = False
+        for triple in candidates:
+            budget -= 1
+            if budget < 0:
+                break
+            if triple[2] in visited:
+                if len(edges) >= max_edges:
+                    full = True  # an edge among the kept nodes is left out
+                    break
+                edges.append(_edge(triple))
+        if budget < 0 or full:
+            truncated = True
+            break
+
+    return {
+        "center": center,
+        "hops": hops,
+        "nodes": [{"id": name, "distance": distance} for name, distance in visited.items()],
+        "edges": edges,
+        "truncated": truncated,
+    }
+
+
+def shortest_path(kb: KnowledgeBase, source: str, target: str, max_hops: int = 6,
+                  max_scan: int = 200_000) -> Dict[str, Any]:
+    """
+    Shortest path between two entities, ignoring edge direction (the returned
+    edges keep their real direction). Bidirectional BFS, always expanding the
+    smaller frontier; gives up after `max_hops` or `max_scan` triples.
+    """
+    start, goal = _resolve(kb, source), _resolve(kb, target)
+    if start == goal:
+        return {"found": True, "nodes": [start], "edges": []}
+
+    # node -> (previous node, connecting triple), one map per search direction
+    parents: Tuple[Dict[str, Any], Dict[str, Any]] = ({start: None}, {goal: None})
+    frontiers = ([start], [goal])
+    budget = max_scan
+    meeting = None
+
+    for _ in range(max_hops):
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        seen, other_seen = parents[side], parents[1 - side]
+        next_frontier = []
+        for current in frontiers[side]:
+            for triple in _incident(kb, current):
+                budget -= 1
+                if budget < 0:
+                    return {"found": False, "nodes": [], "edges": [], "truncated": True}
+                s, _, o = triple
+                neighbor = o if s == current else s
+                if neighbor in seen:
+                    continue
+                seen[neighbor] = (current, triple)
+                if neighbor in other_seen:
+                    meeting = neighbor
+                    break
+                next_frontier.append(neighbor)
+            if meeting:
+                break
+        if meeting or not next_frontier:
+            break
+        frontiers = (next_frontier, frontiers[1]) if side == 0 else (frontiers[0], next_frontier)
+
+    if meeting is None:
+        return {"found": False, "nodes": [], "edges": [], "truncated": False}
+
+    def walk(seen: Dict[str, Any], node: str) -> Tuple[List[str], List[Triple]]:
+        nodes, triples = [], []
+        while seen[node] is not None:
+            node, triple = seen[node]
+            nodes.append(node)
+            triples.append(triple)
+        return nodes, triples
+
+    back_nodes, back_triples = walk(parents[0], meeting)
+    forward_nodes, forward_triples = walk(parents[1], meeting)
+    nodes = back_nodes[::-1] + [meeting] + forward_nodes
+    triples = back_triples[::-1] + forward_triples
+    return {"found": True, "nodes": nodes, "edges": [_edge(t) for t in triples]}
+
+
+def _page(log: List[Any], cursor: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    try:
+        offset = int(cursor) if cursor else 0
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    items = log[offset:offset + limit]
+    end = offset + len(items)
+    return items, (str(end) if end < len(log) else None)
+
+
+def list_nodes(kb: KnowledgeBase, cursor: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+    """One page of nodes in insertion order. Pass `next_cursor` back to continue."""
+    items, next_cursor = _page(kb.node_log, cursor, limit)
+    return {"items": items, "next_cursor": next_cursor, "total": len(kb.node_log)}
+
+
+def list_edges(kb: KnowledgeBase, cursor: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+    """One page of edges in insertion order. Pass `next_cursor` back to continue."""
+    items, next_cursor = _page(kb.edge_log, cursor, limit)
+    return {"items": [_edge(t) for t in items], "next_cursor": next_cursor, "total": len(kb.edge_log)}
+
+
+if __name__ == "__main__":
+    # Latency vs graph size: python -m knowledge_graph_agent.graph_queries
+    import random
+
+    for size in (10_000, 100_000, 500_000):
+        rng = random.Random(size)
+        kb = KnowledgeBase()
+        entities = [f"entity {i}" for i in range(size // 4)]
+        # Skewed degrees, so some queries hit large hubs
+        for start in range(0, size, 5000):
+            batch = [(entities[int(rng.paretovariate(1.2)) % len(entities)], "rel", rng.choice(entities))
+                     for _ in range(5000)]
+            for s, p, o in batch:
+                if kb.store.add(s, p, o):
+                    kb.edge_log.append((s, p, o))
+        kb.node_log = kb.store.nodes()
+        for entity in kb.node_log:
+            kb.entities.register(entity)
+        probes = [rng.choice(kb.node_log) for _ in range(200)]
+        timings = {}
+        for name, fn in (
+            ("ego", lambda n: neighborhood(kb, n)),
+            ("2-hop", lambda n: neighborhood(kb, n, hops=2, max_nodes=200)),
+            ("path", lambda n: shortest_path(kb, n, probes[0])),
+            ("edges page", lambda n: list_edges(kb, str(len(kb.edge_log) // 2), 100)),
+        ):
+            start = time.perf_counter()
+            for probe in probes:
+                fn(probe)
+            timings[name] = (time.perf_counter() - start) / len(probes) * 1e3
+        print(f"{len(kb.store):>7} edges  " + "  ".join(f"{k} {v:6.3f} ms" for k, v in timings.items()))
@@ -1,32 +1,392 @@
-import networkx as nx
-import matplotlib.pyplot as plt
-from typing import List, Dict, Any
-from datetime import datetime
 import os
+import time
+from collections import OrderedDict
+import asyncio
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+from google.adk.tools.tool_context import ToolContext
+from .rendering import RENDER_MAX_EDGES, RENDER_MAX_NODES, render_graph
+from .layout import LAYOUT_MODES, compute_layout
+from .metrics import LAYOUT_DURATION
+from .importance import compute_importance
+from .communities import community_levels, summarize
+from .canonical import EntityIndex
+from .triplestore import TripleStore
+from .search import SearchIndex
 
 class KnowledgeBase:
     def __init__(self):
-        self.graph = nx.DiGraph()
+        self.store = TripleStore()
+        self.aliases: Dict[str, List[str]] = {}
+        self.image_artifact = None
+        self.render_stats = None
+        self.positions: Dict[str, Dict[str, Tuple[float, float]]] = {}
+        self.entities = EntityIndex()
+        # Names, aliases and predicates, searchable by word and prefix (see search.py).
+        self.text_index = SearchIndex()
+        self._graph = None
+        # Append-only change log: entry i moves the graph from version i to i + 1.
+        self.changes: List[Tuple[str, Any]] = []
+        # The same additions split by kind, so cursors can index straight into them.
+        self.node_log: List[str] = []
+        self.edge_log: List[Tuple[str, str, str]] = []
+        self._snapshots: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        # Write-ahead journal of add_triplets batches, when the run is checkpointed (see checkpoint.py).
+        self.journal = None
 
-    def add_triplet(self, subject: str, predicate: str, object_: str):
-        self.graph.add_edge(subject, object_, relation=predicate)
+    @property
+    def version(self) -> int:
+        """Monotonic graph version; bumps once per added node or triplet."""
+        return len(self.changes)
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "KnowledgeBase":
+        """Rebuilds a knowledge base from `get_state()` output, keeping its node names exactly."""
+        kb = cls()
+        aliases = state.get("aliases", {})
+        for node in state.get("nodes", []):
+            kb.entities.register(node, tuple(aliases.get(node, ())))
+            kb.store.add_node(node)
+            kb.aliases[node] = list(aliases.get(node, [node]))
+            kb.text_index.add_entity(node)
+            for alias in kb.aliases[node]:
+                kb.text_index.add_entity(node, alias)
+            kb.changes.append(("node", node))
+            kb.node_log.append(node)
+        for edge in state.get("edges", []):
+            triplet = (edge["source"], edge["relation"], edge["target"])
+            if kb.store.add(*triplet):
+                kb.text_index.add_predicate(triplet[1])
+                kb.changes.append(("edge", triplet))
+                kb.edge_log.append(triplet)
+        return kb
+
+    def num_nodes(self) -> int:
+        return self.store.num_nodes()
+
+    def num_edges(self) -> int:
+        return len(self.store)
+
+    @property
+    def graph(self) -> "nx.MultiDiGraph":
+        """NetworkX view of the store (one edge per triplet), rebuilt only after changes."""
+        import networkx as nx
+
+        if self._graph is None:
+            self._graph = self.store.to_networkx()
+            nx.set_node_attributes(self._graph, self.aliases, "aliases")
+        return self._graph
+
+    def canonical(self, name: str) -> str:
+        """
+        Resolves an entity name to its canonical node key, so that "Harry Potter",
+        "harry potter" and "Harry  Potter" all land on the same node.
+        The surface form is kept in the node's 'aliases' attribute.
+        """
+        name = name.strip()
+        key = self.entities.resolve(name)
+        if not self.store.has_node(key):
+            self.store.add_node(key)
+            self.aliases[key] = [name]
+            self.text_index.add_entity(key)
+            if name != key:
+                self.text_index.add_entity(key, name)
+            self.changes.append(("node", key))
+            self.node_log.append(key)
+            self._graph = None
+        else:
+            aliases = self.aliases.setdefault(key, [key])
+            if name not in aliases:
+                aliases.append(name)
+                self.text_index.add_entity(key, name)
+        return key
+
+    def add_triplet(self, subject: str, predicate: str, object_: str) -> Tuple[str, str, str]:
+        return self.add_triplets([(subject, predicate, object_)])[0]
+
+    def add_triplets(self, triplets: List[Tuple[str, str, str]]) -> List[Tuple[str, str, str]]:
+        """Inserts many (subject, predicate, object) triplets in one pass, logging the new ones."""
+        return [triplet for triplet, _ in self.insert_triplets(triplets)]
+
+    def insert_triplets(self, triplets: List[Tuple[str, str, str]]) -> List[Tuple[Tuple[str, str, str], bool]]:
+        """Like `add_triplets`, but pairs each canonical triplet with whether it was new to the graph."""
+        if self.journal is not None and triplets:
+            # Raw surface forms, so a replay canonicalizes exactly as this call does.
+            self.journal.append(triplets)
+        resolved = [
+            (self.canonical(subject), predicate, self.canonical(object_))
+            for subject, predicate, object_ in triplets
+        ]
+        inserted = []
+        for triplet in resolved:
+            new = self.store.add(*triplet)
+            if new:
+                self.text_index.add_predicate(triplet[1])
+                self.changes.append(("edge", triplet))
+                self.edge_log.append(triplet)
+                self._graph = None
+            inserted.append((triplet, new))
+        return inserted
+
+    def get_delta(self, since_version: int) -> Dict[str, Any]:
+        """Returns only the nodes and edges added after `since_version`, in O(size of the delta)."""
+        since_version = max(0, min(since_version, self.version))
+        nodes, edges = [], []
+        for kind, item in self.changes[since_version:]:
+            if kind == "node":
+                nodes.append(item)
+            else:
+                s, p, o = item
+                edges.append({"source": s, "target": o, "relation": p})
+        return {"version": self.version, "since_version": since_version, "nodes": nodes, "edges": edges}
+
+    def _snapshot(self, kind: str, build) -> Dict[str, Any]:
+        cached = self._snapshots.get(kind)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        version = self.version
+        result = build()
+        # Only cache what was built from one version: a build in a worker thread
+        # that overlapped a change may mix both, and would outlive it unnoticed.
+        if self.version == version:
+            self._snapshots[kind] = (version, result)
+        return result
+
+    def get_compact_state(self) -> Dict[str, Any]:
+        """
+        Token-friendly full snapshot: nodes are listed once and edges refer to them
+        by index as [source, relation, target]. Cached until the next change.
+        """
+        def build():
+            nodes = self.store.nodes()
+            index = {node: i for i, node in enumerate(nodes)}
+            return {
+                "version": self.version,
+                "nodes": nodes,
+                "edges": [[index[s], p, index[o]] for s, p, o in self.store.match()],
+            }
+        return self._snapshot("compact", build)
+
+    def get_encoded_state(self) -> Dict[str, Any]:
+        """
+        Fully dictionary-encoded snapshot for export (see export.py): nodes and
+        predicates listed once, edges as [source, predicate, target] index triples.
+        Cached until the next change.
+        """
+        def build():
+            nodes, predicates, triples = self.store.encode()
+            return {"version": self.version, "nodes": nodes, "predicates": predicates, "edges": triples}
+        return self._snapshot("encoded", build)
+
+    def match(self, subject: Optional[str] = None, predicate: Optional[str] = None,
+              object_: Optional[str] = None) -> List[Tuple[str, str, str]]:
+        """Returns the triplets matching a pattern; None is a wildcard. Entity names are canonicalized."""
+        if subject is not None:
+            subject = self.entities.lookup(subject) or subject
+        if object_ is not None:
+            object_ = self.entities.lookup(object_) or object_
+        return list(self.store.match(subject, predicate, object_))
+
+    def _degree(self, node: str) -> int:
+        return self.store.out_degree(node) + self.store.in_degree(node)
+
+    def search(self, query: str, limit: int = 20, kind: Optional[str] = None) -> Dict[str, Any]:
+        """Entities (by name or alias) and predicates matching `query`, best first; see SearchIndex.search."""
+        return self.text_index.search(query, limit=limit, kind=kind, degree=self._degree)
+
+    def autocomplete(self, prefix: str, limit: int = 10, kind: Optional[str] = None) -> Dict[str, Any]:
+        """Completions for a partly typed entity or predicate name, best first."""
+        return self.text_index.complete(prefix, limit=limit, kind=kind, degree=self._degree)
 
     def reset(self):
-        self.graph.clear()
+        self.store.clear()
+        self.aliases = {}
+        self.entities = EntityIndex()
+        self.text_index = SearchIndex()
+        self.image_artifact = None
+        self.render_stats = None
+        self.positions = {}
+        self._graph = None
+        self.changes = []
+        self.node_log = []
+        self.edge_log = []
+        self._snapshots = {}
+
+    def compute_layout(self, mode: str = "force") -> Dict[str, Tuple[float, float]]:
+        """
+        Lays out the graph, warm-starting from this mode's previous positions.
+        Cached until the graph changes, so only the first request per version pays for it.
+        """
+        def build():
+            started = time.perf_counter()
+            self.positions[mode] = compute_layout(
+                self.store.nodes(), [(s, o) for s, _, o in self.store.match()],
+                mode=mode, initial=self.positions.get(mode)
+            )
+            LAYOUT_DURATION.observe(time.perf_counter() - started, mode=mode)
+            return self.positions[mode]
+        if mode not in LAYOUT_MODES:
+            raise ValueError(f"Unknown layout mode {mode!r}; choose one of {', '.join(LAYOUT_MODES)}")
+        return self._snapshot(f"layout:{mode}", build)
+
+    def get_layout(self, mode: str = "force") -> Dict[str, Any]:
+        """Node coordinates for one layout mode, as served to clients."""
+        positions = self.compute_layout(mode)
+        return {"version": self.version, "mode": mode,
+                "positions": {node: list(xy) for node, xy in positions.items()}}
+
+    def compute_importance(self) -> Dict[str, Any]:
+        """
+        Node importance (degree, PageRank, sampled betweenness) plus the edge list
+        ordered by descending importance. Cached until the graph changes.
+        """
+        def build():
+            edges = self._full_state()["edges"]
+            scores = compute_importance(self.store.nodes(), [(e["source"], e["target"]) for e in edges])
+            ranked = sorted(
+                ({**edge, "importance": score} for edge, score in zip(edges, scores["edges"])),
+                key=lambda edge: edge["importance"], reverse=True,
+            )
+            return {"nodes": scores["nodes"], "edges": ranked}
+        return self._snapshot("importance", build)
+
+    def get_importance(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Node importance scores and the `limit` most important edges (all of them by default)."""
+        importance = self.compute_importance()
+        return {"version": self.version, "nodes": importance["nodes"], "edges": importance["edges"][:limit]}
 
-    def get_state(self) -> Dict[str, Any]:
-        return {
-            "nodes": list(self.graph.nodes()),
+    def compute_communities(self) -> Dict[str, Any]:
+        """
+        Nested community assignments (see communities.py) plus the graph as index
+        arrays, which is all `get_summary` needs. Cached until the graph changes.
+        """
+        def build():
+            nodes = self.store.nodes()
+            index = {node: i for i, node in enumerate(nodes)}
+            triples = list(self.store.match())
+            predicates = sorted({p for _, p, _ in triples})
+            predicate_index = {p: i for i, p in enumerate(predicates)}
+            src = np.array([index[s] for s, _, _ in triples], dtype=np.int64)
+            dst = np.array([index[o] for _, _, o in triples], dtype=np.int64)
+            return {
+                "nodes": nodes,
+                "src": src,
+                "dst": dst,
+                "pred": np.array([predicate_index[p] for _, p, _ in triples], dtype=np.int64),
+                "predicates": predicates,
+                # Degree decides which member names a community.
+                "degree": np.bincount(src, minlength=len(nodes)) + np.bincount(dst, minlength=len(nodes)),
+                "levels": community_levels(len(nodes), src, dst),
+            }
+        return self._snapshot("communities", build)
+
+    def get_summary(self, max_nodes: int = 100, max_edges: int = 300, level: Optional[int] = None,
+                    community: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Level-of-detail view: communities collapsed into super-nodes so that at most
+        `max_nodes` nodes and `max_edges` edges come back, whatever the graph size.
+        Pass a community ID from a previous summary to zoom into it.
+        """
+        data = self.compute_communities()
+        summary = summarize(data["nodes"], data["src"], data["dst"], data["pred"], data["predicates"],
+                            data["levels"], data["degree"], max_nodes=max_nodes, max_edges=max_edges,
+                            level=level, community=community)
+        summary["version"] = self.version
+        return summary
+
+    def _full_state(self) -> Dict[str, Any]:
+        return self._snapshot("full", lambda: {
+            "nodes": self.store.nodes(),
             "edges": [
-                {"source": u, "target": v, "relation": d["relation"]}
-                for u, v, d in self.graph.edges(data=True)
+                {"source": s, "target": o, "relation": p}
+                for s, p, o in self.store.match()
             ]
-        }
+        })
+
+    def get_state(self, include_positions: bool = False, include_importance: bool = False) -> Dict[str, Any]:
+        # The node/edge lists are cached per version; callers get a fresh top-level dict.
+        state = dict(self._full_state())
+        if include_importance:
+            # Most important edges first, so clients take the top k as edges[:k].
+            importance = self.compute_importance()
+            state["edges"] = importance["edges"]
+            state["node_importance"] = importance["nodes"]
+        # Only report surface forms that were actually merged, to keep the payload small.
+        aliases = {node: forms for node, forms in self.aliases.items() if len(forms) > 1}
+        if aliases:
+            state["aliases"] = aliases
+        if include_positions:
+            # Coordinates per layout mode, so clients can draw without running physics.
+            state["positions"] = {mode: self.get_layout(mode)["positions"] for mode in LAYOUT_MODES}
+        return state
+
+# Request-scoped Knowledge Bases, keyed by session ID.
+# Each run gets its own graph so concurrent requests never share state.
+_knowledge_bases: Dict[str, KnowledgeBase] = {}
+
+def create_kb(session_id: str) -> KnowledgeBase:
+    """Creates and registers a fresh KnowledgeBase for a session."""
+    kb = KnowledgeBase()
+    _knowledge_bases[session_id] = kb
+    return kb
+
+def get_kb(session_id: str) -> KnowledgeBase:
+    """Returns the KnowledgeBase for a session, creating it on first use."""
+    kb = _knowledge_bases.get(session_id)
+    if kb is None:
+        kb = create_kb(session_id)
+    return kb
 
-# Global Knowledge Base instance
-kb = KnowledgeBase()
+def release_kb(session_id: str) -> None:
+    """Drops the KnowledgeBase for a session once the run is finished."""
+    _knowledge_bases.pop(session_id, None)
 
-def add_triplet(subject: str, predicate: str, object_: str) -> str:
+# Finished graphs kept for the query API, keyed by graph ID (the run's session ID).
+# Only the most recently used KG_GRAPH_RETENTION graphs stay in memory.
+GRAPH_RETENTION = int(os.environ.get("KG_GRAPH_RETENTION", "32"))
+_finished_graphs: "OrderedDict[str, KnowledgeBase]" = OrderedDict()
+
+def retain_kb(session_id: str) -> None:
+    """Moves a finished run's KnowledgeBase into the bounded set of queryable graphs."""
+    kb = _knowledge_bases.pop(session_id, None)
+    if kb is None:
+        return
+    _finished_graphs[session_id] = kb
+    while len(_finished_graphs) > GRAPH_RETENTION:
+        _finished_graphs.popitem(last=False)
+
+def find_graph(graph_id: str, running: bool = True) -> Optional[KnowledgeBase]:
+    """
+    Returns a finished (or, unless `running` is False, still running) graph by
+    ID, or None if unknown or evicted.
+    """
+    kb = _finished_graphs.get(graph_id)
+    if kb is not None:
+        _finished_graphs.move_to_end(graph_id)
+        return kb
+    return _knowledge_bases.get(graph_id) if running else None
+
+def restore_kb(graph_id: str, graph_state: Dict[str, Any]) -> KnowledgeBase:
+    """Makes a graph queryable again from its serialized state (e.g. after a topic-cache hit)."""
+    kb = find_graph(graph_id)
+    if kb is None:
+        kb = KnowledgeBase.from_state(graph_state)
+        _knowledge_bases[graph_id] = kb
+        retain_kb(graph_id)
+    return kb
+
+def graph_id_for(tool_context: ToolContext) -> str:
+    """
+    The graph a tool call writes to: the session's own, unless the session
+    state names another one (ingestion runs one short session per chunk,
+    all writing into the same graph).
+    """
+    return tool_context.state.get("graph_id") or tool_context.session.id
+
+def _resolve_kb(tool_context: ToolContext) -> KnowledgeBase:
+    return get_kb(graph_id_for(tool_context))
+
+def add_triplet(subject: str, predicate: str, object_: str, tool_context: ToolContext) -> Dict[str, Any]:
     """
     Adds a fact (triplet) to the Knowledge Graph.
     
@@ -36,54 +396,104 @@ def add_triplet(subject: str, predicate: str, object_: str) -> str:
         object_: The target entity (e.g., "Ron Weasley").
         
     Returns:
-        A confirmation message.
+        A dictionary with the 'status' ("success", or "duplicate" if the graph already
+        had the fact), a confirmation 'message' and the stored 'triplet'.
     """
-    kb.add_triplet(subject, predicate, object_)
-    return f"Added: ({subject}) -[{predicate}]-> ({object_})"
+    [((subject, predicate, object_), new)] = _resolve_kb(tool_context).insert_triplets([(subject, predicate, object_)])
+    return {
+        "status": "success" if new else "duplicate",
+        "message": f"{'Added' if new else 'Already known'}: ({subject}) -[{predicate}]-> ({object_})",
+        "triplet": {"subject": subject, "predicate": predicate, "object": object_},
+    }
 
-def get_graph_state() -> Dict[str, Any]:
+def add_triplets(triplets: List[Dict[str, str]], tool_context: ToolContext) -> Dict[str, Any]:
     """
-    Retrieves the current state of the Knowledge Graph (nodes and edges).
+    Adds many facts (triplets) to the Knowledge Graph in a single call.
+    Prefer this over calling `add_triplet` once per fact.
     
+    Args:
+        triplets: A list of facts, each with "subject", "predicate" and "object" keys
+            (e.g., {"subject": "Harry Potter", "predicate": "is friend of", "object": "Ron Weasley"}).
+        
     Returns:
-        A dictionary containing a list of 'nodes' and 'edges'.
+        A dictionary with the number of new triplets 'added', the number of 'duplicates'
+        already in the graph, and a per-item list of 'results'.
     """
-    return kb.get_state()
+    valid = []
+    slots = []
+    results = []
+    for item in triplets:
+        subject = str(item.get("subject", "")).strip()
+        predicate = str(item.get("predicate", "")).strip()
+        object_ = str(item.get("object", item.get("object_", ""))).strip()
+        if not (subject and predicate and object_):
+            results.append({"status": "error", "message": f"Missing subject, predicate or object in {item}"})
+            continue
+        valid.append((subject, predicate, object_))
+        slots.append(len(results))
+        results.append(None)
+    
+    # Report the canonical entity names the triplets were stored under.
+    added = duplicates = 0
+    for slot, ((subject, predicate, object_), new) in zip(slots, _resolve_kb(tool_context).insert_triplets(valid)):
+        if new:
+            added += 1
+        else:
+            duplicates += 1
+        results[slot] = {
+            "status": "success" if new else "duplicate",
+            "message": f"{'Added' if new else 'Already known'}: ({subject}) -[{predicate}]-> ({object_})",
+            "triplet": {"subject": subject, "predicate": predicate, "object": object_},
+        }
+    return {"added": added, "duplicates": duplicates, "results": results}
 
-def save_graph_image() -> str:
+def get_graph_state(tool_context: ToolContext, since_version: int = 0) -> Dict[str, Any]:
     """
-    Generates a visualization of the current knowledge graph and saves it as a PNG file.
-    The file is saved in the 'examples/' directory with a unique timestamp.
-    Returns the path to the saved image.
-    """
-    G = kb.graph
+    Retrieves the current state of the Knowledge Graph.
     
-    if G.number_of_nodes() == 0:
-        return "Graph is empty. Nothing to visualize."
+    Args:
+        since_version: The 'version' returned by a previous call. When given, only the
+            nodes and edges added since then are returned.
         
-    plt.figure(figsize=(12, 8))
-    pos = nx.spring_layout(G, k=0.5) # Removed iterations=50 as it's not in the new snippet
-    
-    # Draw nodes
-    nx.draw_networkx_nodes(G, pos, node_size=2000, node_color="lightblue", alpha=0.9)
-    nx.draw_networkx_labels(G, pos, font_size=10, font_weight="bold")
-    
-    # Draw edges
-    nx.draw_networkx_edges(G, pos, edge_color="gray", arrows=True, arrowsize=20)
-    edge_labels = nx.get_edge_attributes(G, "relation")
-    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_size=8)
-    
-    # Ensure examples directory exists
-    os.makedirs("examples", exist_ok=True)
+    Returns:
+        A dictionary with the graph 'version', and either the changes since `since_version`
+        ('nodes' and 'edges' added), or the full graph as 'nodes' plus 'edges' given as
+        [source_index, relation, target_index] into the node list.
+    """
+    kb = _resolve_kb(tool_context)
+    if since_version > 0:
+        return kb.get_delta(since_version)
+    return kb.get_compact_state()
+
+async def save_graph_image(tool_context: ToolContext) -> str:
+    """
+    Generates a visualization of the current knowledge graph and saves it as a PNG artifact.
+    Returns the ID of the saved image artifact.
+    """
+    kb = _resolve_kb(tool_context)
     
-    # Generate unique filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"examples/graph_{timestamp}.png"
+    if kb.store.num_nodes() == 0:
+        return "Graph is empty. Nothing to visualize."
     
-    plt.title("Knowledge Graph Visualization")
-    plt.axis("off") # Keep axis off for cleaner visualization
-    plt.tight_layout() # Keep tight layout
-    plt.savefig(filename)
-    plt.close()
+    # Layout and rasterization run in a separate process so the event loop
+    # (and every other run sharing it) is never blocked by matplotlib.
+    options = None
+    if kb.num_nodes() <= RENDER_MAX_NODES:
+        nodes = kb.store.nodes()
+        edges = [(s, o, p) for s, p, o in kb.store.match()]
+    else:
+        # Too big to draw legibly: draw communities instead, so the cost depends
+        # on RENDER_MAX_NODES rather than on the size of the graph.
+        summary = await asyncio.to_thread(kb.get_summary, RENDER_MAX_NODES, RENDER_MAX_EDGES)
+        labels = {node["id"]: node["label"] for node in summary["nodes"]}
+        nodes = list(labels.values())
+        edges = [(labels[e["source"]], labels[e["target"]], e["relation"]) for e in summary["edges"]]
+        options = {
+            "node_sizes": {node["label"]: node["size"] for node in summary["nodes"]},
+            "title": f"Knowledge Graph Overview ({kb.num_nodes()} entities, {len(nodes)} communities)",
+        }
+    artifact_id, timings = await render_graph(nodes, edges, options)
     
-    return filename
+    kb.image_artifact = artifact_id
+    kb.render_stats = timings
+    return f"Graph image saved as artifact {artifact_id}"
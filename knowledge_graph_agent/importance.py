@@ -0,0 +1,134 @@
+"""
+Node and edge importance scores, precomputed server-side so clients can show
+the most important part of a large graph by taking a prefix of the edge list.
+
+- degree: number of incident edges.
+- pagerank: power iteration on edge arrays (bincount mat-vecs, no scipy).
+- betweenness: Brandes' algorithm from a random sample of source nodes on the
+  undirected graph, accumulating node and edge dependencies in the same pass.
+
+Scores are normalized to [0, 1] by their maximum and blended into one
+`score` per node and per edge.
+"""
+import random
+import time
+from collections import deque
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+def pagerank(n: int, src: np.ndarray, dst: np.ndarray, damping: float = 0.85,
+             iterations: int = 100, tol: float = 1e-9) -> np.ndarray:
+    if n == 0:
+        return np.zeros(0)
+    out_degree = np.bincount(src, minlength=n).astype(float)
+    dangling = out_degree == 0
+    weights = np.zeros(len(src))
+    if len(src):
+        weights = 1.0 / out_degree[src]
+    rank = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        spread = np.bincount(dst, weights=rank[src] * weights, minlength=n)
+        new_rank = damping * (spread + rank[dangling].sum() / n) + (1 - damping) / n
+        if np.abs(new_rank - rank).sum() < tol:
+            return new_rank
+        rank = new_rank
+    return rank
+
+
+def sampled_betweenness(n: int, pairs: Sequence[Tuple[int, int]], samples: int = 64,
+                        seed: int = 42) -> Tuple[np.ndarray, Dict[Tuple[int, int], float]]:
+    """
+    Approximate node and edge betweenness (undirected, unweighted) from
+    `samples` BFS sources, scaled up to estimate the all-sources value.
+    Edge keys are (min, max) node index pairs.
+    """
+    adjacency: List[List[int]] = [[] for _ in range(n)]
+    for u, v in set((min(u, v), max(u, v)) for u, v in pairs if u != v):
+        adjacency[u].append(v)
+        adjacency[v].append(u)
+
+    node_score = np.zeros(n)
+    edge_score: Dict[Tuple[int, int], float] = {}
+    sources = range(n) if samples >= n else random.Random(seed).sample(range(n), samples)
+    for s in sources:
+        order, preds = [], [[] for _ in range(n)]
+        sigma = [0] * n
+        dist = [-1] * n
+        sigma[s], dist[s] = 1, 0
+        queue = deque([s])
+        while queue:
+            v = queue.popleft()
+            order.append(v)
+            for w in adjacency[v]:
+                if dist[w] < 0:
+                    dist[w] = dist[v] + 1
+                    queue.append(w)
+                if dist[w] == dist[v] + 1:
+                    sigma[w] += sigma[v]
+                    preds[w].append(v)
+        delta = [0.0] * n
+        for w in reversed(order):
+            for v in preds[w]:
+                share = sigma[v] / sigma[w] * (1 + delta[w])
+                key = (v, w) if v < w else (w, v)
+                edge_score[key] = edge_score.get(key, 0.0) + share
+                delta[v] += share
+            if w != s:
+                node_score[w] += delta[w]
+
+    # Each undirected path is counted from both ends, hence the halving.
+    scale = n / max(1, len(sources)) / 2
+    return node_score * scale, {key: value * scale for key, value in edge_score.items()}
+
+
+def _normalized(values: np.ndarray) -> np.ndarray:
+    top = values.max() if len(values) else 0
+    return values / top if top > 0 else np.zeros_like(values, dtype=float)
+
+
+def compute_importance(nodes: Sequence[str], edges: Sequence[Tuple[str, str]],
+                       samples: int = 64, seed: int = 42) -> Dict[str, Any]:
+    """
+    Returns {"nodes": {name: {degree, pagerank, betweenness, score}},
+    "edges": [score, ...]} with edge scores in the order of `edges`.
+    """
+    n = len(nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    pairs = [(index[u], index[v]) for u, v in edges]
+    src = np.array([u for u, _ in pairs], dtype=np.int64)
+    dst = np.array([v for _, v in pairs], dtype=np.int64)
+
+    degree = np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)
+    rank = pagerank(n, src, dst)
+    node_btw, edge_btw = sampled_betweenness(n, pairs, samples=samples, seed=seed)
+
+    node_score = 0.5 * _normalized(rank) + 0.3 * _normalized(node_btw) + 0.2 * _normalized(degree.astype(float))
+    raw_edge_btw = np.array([edge_btw.get((min(u, v), max(u, v)), 0.0) for u, v in pairs])
+    endpoints = np.array([(node_score[u] + node_score[v]) / 2 for u, v in pairs])
+    edge_score = 0.5 * _normalized(raw_edge_btw) + 0.5 * endpoints
+
+    return {
+        "nodes": {
+            node: {
+                "degree": int(degree[i]),
+                "pagerank": float(rank[i]),
+                "betweenness": float(node_btw[i]),
+                "score": round(float(node_score[i]), 6),
+            }
+            for node, i in index.items()
+        },
+        "edges": [round(float(score), 6) for score in edge_score],
+    }
+
+
+if __name__ == "__main__":
+    # Cost on random graphs: python -m knowledge_graph_agent.importance
+    for size in (1_000, 10_000):
+        rng = random.Random(size)
+        names = [f"n{i}" for i in range(size)]
+        links = [(f"n{rng.randrange(size)}", f"n{rng.randrange(size)}") for _ in range(2 * size)]
+        start = time.perf_counter()
+        compute_importance(names, links)
+        print(f"{size:>6} nodes, {len(links):>6} edges: {time.perf_counter() - start:.2f}s")
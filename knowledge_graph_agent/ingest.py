@@ -0,0 +1,219 @@
+"""
+Builds a knowledge graph from your own documents instead of a researched topic.
+
+Files are read in blocks and cut into overlapping chunks by generators, so
+only the chunks in flight are held in memory, whatever the size of the
+corpus. Each chunk goes to the ChunkOntologyAgent in a short session of its
+own, which is deleted as soon as the chunk is done. At most `concurrency`
+chunks are extracted at once, and the reader waits for a free worker
+(backpressure) instead of running ahead. Every session writes into the same
+KnowledgeBase, whose entity index merges entities across chunks as they land.
+
+    python -m knowledge_graph_agent.ingest docs/ notes.txt --concurrency 8 --out graph.json
+"""
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, AsyncGenerator, Dict, Iterable, Iterator, Sequence, Tuple
+
+from google.genai import types
+
+from .agents import chunk_ontology_agent
+from .corpus import merge_run
+from .graph_tools import create_kb, release_kb, retain_kb
+from .runtime import get_runtime
+
+APP_NAME = "KnowledgeGraphIngest"
+DOCUMENT_EXTENSIONS = (".txt", ".md", ".markdown", ".rst")
+
+
+def iter_documents(paths: Sequence[str], extensions: Tuple[str, ...] = DOCUMENT_EXTENSIONS) -> Iterator[str]:
+    """Yields files in order; directories are walked recursively for files with `extensions`."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(extensions):
+                    yield os.path.join(root, name)
+
+
+def read_blocks(path: str, block_chars: int = 1 << 16) -> Iterator[str]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(block_chars)
+            if not block:
+                return
+            yield block
+
+
+def _cut(buffer: str, chunk_chars: int) -> int:
+    """Where to end a chunk: the last paragraph break, line break, sentence end or space in its second half."""
+    for separator in ("\n\n", "\n", ". ", " "):
+        at = buffer.rfind(separator, chunk_chars // 2, chunk_chars)
+        if at != -1:
+            return at + len(separator)
+    return chunk_chars
+
+
+def iter_chunks(blocks: Iterable[str], chunk_chars: int = 3000, overlap: int = 200) -> Iterator[str]:
+    """
+    Cuts a stream of text blocks into chunks of at most `chunk_chars` characters,
+    ending on natural boundaries where possible. Each chunk starts with the last
+    ~`overlap` characters of the previous one, so a statement split by a
+    boundary is still seen whole in one of them.
+    """
+    if not 0 <= overlap < chunk_chars // 2:
+        raise ValueError("overlap must be less than half of chunk_chars")
+    buffer, fresh = "", 0  # `fresh` counts trailing characters not yet in any chunk
+    for block in blocks:
+        buffer += block
+        fresh += len(block)
+        while len(buffer) >= chunk_chars:
+            cut = _cut(buffer, chunk_chars)
+            yield buffer[:cut]
+            # Start the overlap on a word boundary.
+            start = buffer.find(" ", cut - overlap, cut) + 1 or cut - overlap
+            fresh = len(buffer) - cut
+            buffer = buffer[start:]
+    if fresh and buffer[len(buffer) - fresh:].strip():
+        yield buffer
+
+
+def iter_corpus(paths: Sequence[str], chunk_chars: int = 3000, overlap: int = 200) -> Iterator[Tuple[str, str]]:
+    """(document path, chunk) pairs for every document under `paths`, lazily."""
+    for path in iter_documents(paths):
+        for chunk in iter_chunks(read_blocks(path), chunk_chars, overlap):
+            yield path, chunk
+
+
+async def stream_ingest(paths: Sequence[str], user_id: str = "user_1", concurrency: int = 4,
+                        chunk_chars: int = 3000, overlap: int = 200,
+                        progress_interval: float = 1.0) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Extracts a graph from the documents under `paths` and yields:
+    - {"type": "progress", ...}: counts plus chunks/s and triplets/s, every `progress_interval` seconds.
+    - {"type": "done", "result": {"graph_id", "stats"}}: the graph stays queryable
+      through the /graphs API under `graph_id`.
+    A chunk whose extraction fails is counted in `failed_chunks` and skipped.
+    """
+    graph_id = uuid.uuid4().hex
+    kb = create_kb(graph_id)
+    runtime = get_runtime()
+    session_service = runtime.session_service
+    runner = runtime.runner(chunk_ontology_agent, APP_NAME)
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    progress = {"documents": 0, "chunks": 0, "failed_chunks": 0, "chars": 0}
+    started = time.perf_counter()
+
+    async def read():
+        # Blocks are small, so reading them on the event loop is cheap.
+        current = None
+        for path, chunk in iter_corpus(paths, chunk_chars, overlap):
+            if path != current:
+                progress["documents"] += 1
+                current = path
+            await chunks.put(chunk)  # waits while every worker is busy
+        for _ in range(concurrency):
+            await chunks.put(None)
+
+    async def extract(chunk: str):
+        session_id = uuid.uuid4().hex
+        await session_service.create_session(app_name=APP_NAME, user_id=user_id, session_id=session_id,
+                                             state={"graph_id": graph_id})
+        message = types.Content(role="user", parts=[types.Part(text=f"Research text:\n{chunk}")])
+        try:
+            async for _ in runner.run_async(user_id=user_id, session_id=session_id, new_message=message):
+                pass
+        finally:
+            # Drop the chunk's conversation at once, so memory does not grow with the corpus.
+            await session_service.delete_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+
+    async def work():
+        while (chunk := await chunks.get()) is not None:
+            try:
+                await extract(chunk)
+            except Exception as e:
+                progress["failed_chunks"] += 1
+                print(f"⚠️ Chunk extraction failed: {e}")
+            progress["chunks"] += 1
+            progress["chars"] += len(chunk)
+
+    def snapshot() -> Dict[str, Any]:
+        elapsed = time.perf_counter() - started
+        return {
+            **progress,
+            "nodes": kb.num_nodes(),
+            "triplets": kb.num_edges(),
+            "elapsed_s": elapsed,
+            "chunks_per_s": progress["chunks"] / elapsed if elapsed else 0.0,
+            "triplets_per_s": kb.num_edges() / elapsed if elapsed else 0.0,
+        }
+
+    tasks = [asyncio.create_task(read())] + [asyncio.create_task(work()) for _ in range(concurrency)]
+    finished = False
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=progress_interval,
+                                               return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()  # surfaces reader errors such as an unreadable file
+            yield {"type": "progress", **snapshot()}
+        finished = True
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # The plugin tracks every chunk session under the graph ID.
+        timings = runtime.plugin.get_stats(graph_id)["timings"]
+        runtime.plugin.discard(graph_id)
+        if finished:
+            retain_kb(graph_id)
+        else:
+            release_kb(graph_id)
+
+    stats = snapshot()
+    stats["timings"] = timings
+    corpus_stats = await merge_run(kb, graph_id, f"ingest: {', '.join(map(str, paths))}")
+    if corpus_stats:
+        stats["corpus"] = corpus_stats
+    yield {"type": "done", "result": {"graph_id": graph_id, "stats": stats}}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import sys
+
+    # Through main.py, which loads .env and installs the replay model when KG_REPLAY is set.
+    from knowledge_graph_agent.main import stream_ingest as _stream_ingest
+    from knowledge_graph_agent.graph_tools import find_graph
+
+    parser = argparse.ArgumentParser(description="Build a knowledge graph from local documents.")
+    parser.add_argument("paths", nargs="+", help="files or directories (.txt, .md, .rst)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--chunk-chars", type=int, default=3000)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--out", help="write the graph state as JSON to this file")
+    args = parser.parse_args()
+
+    async def cli():
+        result = None
+        async for update in _stream_ingest(args.paths, concurrency=args.concurrency,
+                                           chunk_chars=args.chunk_chars, overlap=args.overlap):
+            if update["type"] == "progress":
+                print(f"📄 {update['documents']} docs, {update['chunks']} chunks ({update['chunks_per_s']:.1f}/s), "
+                      f"{update['triplets']} triplets ({update['triplets_per_s']:.1f}/s)", file=sys.stderr)
+            else:
+                result = update["result"]
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(find_graph(result["graph_id"]).get_state(), f, ensure_ascii=False)
+        stats = {k: v for k, v in result["stats"].items() if k != "timings"}
+        print(json.dumps({"graph_id": result["graph_id"], "stats": stats}, indent=2))
+
+    asyncio.run(cli())
@@ -0,0 +1,155 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class Job:
+    def __init__(self, topic: str):
+        self.id = uuid.uuid4().hex
+        self.topic = topic
+        self.status = "queued"  # queued -> running -> succeeded | failed | cancelled | timed_out
+        self.progress: Dict[str, Any] = {"stage": None, "triplets": 0}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled", "timed_out")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "topic": self.topic,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    Runs graph generation jobs on a fixed pool of worker tasks.
+
+    The queue is bounded: `submit` raises QueueFullError instead of letting
+    work pile up, each job is limited to `job_timeout` seconds, and queued
+    or running jobs can be cancelled.
+    """
+
+    def __init__(self, workers: int = 2, max_queued: int = 16,
+                 job_timeout: float = 600, max_finished: int = 256):
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self.max_finished = max_finished
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        # Jobs waiting for a worker, oldest first. The semaphore counts submissions;
+        # a worker woken for a job that was cancelled meanwhile finds it gone.
+        self._pending: Deque[Job] = deque()
+        self._submitted: Optional[asyncio.Semaphore] = None
+        self._max_queued = max_queued
+        self._worker_tasks = []
+
+    def start(self):
+        self._submitted = asyncio.Semaphore(0)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def submit(self, topic: str) -> Job:
+        if len(self._pending) >= self._max_queued:
+            raise QueueFullError(f"Job queue is full ({self._max_queued} jobs waiting)")
+        job = Job(topic)
+        self._pending.append(job)
+        self._submitted.release()
+        self.jobs[job.id] = job
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job is None or job.done:
+            return job
+        if job.task is not None:
+            job.task.cancel()
+        else:
+            # Still queued: take it out of the queue, so it stops holding a slot.
+            self._pending.remove(job)
+            job.status = "cancelled"
+            job.finished_at = time.time()
+        return job
+
+    def get_stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queue_depth": len(self._pending),
+            "queue_capacity": self._max_queued,
+            "jobs": counts,
+        }
+
+    def _prune(self):
+        """Forgets the oldest finished jobs beyond `max_finished`."""
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            await self._submitted.acquire()
+            if not self._pending:
+                continue  # its job was cancelled while queued
+            job = self._pending.popleft()
+            job.task = asyncio.create_task(self._run(job))
+            await asyncio.gather(job.task, return_exceptions=True)
+
+    async def _run(self, job: Job):
+        # Imported here so that importing the server does not load the ADK stack (see warmup.py).
+        from knowledge_graph_agent.main import stream_agent
+
+        job.status = "running"
+        job.started_at = time.time()
+
+        async def drain():
+            async for update in stream_agent(job.topic):
+                if update["type"] == "text":
+                    job.progress["stage"] = update["agent"]
+                elif update["type"] == "triplet":
+                    job.progress["triplets"] += 1
+                elif update["type"] == "done":
+                    job.result = update["result"]
+
+        try:
+            await asyncio.wait_for(drain(), timeout=self.job_timeout)
+            job.status = "succeeded"
+        except asyncio.TimeoutError:
+            job.status = "timed_out"
+            job.error = f"Job exceeded {self.job_timeout}s"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            print(f"🧵 [JobQueue] Job {job.id} {job.status} after {job.finished_at - job.started_at:.1f}s")
@@ -1,94 +1,245 @@
 import asyncio
 import os
+import time
+import uuid
+from contextlib import aclosing
 from dotenv import load_dotenv
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.adk.memory import InMemoryMemoryService
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.genai import types
 
 # Load environment variables from .env file
 load_dotenv()
 
-from knowledge_graph_agent.architect import graph_architect
-from knowledge_graph_agent.observability import GraphBuilderPlugin
-from knowledge_graph_agent.graph_tools import kb
+from knowledge_graph_agent.architect import graph_architect, fanout_architect, PIPELINE_VERSION
+from knowledge_graph_agent.agents import MODEL_NAME
+from knowledge_graph_agent.cache import TopicCache
+from knowledge_graph_agent.checkpoint import CheckpointStore
+from knowledge_graph_agent.corpus import merge_run
+from knowledge_graph_agent.runtime import get_runtime
+from knowledge_graph_agent.graph_tools import create_kb, release_kb, retain_kb, restore_kb
+from knowledge_graph_agent.artifacts import get_artifact_store
+from knowledge_graph_agent.ingest import stream_ingest
 
+# Offline mode for benchmarks and demos: KG_REPLAY=synthetic or a recorded script path
+if os.environ.get("KG_REPLAY"):
+    from knowledge_graph_agent import replay
+    replay.install(
+        None if os.environ["KG_REPLAY"] == "synthetic" else os.environ["KG_REPLAY"],
+        latency_s=float(os.environ.get("KG_REPLAY_LATENCY", "0")),
+        latency_per_char_s=float(os.environ.get("KG_REPLAY_LATENCY_PER_CHAR", "0")),
+    )
 # Ensure API key is set (should be in environment from notebook setup)
-if "GOOGLE_API_KEY" not in os.environ:
+elif "GOOGLE_API_KEY" not in os.environ:
     print("⚠️ Warning: GOOGLE_API_KEY not found in environment variables.")
 
-async def run_agent(topic: str):
+artifact_store = get_artifact_store()
+
+# "sequential" (default) runs one research and one extraction agent;
+# "fanout" researches sub-topics and extracts from chunks in parallel (KG_FAN_OUT wide).
+PIPELINE_MODE = os.environ.get("KG_PIPELINE_MODE", "sequential")
+pipeline_agent = fanout_architect if PIPELINE_MODE == "fanout" else graph_architect
+
+# One Runner, session service and plugin for every run in this process
+# (sessions are bounded by KG_SESSION_RETENTION / KG_SESSION_TTL).
+APP_NAME = "KnowledgeGraphApp"
+runtime = get_runtime()
+runner = runtime.runner(pipeline_agent, APP_NAME)
+
+CACHE_DIR = os.environ.get("KG_CACHE_DIR", ".kg_cache")
+
+# Topic-level result cache shared by every request in this process
+topic_cache = TopicCache(
+    cache_dir=CACHE_DIR,
+    max_entries=int(os.environ.get("KG_CACHE_SIZE", "128")),
+    max_disk_entries=int(os.environ.get("KG_CACHE_DISK_SIZE", "10000")),
+    ttl_seconds=float(os.environ.get("KG_CACHE_TTL", str(24 * 3600))),
+    version=f"{PIPELINE_VERSION}:{MODEL_NAME}:{PIPELINE_MODE}",
+    artifacts=artifact_store,
+)
+
+# Stage checkpoints and triplet journals of unfinished runs, so a retry resumes them
+checkpoints = CheckpointStore(
+    os.environ.get("KG_CHECKPOINT_DIR", os.path.join(CACHE_DIR, "checkpoints")),
+    ttl_seconds=float(os.environ.get("KG_CHECKPOINT_TTL", str(24 * 3600))),
+)
+
+async def run_agent(topic: str, user_id: str = "user_1", use_cache: bool = True):
+    if not use_cache:
+        return await _run_pipeline(topic, user_id)
+
+    result, hit = await topic_cache.get_or_compute(topic, lambda: _run_pipeline(topic, user_id))
+    if hit:
+        print(f"⚡ Cache hit for topic: {topic}")
+        _restore_graph(result)
+    result = dict(result)
+    result["stats"] = {**result["stats"], "cache": {"hit": hit, **topic_cache.get_stats()}}
+    return result
+
+async def run_ingest(paths, user_id: str = "user_1", **options):
+    """
+    Builds a graph from local files or directories instead of a researched topic
+    (see ingest.py for the options). Returns {"graph_id", "stats"}; the graph is
+    then available through the /graphs query API.
+    """
+    result = None
+    async for update in stream_ingest(paths, user_id, **options):
+        if update["type"] == "done":
+            result = update["result"]
+    return result
+
+async def stream_agent(topic: str, user_id: str = "user_1", use_cache: bool = True):
+    """
+    Runs the pipeline and yields incremental updates as they happen:
+    - {"type": "text", ...}: text from an agent ("partial" chunks while streaming).
+    - {"type": "triplet", ...}: a triplet that has just landed in the graph.
+    - {"type": "artifact", ...}: the rendered image once it is saved.
+    - {"type": "done", "result": ...}: the same result `run_agent` returns.
+    """
+    if not use_cache:
+        async for update in _stream_pipeline(topic, user_id):
+            yield update
+        return
+
+    # Same single-flight key as run_agent: while a topic is being built, further
+    # requests for it follow that run from its first update instead of starting another.
+    # A client that disconnects stops following; the run stops once nobody follows it.
+    async with aclosing(topic_cache.stream_or_follow(topic, lambda: _stream_pipeline(topic, user_id))) as updates:
+        async for update, hit in updates:
+            if update["type"] == "done":
+                if hit:
+                    print(f"⚡ Cache hit for topic: {topic}")
+                    _restore_graph(update["result"])
+                result = dict(update["result"])
+                result["stats"] = {**result["stats"], "cache": {"hit": hit, **topic_cache.get_stats()}}
+                update = {"type": "done", "result": result}
+            yield update
+
+def _restore_graph(result):
+    # Cached results outlive the in-memory graphs they came from; bring the
+    # graph back so its graph_id keeps working with the /graphs query API.
+    if result.get("graph_id") and result.get("graph_state"):
+        restore_kb(result["graph_id"], result["graph_state"])
+
+async def _run_pipeline(topic: str, user_id: str):
+    result = None
+    async for update in _stream_pipeline(topic, user_id):
+        if update["type"] == "done":
+            result = update["result"]
+    return result
+
+def _landed_triplets(call, response):
+    """Yields the triplets a finished add_triplet/add_triplets call inserted, under their canonical names."""
+    if call.name == "add_triplet":
+        if (response or {}).get("status") == "success":
+            yield response["triplet"]
+    elif call.name == "add_triplets":
+        for outcome in (response or {}).get("results", []):
+            if outcome.get("status") == "success":
+                yield outcome["triplet"]
+
+async def _stream_pipeline(topic: str, user_id: str):
     print(f"🚀 Initializing Dynamic Knowledge Graph Architect for topic: {topic}...")
+    started = time.perf_counter()
     
-    # Reset the knowledge base for a fresh run
-    kb.reset()
+    # Every run gets a unique session and its own knowledge base,
+    # so concurrent requests never see each other's graphs.
+    session_id = uuid.uuid4().hex
+    kb = create_kb(session_id)
     
-    # 1. Setup Services
-    session_service = InMemorySessionService()
-    memory_service = InMemoryMemoryService()
-    graph_plugin = GraphBuilderPlugin()
+    # Pick up where an earlier failed run of this topic stopped: its triplets are
+    # replayed from the journal, and stages that finished are skipped (see checkpoint.py).
+    checkpoint = await asyncio.to_thread(checkpoints.open, topic_cache.key(topic))
+    restored = checkpoint.restore(kb) if checkpoint else None
+    if restored and restored["replayed_triplets"]:
+        print(f"♻️ Resumed {restored['replayed_triplets']} triplets in {restored['replay_s'] * 1e3:.1f}ms")
     
-    # 2. Create Runner
-    runner = Runner(
-        agent=graph_architect,
-        app_name="KnowledgeGraphApp",
-        session_service=session_service,
-        memory_service=memory_service,
-        plugins=[graph_plugin]
+    # The Runner and services are shared; only the session is per run.
+    await runtime.session_service.create_session(
+        app_name=APP_NAME,
+        user_id=user_id,
+        session_id=session_id,
+        state={"checkpoint": checkpoint.key if checkpoint else None}
     )
     
-    # 3. Create Session
-    session = await session_service.create_session(
-        app_name="KnowledgeGraphApp",
-        user_id="user_1",
-        session_id="session_1"
-    )
-    
-    # 4. Run Agent
     print(f"\n🎯 Topic: {topic}")
     print("-" * 60)
     
     user_msg = types.Content(parts=[types.Part(text=f"Build a knowledge graph about: {topic}")])
+    # SSE streaming lets us forward model text as it is generated
+    run_config = RunConfig(streaming_mode=StreamingMode.SSE)
     
     final_response_text = ""
+    pending_calls = {}
+    time_to_first_node = None
     
-    async for event in runner.run_async(
-        user_id="user_1",
-        session_id="session_1",
-        new_message=user_msg
-    ):
-        # Capture the agent's output
-        if event.content and event.content.parts:
-            for part in event.content.parts:
-                if hasattr(part, "text") and part.text:
-                    print(part.text)
-                    final_response_text += part.text + "\n"
-                    
-    print("-" * 60)
-    print("📊 Final Stats:")
-    stats = graph_plugin.get_stats()
-    graph_state = kb.get_state()
-    print(stats)
-    
-    # The image path is now dynamic, but for the API we might just return the latest one
-    # or we can rely on the tool output if we captured it. 
-    # For simplicity, let's assume the tool saved it and we can find the latest file in examples/
-    # OR better, let's just return the graph state and let the frontend handle visualization if needed,
-    # but the user wants the PNG download too.
-    # Since save_graph_image returns the filename, we could capture it if we were calling it directly,
-    # but here the agent calls it.
-    # We'll find the most recent file in examples/
-    
-    import glob
-    list_of_files = glob.glob('examples/*.png') 
-    latest_file = max(list_of_files, key=os.path.getctime) if list_of_files else None
+    finished = False
+    try:
+        async for event in runner.run_async(
+            user_id=user_id,
+            session_id=session_id,
+            new_message=user_msg,
+            run_config=run_config
+        ):
+            # Capture the agent's output
+            if event.content and event.content.parts:
+                for part in event.content.parts:
+                    if hasattr(part, "text") and part.text:
+                        yield {"type": "text", "agent": event.author, "text": part.text, "partial": bool(event.partial)}
+                        if not event.partial:
+                            print(part.text)
+                            final_response_text += part.text + "\n"
+            
+            for call in event.get_function_calls():
+                pending_calls[call.id] = call
+            
+            for response in event.get_function_responses():
+                call = pending_calls.pop(response.id, None)
+                if call is None:
+                    continue
+                for triplet in _landed_triplets(call, response.response):
+                    if time_to_first_node is None:
+                        time_to_first_node = time.perf_counter() - started
+                        print(f"⏱️ Time to first node: {time_to_first_node:.2f}s")
+                    yield {"type": "triplet", **triplet}
+                if call.name == "save_graph_image" and kb.image_artifact:
+                    yield {"type": "artifact", "image": artifact_store.describe(kb.image_artifact)}
+                        
+        print("-" * 60)
+        print("📊 Final Stats:")
+        stats = runtime.plugin.get_stats(session_id)
+        stats["time_to_first_node_s"] = time_to_first_node
+        if checkpoint:
+            stats["checkpoint"] = {**restored, **checkpoint.get_stats()}
+        stats["total_time_s"] = time.perf_counter() - started
+        # Layouts and importance are computed when a client first asks for them
+        # (/graphs/{graph_id}/layout and /importance), not on every run.
+        graph_state = kb.get_state()
+        # Add what this run learned to the long-lived corpus graph, if KG_CORPUS_PATH is set.
+        corpus_stats = await merge_run(kb, session_id, topic)
+        if corpus_stats:
+            stats["corpus"] = corpus_stats
+        print(stats)
+        finished = True
+    finally:
+        runtime.plugin.discard(session_id)
+        if checkpoint:
+            # A finished run's result lives in the topic cache; a failed one keeps its checkpoint.
+            checkpoint.close(keep=not finished)
+        # Finished graphs stay queryable (bounded by KG_GRAPH_RETENTION); failed runs are dropped.
+        if finished:
+            retain_kb(session_id)
+        else:
+            release_kb(session_id)
 
-    return {
+    # save_graph_image records the artifact it wrote on the run's knowledge base;
+    # clients get a reference to it and fetch the bytes from /artifacts/{id}.
+    yield {"type": "done", "result": {
+        "graph_id": session_id,
         "summary": final_response_text,
         "stats": stats,
         "graph_state": graph_state,
-        "image_path": latest_file
-    }
+        "image": artifact_store.describe(kb.image_artifact)
+    }}
 
 if __name__ == "__main__":
     topic = "The relationships between the main characters in Harry Potter"
@@ -0,0 +1,172 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Histograms use fixed cumulative buckets, so recording a sample is a binary
+search plus two additions under a lock. No background threads, no
+allocation per observation beyond the first time a label set is seen.
+"""
+import bisect
+import threading
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Seconds: covers sub-millisecond tool calls up to multi-minute model calls.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum]
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    labels = _format_labels(self.labelnames, key, 'le="%s"' % le)
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total[0])}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[object] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def expose(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+AGENT_DURATION = REGISTRY.register(Histogram(
+    "kg_agent_duration_seconds", "Wall time of one agent run.", ["agent"]))
+MODEL_LATENCY = REGISTRY.register(Histogram(
+    "kg_model_latency_seconds", "Latency of one model call, request to final response, excluding queue wait.",
+    ["agent"]))
+MODEL_QUEUE_WAIT = REGISTRY.register(Histogram(
+    "kg_model_queue_wait_seconds", "Time a model call waited for the rate limiter before being sent."))
+TOOL_DURATION = REGISTRY.register(Histogram(
+    "kg_tool_duration_seconds", "Wall time of one tool call.", ["tool"]))
+LAYOUT_DURATION = REGISTRY.register(Histogram(
+    "kg_layout_duration_seconds", "Server-side layout time per mode.", ["mode"]))
+RENDER_DURATION = REGISTRY.register(Histogram(
+    "kg_render_duration_seconds", "Image render time per phase (cache misses only).", ["phase"]))
+MODEL_TOKENS = REGISTRY.register(Counter(
+    "kg_model_tokens_total", "Tokens reported by the model.", ["agent", "kind"]))
+MODEL_ERRORS = REGISTRY.register(Counter(
+    "kg_model_errors_total", "Model calls that failed after retries.", ["agent"]))
+MODEL_RETRIES = REGISTRY.register(Counter(
+    "kg_model_retries_total", "Model call retries (rate-limited and transient errors)."))
+MODEL_THROTTLED = REGISTRY.register(Counter(
+    "kg_model_throttled_total", "Model calls rejected with 429 or 503."))
+MODEL_CONCURRENCY = REGISTRY.register(Gauge(
+    "kg_model_concurrency", "Adaptive concurrency limit and model calls in flight.", ["kind"]))
+TOOL_ERRORS = REGISTRY.register(Counter(
+    "kg_tool_errors_total", "Tool calls that raised.", ["tool"]))
+TRIPLETS_ADDED = REGISTRY.register(Counter(
+    "kg_triplets_added_total", "Triplets inserted into knowledge bases."))
+RENDER_CACHE = REGISTRY.register(Counter(
+    "kg_render_cache_total", "Image render requests by cache outcome.", ["outcome"]))
+
+# The run whose model call is in flight in this task, so the rate limiter's
+# retries can be attributed to it. Set by GraphBuilderPlugin before each model call.
+current_run: ContextVar[Optional[dict]] = ContextVar("current_run", default=None)
+
+# Rate-limiter queue wait accumulated by the model call in flight in this task,
+# so the plugin can report it apart from the model's own latency.
+model_queue_wait: ContextVar[float] = ContextVar("model_queue_wait", default=0.0)
@@ -1,42 +1,177 @@
+import time
 from google.adk.plugins.base_plugin import BasePlugin
 from google.adk.agents.base_agent import BaseAgent
 from google.adk.agents.callback_context import CallbackContext
-from .graph_tools import kb
+from .graph_tools import get_kb, graph_id_for
+from . import metrics
 
 class GraphBuilderPlugin(BasePlugin):
+    """
+    Tracks graph growth and times every agent, model call and tool call.
+
+    Samples go to the process-wide histograms in `metrics` (served at /metrics)
+    and are also summed per run, so `get_stats` can return a timing breakdown.
+    One plugin instance serves every run in the process; runs are told apart by
+    their graph ID (see `graph_id_for`) and dropped with `discard`.
+    """
+
     def __init__(self):
         super().__init__(name="graph_builder_plugin")
-        self.triplets_added = 0
-        self.viz_generated = 0
+        self._runs = {}
+        # In-flight start times, keyed per run and agent / model call / tool call.
+        self._started = {}
 
-    async def after_tool_callback(self, **kwargs):
-        """Monitor tool usage to track graph growth."""
-        tool = kwargs.get("tool")
-        tool_result = kwargs.get("tool_result")
-        
-        if tool and tool.name == "add_triplet" and tool_result and tool_result.get("status") == "success":
-            self.triplets_added += 1
-            print(f"📈 [GraphPlugin] New Knowledge! Total Triplets Added: {self.triplets_added}")
-            
-        if tool and tool.name == "get_graph_state":
-            # Just logging the current size when state is checked
-            # Just logging the current size when state is checked
-            state = kb.get_state()
-            print(f"🔍 [GraphPlugin] Graph State Checked: {len(state['nodes'])} Nodes, {len(state['edges'])} Edges")
+    def _run(self, context):
+        run_id = graph_id_for(context)
+        run = self._runs.get(run_id)
+        if run is None:
+            run = self._runs[run_id] = {
+                "triplets_added": 0,
+                "viz_generated": 0,
+                "timings": {
+                    "agents": {},
+                    "tools": {},
+                    # total_s is time spent in the model; queue_s is time spent waiting for the rate limiter.
+                    "model": {"calls": 0, "total_s": 0.0, "queue_s": 0.0, "prompt_tokens": 0, "output_tokens": 0,
+                              "errors": 0},
+                    "retries": 0,
+                },
+            }
+        return run
+
+    def discard(self, run_id: str):
+        """Forgets a finished run, including timers left behind by cancelled calls."""
+        self._runs.pop(run_id, None)
+        for key in [key for key in self._started if key[0] == run_id]:
+            del self._started[key]
+
+    async def before_agent_callback(self, **kwargs):
+        callback_context = kwargs.get("callback_context")
+        self._run(callback_context)
+        key = (graph_id_for(callback_context), "agent", callback_context.invocation_id, kwargs["agent"].name)
+        self._started[key] = time.perf_counter()
 
     async def after_agent_callback(self, **kwargs):
         """Track when the visualization is complete."""
         agent = kwargs.get("agent")
+        callback_context = kwargs.get("callback_context")
+        run = self._run(callback_context)
+        started = self._started.pop((graph_id_for(callback_context), "agent", callback_context.invocation_id,
+                                     agent.name), None)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            metrics.AGENT_DURATION.observe(elapsed, agent=agent.name)
+            agents = run["timings"]["agents"]
+            agents[agent.name] = agents.get(agent.name, 0.0) + elapsed
         if agent and agent.name == "VisualizationAgent":
-            self.viz_generated += 1
+            run["viz_generated"] += 1
             print(f"🎨 [GraphPlugin] Visualization Agent finished. Check for 'knowledge_graph.png'!")
 
-    def get_stats(self):
+    async def before_model_callback(self, **kwargs):
+        callback_context = kwargs.get("callback_context")
+        key = (graph_id_for(callback_context), "model", callback_context.invocation_id, callback_context.agent_name)
+        self._started[key] = time.perf_counter()
+        metrics.model_queue_wait.set(0.0)
+        # Lets retries be charged to this run.
+        metrics.current_run.set(self._run(callback_context)["timings"])
+
+    async def after_model_callback(self, **kwargs):
+        callback_context = kwargs.get("callback_context")
+        llm_response = kwargs.get("llm_response")
+        if llm_response is not None and llm_response.partial:
+            # Streamed chunk; the call is only finished at the final response.
+            return None
+        agent_name = callback_context.agent_name
+        started = self._started.pop((graph_id_for(callback_context), "model", callback_context.invocation_id,
+                                     agent_name), None)
+        model = self._run(callback_context)["timings"]["model"]
+        if started is not None:
+            queued = metrics.model_queue_wait.get()
+            elapsed = time.perf_counter() - started - queued
+            metrics.MODEL_LATENCY.observe(elapsed, agent=agent_name)
+            model["calls"] += 1
+            model["total_s"] += elapsed
+            model["queue_s"] += queued
+        usage = llm_response.usage_metadata if llm_response is not None else None
+        if usage is not None:
+            prompt, output = usage.prompt_token_count or 0, usage.candidates_token_count or 0
+            metrics.MODEL_TOKENS.inc(prompt, agent=agent_name, kind="prompt")
+            metrics.MODEL_TOKENS.inc(output, agent=agent_name, kind="output")
+            model["prompt_tokens"] += prompt
+            model["output_tokens"] += output
+        return None
+
+    async def on_model_error_callback(self, **kwargs):
+        callback_context = kwargs.get("callback_context")
+        self._started.pop((graph_id_for(callback_context), "model", callback_context.invocation_id,
+                           callback_context.agent_name), None)
+        metrics.MODEL_ERRORS.inc(agent=callback_context.agent_name)
+        self._run(callback_context)["timings"]["model"]["errors"] += 1
+        return None
+
+    async def before_tool_callback(self, **kwargs):
+        tool_context = kwargs.get("tool_context")
+        self._started[(graph_id_for(tool_context), "tool", tool_context.function_call_id)] = time.perf_counter()
+
+    def _finish_tool(self, tool, tool_context):
+        started = self._started.pop((graph_id_for(tool_context), "tool", tool_context.function_call_id), None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        metrics.TOOL_DURATION.observe(elapsed, tool=tool.name)
+        entry = self._run(tool_context)["timings"]["tools"].setdefault(tool.name, {"calls": 0, "total_s": 0.0})
+        entry["calls"] += 1
+        entry["total_s"] += elapsed
+
+    async def on_tool_error_callback(self, **kwargs):
+        tool = kwargs.get("tool")
+        self._finish_tool(tool, kwargs.get("tool_context"))
+        metrics.TOOL_ERRORS.inc(tool=tool.name)
+        return None
+
+    async def after_tool_callback(self, **kwargs):
+        """Monitor tool usage to track graph growth."""
+        tool = kwargs.get("tool")
+        tool_context = kwargs.get("tool_context")
+        tool_result = kwargs.get("result")
+        self._finish_tool(tool, tool_context)
+
+        # Both tools report what was actually inserted; duplicates do not count.
+        added = 0
+        if tool and tool.name == "add_triplet" and isinstance(tool_result, dict):
+            added = int(tool_result.get("status") == "success")
+        elif tool and tool.name == "add_triplets" and isinstance(tool_result, dict):
+            added = tool_result.get("added", 0)
+
+        if added:
+            run = self._run(tool_context)
+            run["triplets_added"] += added
+            metrics.TRIPLETS_ADDED.inc(added)
+            print(f"📈 [GraphPlugin] New Knowledge! Total Triplets Added: {run['triplets_added']}")
+
+        if tool and tool.name == "get_graph_state":
+            # Just logging the current size when state is checked
+            kb = get_kb(graph_id_for(tool_context))
+            print(f"🔍 [GraphPlugin] Graph State Checked: {kb.num_nodes()} Nodes, {kb.num_edges()} Edges (v{kb.version})")
+
+        if tool and tool.name == "save_graph_image":
+            render = get_kb(graph_id_for(tool_context)).render_stats
+            if render:
+                metrics.RENDER_CACHE.inc(outcome="hit" if render["cache_hit"] else "miss")
+                if not render["cache_hit"]:
+                    metrics.RENDER_DURATION.observe(render["layout_s"], phase="layout")
+                    metrics.RENDER_DURATION.observe(render["rasterize_s"], phase="rasterize")
+
+    def get_stats(self, session_id: str):
+        kb = get_kb(session_id)
+        run = self._runs.get(session_id) or {"triplets_added": 0, "viz_generated": 0, "timings": {}}
         return {
-            "total_triplets_added": self.triplets_added,
-            "visualizations_generated": self.viz_generated,
+            "total_triplets_added": run["triplets_added"],
+            "visualizations_generated": run["viz_generated"],
+            "render": kb.render_stats,
+            "timings": run["timings"],
             "final_graph_size": {
-                "nodes": len(kb.get_state()["nodes"]),
-                "edges": len(kb.get_state()["edges"])
+                "nodes": kb.num_nodes(),
+                "edges": kb.num_edges()
             }
         }
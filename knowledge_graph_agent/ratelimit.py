@@ -0,0 +1,288 @@
+"""
+Process-wide admission control for model calls.
+
+Every model instance goes through one `ModelRateLimiter`, which combines:
+
+- a token bucket for requests per minute (KG_MODEL_RPM, bursts of KG_MODEL_BURST);
+- an AIMD concurrency limit: +1/limit per successful call (about +1 per
+  round of calls), halved on a 429/503, and trimmed by 10% when calls get
+  slower than KG_MODEL_LATENCY_TARGET;
+- one shared cooldown after throttling. The first 429 of a burst sets a
+  single jittered resume time for everyone, instead of every run backing
+  off (and coming back) on its own schedule.
+
+Retries of throttled and transient errors are made here, after waiting for
+the limiter again, so the model client itself makes a single attempt.
+"""
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import AsyncGenerator, AsyncIterator, Callable, Deque, Optional, TypeVar
+
+from google.adk.models.google_llm import Gemini
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai.errors import APIError
+
+from . import metrics
+
+T = TypeVar("T")
+
+# Statuses worth retrying, and the subset that means "slow down".
+RETRY_STATUS_CODES = (429, 500, 503, 504)
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+class ModelRateLimiter:
+    def __init__(self, rpm: float = 0, burst: Optional[int] = None, max_concurrency: int = 16,
+                 min_concurrency: int = 1, initial_concurrency: Optional[int] = None,
+                 latency_target_s: float = 0.0, base_backoff_s: float = 1.0, max_backoff_s: float = 60.0,
+                 decrease: float = 0.5, attempts: int = 5, seed: Optional[int] = None):
+        self.rpm = rpm
+        self.burst = burst if burst is not None else max(1, int(rpm // 6))
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(initial_concurrency or max_concurrency)
+        self.latency_target_s = latency_target_s
+        self.decrease = decrease
+        self.base_backoff_s = base_backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.attempts = attempts
+        self.in_flight = 0
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._resume_at = 0.0
+        self._throttle_streak = 0
+        self._slowed_at = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._rng = random.Random(seed)
+        self.stats = {"calls": 0, "throttled": 0, "retries": 0, "queue_s": 0.0}
+        self._publish()
+
+    def _publish(self):
+        metrics.MODEL_CONCURRENCY.set(self.limit, kind="limit")
+        metrics.MODEL_CONCURRENCY.set(self.in_flight, kind="in_flight")
+
+    def _take_token(self, now: float) -> float:
+        """Takes a request token; returns 0, or how long until one is available."""
+        if self.rpm <= 0:
+            return 0.0
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rpm / 60)
+        self._refilled_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) * 60 / self.rpm
+
+    def _has_slot(self) -> bool:
+        return time.monotonic() >= self._resume_at and self.in_flight < int(self.limit)
+
+    def _wake(self):
+        """Hands free slots to queued callers, oldest first."""
+        while self._waiters and self._has_slot():
+            waiter = self._waiters.popleft()
+            if not waiter.done():  # skip callers cancelled while queued
+                self.in_flight += 1
+                waiter.set_result(None)
+        self._publish()
+
+    async def acquire(self) -> float:
+        """Waits for a slot (cooldown and concurrency, in FIFO order, then rate); returns the seconds waited."""
+        started = time.monotonic()
+        if self._waiters or not self._has_slot():
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter  # the slot is reserved for us when this resolves
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self.in_flight -= 1
+                    self._wake()
+                raise
+        else:
+            self.in_flight += 1
+            self._publish()
+        try:
+            while (delay := self._take_token(time.monotonic())) > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            # Cancelled while waiting for a token: `call` has not taken the slot over yet.
+            self.in_flight -= 1
+            self._wake()
+            raise
+        return time.monotonic() - started
+
+    def release(self, outcome: str, latency_s: float):
+        """Ends a call: `outcome` is "ok", "throttled" or "error"; adjusts the limit (AIMD)."""
+        self.in_flight -= 1
+        now = time.monotonic()
+        if outcome == "throttled":
+            self.stats["throttled"] += 1
+            metrics.MODEL_THROTTLED.inc()
+            # One decrease (and one step of backoff) per cooldown, however many
+            # calls hit the same 429 burst.
+            if now >= self._resume_at:
+                self._throttle_streak += 1
+                self.limit = max(self.min_concurrency, self.limit * self.decrease)
+                backoff = min(self.max_backoff_s, self.base_backoff_s * 2 ** (self._throttle_streak - 1))
+                # Jittered once, and shared by every queued call.
+                self._resume_at = now + self._rng.uniform(backoff / 2, backoff)
+                asyncio.get_running_loop().call_at(
+                    asyncio.get_running_loop().time() + self._resume_at - now, self._wake)
+        elif outcome == "ok":
+            self._throttle_streak = 0
+            if self.latency_target_s and latency_s > self.latency_target_s:
+                # Slow responses mean queueing upstream; back off gently, once per call duration.
+                if now - self._slowed_at > latency_s:
+                    self.limit = max(self.min_concurrency, self.limit * 0.9)
+                    self._slowed_at = now
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self._wake()
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retrying a transient (non-throttle) error."""
+        return self._rng.uniform(0, min(self.max_backoff_s, self.base_backoff_s * 2 ** (attempt - 1)))
+
+    async def call(self, make_stream: Callable[[], AsyncIterator[T]]) -> AsyncGenerator[T, None]:
+        """
+        Runs `make_stream()` under the limiter and yields its items, retrying
+        throttled and transient errors up to `attempts` times as long as nothing
+        has been yielded yet.
+        """
+        for attempt in range(1, self.attempts + 1):
+            waited = await self.acquire()
+            self.stats["calls"] += 1
+            self.stats["queue_s"] += waited
+            metrics.MODEL_QUEUE_WAIT.observe(waited)
+            metrics.model_queue_wait.set(metrics.model_queue_wait.get() + waited)
+            started = time.monotonic()
+            outcome, yielded = "error", False
+            try:
+                async for item in make_stream():
+                    yielded = True
+                    yield item
+                outcome = "ok"
+                return
+            except APIError as e:
+                if e.code in THROTTLE_STATUS_CODES:
+                    outcome = "throttled"
+                if yielded or attempt == self.attempts or e.code not in RETRY_STATUS_CODES:
+                    raise
+            finally:
+                self.release(outcome, time.monotonic() - started)
+            self.stats["retries"] += 1
+            metrics.MODEL_RETRIES.inc()
+            run = metrics.current_run.get()
+            if run is not None:
+                run["retries"] = run.get("retries", 0) + 1
+            if outcome == "error":
+                await asyncio.sleep(self.backoff(attempt))
+
+    def get_stats(self):
+        return {**self.stats, "limit": self.limit, "in_flight": self.in_flight,
+                "cooling_down_s": max(0.0, self._resume_at - time.monotonic())}
+
+
+_limiter: Optional[ModelRateLimiter] = None
+
+
+def get_model_limiter() -> ModelRateLimiter:
+    """The process-wide limiter, configured from the environment on first use."""
+    global _limiter
+    if _limiter is None:
+        burst = os.environ.get("KG_MODEL_BURST")
+        _limiter = ModelRateLimiter(
+            rpm=float(os.environ.get("KG_MODEL_RPM", "0")),
+            burst=int(burst) if burst else None,
+            max_concurrency=int(os.environ.get("KG_MODEL_MAX_CONCURRENCY", "16")),
+            latency_target_s=float(os.environ.get("KG_MODEL_LATENCY_TARGET", "0")),
+            attempts=int(os.environ.get("KG_MODEL_ATTEMPTS", "5")),
+        )
+    return _limiter
+
+
+class RateLimitedGemini(Gemini):
+    """Gemini behind the process-wide limiter. Give it a client retry policy of a single attempt."""
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        async for response in get_model_limiter().call(
+            lambda: Gemini.generate_content_async(self, llm_request, stream)
+        ):
+            yield response
+
+
+if __name__ == "__main__":
+    # Tail latency under a shared quota: python -m knowledge_graph_agent.ratelimit
+    # A fake backend serves at most CAPACITY calls at once and answers 429 beyond
+    # that. RUNS concurrent runs each make CALLS sequential calls. Times are scaled
+    # by SCALE, so a 2 s model call takes 0.1 s here.
+    SCALE, CAPACITY, RUNS, CALLS, SERVICE_S = 0.05, 8, 48, 6, 2.0
+
+    def throttle_error():
+        return APIError(429, {"error": {"code": 429, "message": "Resource exhausted", "status": "RESOURCE_EXHAUSTED"}})
+
+    class Backend:
+        def __init__(self):
+            self.active = self.rejected = 0
+
+        async def respond(self):
+            await asyncio.sleep(0.005)  # round trip
+            if self.active >= CAPACITY:
+                self.rejected += 1
+                raise throttle_error()
+            self.active += 1
+            try:
+                await asyncio.sleep(SERVICE_S * SCALE * random.uniform(0.8, 1.2))
+            finally:
+                self.active -= 1
+            yield "ok"
+
+    async def independent_retries(backend):
+        # The previous per-agent client policy: 5 attempts, 1 s * 7^n backoff (capped at 60 s) plus jitter.
+        for attempt in range(1, 6):
+            try:
+                async for _ in backend.respond():
+                    pass
+                return
+            except APIError:
+                if attempt == 5:
+                    raise
+                await asyncio.sleep((min(60, 7 ** (attempt - 1)) + random.uniform(0, 1)) * SCALE)
+
+    async def shared_limiter(backend, limiter):
+        async for _ in limiter.call(backend.respond):
+            pass
+
+    async def scenario(name, call):
+        backend, latencies, failures = Backend(), [], 0
+
+        async def run():
+            nonlocal failures
+            for _ in range(CALLS):
+                start = time.monotonic()
+                try:
+                    await call(backend)
+                    latencies.append((time.monotonic() - start) / SCALE)
+                except APIError:
+                    failures += 1
+
+        start = time.monotonic()
+        await asyncio.gather(*(run() for _ in range(RUNS)))
+        elapsed = (time.monotonic() - start) / SCALE
+        latencies.sort()
+        pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+        print(f"{name:<22} p50 {pct(0.5):6.1f}s  p95 {pct(0.95):6.1f}s  p99 {pct(0.99):6.1f}s  "
+              f"max {latencies[-1]:6.1f}s  429s {backend.rejected:4d}  failed {failures:3d}  total {elapsed:6.1f}s")
+
+    async def bench():
+        random.seed(0)
+        await scenario("independent retries", independent_retries)
+        limiter = ModelRateLimiter(max_concurrency=32, base_backoff_s=1.0 * SCALE, max_backoff_s=60 * SCALE, seed=0)
+        await scenario("shared limiter + AIMD", lambda backend: shared_limiter(backend, limiter))
+
+    asyncio.run(bench())
@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from knowledge_graph_agent.artifacts import get_artifact_store
+from typing import Any, Dict, List, Optional, Tuple
+
+# Render options baked into every image. They are part of the cache key,
+# so changing any of them produces a new file rather than a stale hit.
+DEFAULT_RENDER_OPTIONS = {
+    "figsize": [12, 8],
+    "layout": "force",
+    "seed": 42,
+    "title": "Knowledge Graph Visualization",
+    # Edge labels are the slowest thing matplotlib draws; skip them on busy graphs.
+    "max_edge_labels": 60,
+}
+
+# Above this many entities, save_graph_image draws communities instead of entities.
+RENDER_MAX_NODES = int(os.environ.get("KG_RENDER_MAX_NODES", "150"))
+RENDER_MAX_EDGES = int(os.environ.get("KG_RENDER_MAX_EDGES", "300"))
+
+RENDER_WORKERS = int(os.environ.get("KG_RENDER_WORKERS", "2"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # "spawn" keeps the workers free of the parent's event loop and threads.
+        _executor = ProcessPoolExecutor(
+            max_workers=RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+def _init_worker():
+    """Loads the plotting stack and matplotlib's font cache once per worker, not on its first render."""
+    import matplotlib
+    matplotlib.use("Agg")  # headless, never touch a display
+    import matplotlib.pyplot  # noqa: F401
+    import networkx  # noqa: F401
+    from matplotlib import font_manager
+    from knowledge_graph_agent import layout  # noqa: F401
+
+    font_manager.findfont(font_manager.FontProperties(weight="bold"))
+
+
+def _worker_pid() -> int:
+    # Keeps the worker busy for a moment, so the other warm-up calls go to other workers.
+    time.sleep(0.05)
+    return os.getpid()
+
+
+async def start_workers(timeout: float = 30.0) -> int:
+    """
+    Starts every render worker ahead of the first render (see warmup.py) and
+    waits until each has loaded; returns how many answered within `timeout`.
+    """
+    loop = asyncio.get_running_loop()
+    seen = set()
+    deadline = time.monotonic() + timeout
+    while len(seen) < RENDER_WORKERS and time.monotonic() < deadline:
+        seen.update(await asyncio.gather(*(loop.run_in_executor(_get_executor(), _worker_pid)
+                                           for _ in range(RENDER_WORKERS))))
+    return len(seen)
+
+
+def graph_hash(nodes: List[str], edges: List[Tuple[str, str, str]], options: Dict[str, Any]) -> str:
+    """Canonical content hash of a graph plus the options used to draw it."""
+    canonical = json.dumps(
+        {"nodes": sorted(nodes), "edges": sorted(edges), "options": options},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _render_png(nodes: List[str], edges: List[Tuple[str, str, str]],
+                options: Dict[str, Any], path: str) -> Dict[str, float]:
+    """Draws the graph to `path`. Runs inside a worker process."""
+    import matplotlib
+    matplotlib.use("Agg")  # headless, never touch a display
+    import matplotlib.pyplot as plt
+    import networkx as nx
+    from knowledge_graph_agent.layout import compute_layout
+
+    # A pair can carry several relations; draw one arrow labelled with all of them.
+    G = nx.DiGraph()
+    G.add_nodes_from(nodes)
+    for u, v, r in edges:
+        if G.has_edge(u, v):
+            G[u][v]["relation"] += f", {r}"
+        else:
+            G.add_edge(u, v, relation=r)
+
+    start = time.perf_counter()
+    pos = compute_layout(nodes, [(u, v) for u, v, _ in edges], mode=options["layout"], seed=options["seed"])
+    layout_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plt.figure(figsize=tuple(options["figsize"]))
+
+    # Draw nodes; summary graphs pass member counts, drawn as area
+    sizes = options.get("node_sizes")
+    node_size = 2000
+    if sizes:
+        largest = max(sizes.values())
+        node_size = [300 + 2700 * (sizes.get(node, 1) / largest) ** 0.5 for node in G.nodes]
+    nx.draw_networkx_nodes(G, pos, node_size=node_size, node_color="lightblue", alpha=0.9)
+    nx.draw_networkx_labels(G, pos, font_size=10, font_weight="bold")
+
+    # Draw edges
+    nx.draw_networkx_edges(G, pos, edge_color="gray", arrows=True, arrowsize=20)
+    if G.number_of_edges() <= options["max_edge_labels"]:
+        edge_labels = nx.get_edge_attributes(G, "relation")
+        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_size=8)
+
+    plt.title(options["title"])
+    plt.axis("off")
+    plt.tight_layout()
+    # Write to a temp name and rename, so readers never see a half-written file.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    plt.savefig(tmp_path, format="png")
+    plt.close()
+    os.replace(tmp_path, path)
+    rasterize_s = time.perf_counter() - start
+
+    return {"layout_s": layout_s, "rasterize_s": rasterize_s}
+
+
+async def render_graph(nodes: List[str], edges: List[Tuple[str, str, str]],
+                       options: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Renders a graph to PNG in the process pool and returns (artifact_id, timings).
+    The artifact ID is the content hash of the graph and options, so identical
+    graphs with identical options are only ever rendered once.
+    """
+    options = {**DEFAULT_RENDER_OPTIONS, **(options or {})}
+    artifact_id = graph_hash(nodes, edges, options)
+    store = get_artifact_store()
+
+    if store.exists(artifact_id):
+        return artifact_id, {"cache_hit": True, "layout_s": 0.0, "rasterize_s": 0.0}
+
+    loop = asyncio.get_running_loop()
+    timings = await loop.run_in_executor(_get_executor(), _render_png, nodes, edges, options, store.path(artifact_id))
+    store.register(artifact_id)
+    return artifact_id, {"cache_hit": False, **timings}
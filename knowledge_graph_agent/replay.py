@@ -0,0 +1,208 @@
+"""
+Deterministic offline stand-in for Gemini.
+
+`ReplayLlm` plays back a script of model turns per agent: either one
+recorded from real runs with `ScriptRecorder`, or a synthetic one derived
+from the topic. Latency is injected as a fixed delay plus a per-character
+cost, so benchmarks and regression runs behave like a slow remote model
+without any network access.
+
+    from knowledge_graph_agent import replay
+    replay.install()                      # synthetic responses
+    replay.install("recording.json")      # recorded responses
+
+Setting KG_REPLAY=synthetic (or a path) has main.py do this at startup.
+"""
+import asyncio
+import hashlib
+import json
+import re
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.genai import types
+
+from .ratelimit import get_model_limiter
+
+# A turn is {"text": "..."} or {"function_calls": [{"name": ..., "args": {...}}]}.
+Turn = Dict[str, Any]
+Script = Dict[str, List[Turn]]
+
+# Synthetic research text states one relation per sentence using these phrases,
+# so the synthetic ontology turn can read the triplets back out of it.
+_PHRASES = {
+    "is part of": "part_of",
+    "was created by": "created_by",
+    "is located in": "located_in",
+    "influenced": "influenced",
+    "is related to": "related_to",
+}
+_SENTENCE = re.compile(r"([A-Z][\w' -]*?) (" + "|".join(_PHRASES) + r") ([A-Z][\w' -]*?)\.")
+_FOCUS = re.compile(r"Focus only on this aspect of the user's topic:\n(.+)")
+_TOPIC = re.compile(r"Build a knowledge graph about:\s*(.+)")
+
+
+def _base_name(agent_name: str) -> str:
+    # Fan-out copies are named like "ResearchAgent_3".
+    return re.sub(r"_\d+$", "", agent_name)
+
+
+def _request_text(llm_request: LlmRequest) -> str:
+    texts = []
+    instruction = llm_request.config.system_instruction if llm_request.config else None
+    if isinstance(instruction, str):
+        texts.append(instruction)
+    elif instruction is not None:
+        texts.extend(part.text or "" for part in instruction.parts or [])
+    for content in llm_request.contents:
+        texts.extend(part.text or "" for part in content.parts or [])
+    return "\n".join(texts)
+
+
+def _tool_names(llm_request: LlmRequest) -> List[str]:
+    return list(llm_request.tools_dict) if llm_request.tools_dict else []
+
+
+def synthetic_turn(agent_name: str, llm_request: LlmRequest, turn: int,
+                   entities_per_topic: int = 12, relations: int = 20) -> Turn:
+    """A plausible turn for `agent_name`, derived only from the request, so runs are reproducible."""
+    text = _request_text(llm_request)
+    tools = _tool_names(llm_request)
+    agent = _base_name(agent_name)
+    topic_match = _TOPIC.search(text)
+    topic = topic_match.group(1).strip() if topic_match else "Topic"
+
+    if agent == "TopicPlannerAgent":
+        return {"text": json.dumps([f"{topic} aspect {i}" for i in range(4)])}
+
+    if agent == "ResearchAgent":
+        focus = _FOCUS.search(text)
+        subject = focus.group(1).strip() if focus else topic
+        seed = int(hashlib.sha256(subject.encode("utf-8")).hexdigest(), 16)
+        names = [f"{subject.title()} Entity {i}" for i in range(entities_per_topic)]
+        phrases = list(_PHRASES)
+        sentences = []
+        for i in range(relations):
+            s = names[(seed >> i) % len(names)]
+            o = names[(seed >> (i + 7) ^ i) % len(names)]
+            if s != o:
+                sentences.append(f"{s} {phrases[(seed >> (i * 3)) % len(phrases)]} {o}.")
+        # A few paragraphs, so chunked extraction has boundaries to split on.
+        return {"text": "\n\n".join(" ".join(sentences[i:i + 5]) for i in range(0, len(sentences), 5))}
+
+    if "add_triplets" in tools:
+        if turn == 0:
+            triplets = [
+                {"subject": s, "predicate": _PHRASES[phrase], "object": o}
+                for s, phrase, o in _SENTENCE.findall(text)
+            ]
+            return {"function_calls": [{"name": "add_triplets", "args": {"triplets": triplets}}]}
+        if turn == 1 and "get_graph_state" in tools:
+            return {"function_calls": [{"name": "get_graph_state", "args": {}}]}
+        return {"text": "Saved the extracted triplets."}
+
+    if "save_graph_image" in tools:
+        if turn == 0:
+            return {"function_calls": [{"name": "save_graph_image", "args": {}}]}
+        return {"text": "The knowledge graph visualization has been saved."}
+
+    return {"text": f"{topic}."}
+
+
+class ReplayLlm(BaseLlm):
+    """
+    Plays back scripted turns for one agent.
+
+    The turn index is the number of model turns already in the request, which
+    also holds for parallel copies of the agent, since each copy only sees its
+    own branch. Agents without a scripted turn at that index fall back to
+    `synthetic_turn`.
+    """
+
+    model: str = "replay"
+    agent_name: str
+    script: Optional[Script] = None
+    latency_s: float = 0.0
+    latency_per_char_s: float = 0.0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        # Same admission control as the real model, so benchmarks include queueing.
+        async for response in get_model_limiter().call(lambda: self._generate(llm_request, stream)):
+            yield response
+
+    async def _generate(self, llm_request: LlmRequest, stream: bool) -> AsyncGenerator[LlmResponse, None]:
+        turn_index = sum(1 for content in llm_request.contents if content.role == "model")
+        turns = (self.script or {}).get(self.agent_name) or (self.script or {}).get(_base_name(self.agent_name))
+        if turns and turn_index < len(turns):
+            turn = turns[turn_index]
+        else:
+            turn = synthetic_turn(self.agent_name, llm_request, turn_index)
+
+        text = turn.get("text", "")
+        payload = json.dumps(turn.get("function_calls", []))
+        await asyncio.sleep(self.latency_s)
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=len(_request_text(llm_request)) // 4,
+            candidates_token_count=(len(text) + len(payload)) // 4,
+        )
+
+        if text and stream:
+            # Stream the text in a few chunks, then the aggregated final response.
+            step = max(1, len(text) // 4)
+            for start in range(0, len(text), step):
+                piece = text[start:start + step]
+                await asyncio.sleep(self.latency_per_char_s * len(piece))
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=piece)]), partial=True)
+        else:
+            await asyncio.sleep(self.latency_per_char_s * (len(text) + len(payload)))
+
+        if "function_calls" in turn:
+            parts = [
+                types.Part(function_call=types.FunctionCall(name=call["name"], args=call.get("args", {})))
+                for call in turn["function_calls"]
+            ]
+        else:
+            parts = [types.Part(text=text)]
+        yield LlmResponse(content=types.Content(role="model", parts=parts), usage_metadata=usage)
+
+
+class ScriptRecorder(BasePlugin):
+    """Records every final model turn per agent, in the format `ReplayLlm` plays back."""
+
+    def __init__(self):
+        super().__init__(name="script_recorder")
+        self.script: Script = {}
+
+    async def after_model_callback(self, **kwargs):
+        llm_response = kwargs.get("llm_response")
+        if llm_response is None or llm_response.partial or not llm_response.content:
+            return None
+        parts = llm_response.content.parts or []
+        calls = [{"name": p.function_call.name, "args": dict(p.function_call.args or {})}
+                 for p in parts if p.function_call]
+        turn = {"function_calls": calls} if calls else {"text": "".join(p.text or "" for p in parts)}
+        self.script.setdefault(kwargs["callback_context"].agent_name, []).append(turn)
+        return None
+
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.script, f, indent=2, ensure_ascii=False)
+
+
+def install(script_path: Optional[str] = None, latency_s: float = 0.0, latency_per_char_s: float = 0.0):
+    """Swaps every pipeline agent's model for a ReplayLlm."""
+    from knowledge_graph_agent import agents
+
+    script = None
+    if script_path:
+        with open(script_path, encoding="utf-8") as f:
+            script = json.load(f)
+    for agent in (agents.research_agent, agents.ontology_agent, agents.viz_agent,
+                  agents.planner_agent, agents.chunk_ontology_agent):
+        agent.model = ReplayLlm(agent_name=agent.name, script=script, latency_s=latency_s,
+                                latency_per_char_s=latency_per_char_s)
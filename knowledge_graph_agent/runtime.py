@@ -0,0 +1,140 @@
+"""
+Long-lived ADK services shared by every run in the process.
+
+Building a Runner, its session and memory services and the plugin for every
+request is wasted work. `get_runtime()` creates them once and hands out one
+Runner per agent; each run only creates its own session. The in-memory stores
+are bounded: sessions and memories are evicted oldest first once there are
+more than KG_SESSION_RETENTION of them, or when they are older than
+KG_SESSION_TTL seconds, so memory stays flat however many requests are served.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from google.adk.agents import BaseAgent
+from google.adk.memory import InMemoryMemoryService
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService, Session
+
+from .observability import GraphBuilderPlugin
+
+
+class BoundedSessionService(InMemorySessionService):
+    """InMemorySessionService that forgets sessions beyond `max_sessions` or older than `ttl_seconds`."""
+
+    def __init__(self, max_sessions: int = 256, ttl_seconds: float = 3600):
+        super().__init__()
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        # (app_name, user_id, session_id) -> creation time, oldest first
+        self._created: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self.evicted = 0
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._created:
+            (app_name, user_id, session_id), created = next(iter(self._created.items()))
+            if len(self._created) < self.max_sessions and now - created < self.ttl_seconds:
+                break
+            self._created.popitem(last=False)
+            self._delete_session_impl(app_name=app_name, user_id=user_id, session_id=session_id)
+            if not self.sessions.get(app_name, {}).get(user_id, True):
+                del self.sessions[app_name][user_id]
+            self.evicted += 1
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[Dict[str, Any]] = None,
+                             session_id: Optional[str] = None) -> Session:
+        self._evict()
+        session = await super().create_session(app_name=app_name, user_id=user_id, state=state,
+                                               session_id=session_id)
+        self._created[(app_name, user_id, session.id)] = time.monotonic()
+        return session
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        self._created.pop((app_name, user_id, session_id), None)
+        await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        if not self.sessions.get(app_name, {}).get(user_id, True):
+            del self.sessions[app_name][user_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"sessions": len(self._created), "max_sessions": self.max_sessions, "evicted": self.evicted}
+
+
+class BoundedMemoryService(InMemoryMemoryService):
+    """InMemoryMemoryService that keeps at most `max_sessions` sessions' events, for at most `ttl_seconds`."""
+
+    def __init__(self, max_sessions: int = 256, ttl_seconds: float = 3600):
+        super().__init__()
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        # ((app_name, user_id), session_id) -> time added, oldest first
+        self._added: "OrderedDict[Tuple[Any, str], float]" = OrderedDict()
+        self._bounds_lock = threading.Lock()
+
+    def _track(self):
+        # Picks up entries the base class added, then trims the oldest.
+        now = time.monotonic()
+        with self._lock, self._bounds_lock:
+            for user_key, sessions in self._session_events.items():
+                for session_id in sessions:
+                    self._added.setdefault((user_key, session_id), now)
+            while self._added:
+                (user_key, session_id), added = next(iter(self._added.items()))
+                if len(self._added) <= self.max_sessions and now - added < self.ttl_seconds:
+                    break
+                self._added.popitem(last=False)
+                sessions = self._session_events.get(user_key, {})
+                sessions.pop(session_id, None)
+                if not sessions:
+                    self._session_events.pop(user_key, None)
+
+    async def add_session_to_memory(self, session: Session) -> None:
+        await super().add_session_to_memory(session)
+        self._track()
+
+    async def add_events_to_memory(self, **kwargs) -> None:
+        await super().add_events_to_memory(**kwargs)
+        self._track()
+
+
+class Runtime:
+    """One session service, memory service and plugin for the process, plus one Runner per agent."""
+
+    def __init__(self, max_sessions: int = 256, ttl_seconds: float = 3600):
+        self.session_service = BoundedSessionService(max_sessions, ttl_seconds)
+        self.memory_service = BoundedMemoryService(max_sessions, ttl_seconds)
+        self.plugin = GraphBuilderPlugin()
+        self._runners: Dict[Tuple[str, str], Runner] = {}
+
+    def runner(self, agent: BaseAgent, app_name: str) -> Runner:
+        key = (app_name, agent.name)
+        runner = self._runners.get(key)
+        if runner is None:
+            runner = self._runners[key] = Runner(
+                agent=agent,
+                app_name=app_name,
+                session_service=self.session_service,
+                memory_service=self.memory_service,
+                plugins=[self.plugin],
+            )
+        return runner
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.session_service.get_stats(), "runners": len(self._runners)}
+
+
+_runtime: Optional[Runtime] = None
+
+
+def get_runtime() -> Runtime:
+    """The process-wide runtime, configured from the environment on first use."""
+    global _runtime
+    if _runtime is None:
+        _runtime = Runtime(
+            max_sessions=int(os.environ.get("KG_SESSION_RETENTION", "256")),
+            ttl_seconds=float(os.environ.get("KG_SESSION_TTL", "3600")),
+        )
+    return _runtime
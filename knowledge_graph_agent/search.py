@@ -0,0 +1,279 @@
+"""
+Text search over a graph's entity names, aliases and predicates.
+
+The KnowledgeBase updates the index as it adds entities, aliases and
+triplets, so search always sees the current graph and nothing is rebuilt:
+
+- Names are split into case- and accent-insensitive words, and an inverted
+  index maps each word to the entries (names or aliases) containing it.
+- Prefix lookups use sorted arrays: bisect to the prefix, then read the
+  contiguous run of strings that start with it. One holds the vocabulary,
+  the other every whole name, so names that start with the query (which
+  outrank names that only contain its words) are found first. New strings go
+  to a small unsorted buffer, flushed into a stack of sorted runs that merge
+  like a binary counter, so inserting is O(log n) amortized and a lookup
+  bisects O(log n) runs.
+- A query matches entries containing all of its words, with the last word
+  as a prefix, since it may still be being typed. Each query has a scan
+  budget, so latency does not grow with the graph.
+
+Results rank exact names first, then names starting with the query, then by
+the share of the name the query covers, then by degree (entities) or
+triplet count (predicates).
+
+    python -m knowledge_graph_agent.search   # index and query latency up to a million entities
+"""
+import heapq
+import re
+import time
+import unicodedata
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+KINDS = ("entity", "predicate")
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased words of `text`, with accents removed."""
+    text = text.casefold()
+    if not text.isascii():
+        text = "".join(ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch))
+    return _WORD.findall(text)
+
+
+def _prefixed(run: List[str], prefix: str) -> Iterator[str]:
+    i = bisect_left(run, prefix)
+    while i < len(run) and run[i].startswith(prefix):
+        yield run[i]
+        i += 1
+
+
+class _SortedRuns:
+    """Sorted strings with cheap inserts, for prefix lookups."""
+
+    def __init__(self, buffer_size: int = 256):
+        self.buffer_size = buffer_size
+        self._runs: List[List[str]] = []  # each at most half the size of the one below it
+        self._buffer: List[str] = []
+
+    def add(self, item: str):
+        self._buffer.append(item)
+        if len(self._buffer) < self.buffer_size:
+            return
+        run = sorted(self._buffer)
+        self._buffer = []
+        while self._runs and len(self._runs[-1]) <= len(run):
+            run = self._runs.pop() + run
+            run.sort()  # two sorted halves: timsort merges them in linear time
+        self._runs.append(run)
+
+    def prefixed(self, prefix: str) -> Iterator[str]:
+        """Every string starting with `prefix`, in sorted order."""
+        sources = [_prefixed(run, prefix) for run in self._runs]
+        sources.append(iter(sorted(item for item in self._buffer if item.startswith(prefix))))
+        return heapq.merge(*sources)
+
+
+class SearchIndex:
+    def __init__(self):
+        # Entry i is (kind, target, text): `text` is the indexed name or alias of `target`.
+        self._entries: List[Tuple[str, str, str]] = []
+        self._entry_ids: Dict[Tuple[str, str, str], int] = {}
+        self._words: List[Tuple[str, ...]] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._vocabulary = _SortedRuns()
+        # "<words joined by spaces>\0<entry>": "\0" sorts first, so an exact name comes before longer ones.
+        self._names = _SortedRuns()
+        self.predicate_counts: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add_entity(self, name: str, alias: Optional[str] = None):
+        """Indexes an entity under its name, or under `alias` when given."""
+        self._add("entity", name, name if alias is None else alias)
+
+    def add_predicate(self, predicate: str):
+        """Counts one more triplet with `predicate`, indexing it the first time."""
+        count = self.predicate_counts.get(predicate, 0)
+        self.predicate_counts[predicate] = count + 1
+        if not count:
+            self._add("predicate", predicate, predicate)
+
+    def _add(self, kind: str, target: str, text: str):
+        key = (kind, target, text)
+        if key in self._entry_ids:
+            return
+        words = tuple(tokenize(text))
+        if not words:
+            return
+        entry = len(self._entries)
+        self._entry_ids[key] = entry
+        self._entries.append(key)
+        self._words.append(words)
+        self._names.add(f"{' '.join(words)}\0{entry}")
+        for word in dict.fromkeys(words):
+            postings = self._postings.get(word)
+            if postings is None:
+                self._postings[word] = [entry]
+                self._vocabulary.add(word)
+            else:
+                postings.append(entry)
+
+    def _candidates(self, words: List[str], kind: Optional[str], limit: int,
+                    max_scan: int) -> Tuple[List[Tuple[int, int, int]], bool]:
+        """(entry, tier, number of words in the entry) for entries matching `words`, and whether the budget ran out."""
+        phrase = " ".join(words)
+        matches: List[Tuple[int, int, int]] = []
+        seen = set()
+        scanned = 0
+        # Distinct targets found so far: several aliases of one entity make one result.
+        wanted = set()
+        # Names that start with the query first (tier 1, or 2 for the whole name);
+        # the name index alone tells their tier and length.
+        for name in self._names.prefixed(phrase):
+            scanned += 1
+            if scanned > max_scan:
+                return matches, True
+            joined, _, entry = name.rpartition("\0")
+            entry = int(entry)
+            seen.add(entry)
+            matches.append((entry, 2 if joined == phrase else 1, joined.count(" ") + 1))
+            entry_kind, target, _ = self._entries[entry]
+            if kind is None or entry_kind == kind:
+                wanted.add((entry_kind, target))
+        if len(wanted) >= limit:
+            # Enough of them, and names that only contain the query's words rank lower.
+            return matches, False
+        # Then names containing the query's words elsewhere (tier 0).
+        *whole, prefix = words
+        if whole:
+            # Walk the shortest posting list and check the rest of the query against each entry's words.
+            postings = [self._postings.get(word) for word in whole]
+            if None in postings:
+                return matches, False
+            for entry in min(postings, key=len):
+                scanned += 1
+                if scanned > max_scan:
+                    return matches, True
+                entry_words = self._words[entry]
+                if entry not in seen and all(word in entry_words for word in whole) \
+                        and any(word.startswith(prefix) for word in entry_words):
+                    matches.append((entry, 0, len(entry_words)))
+            return matches, False
+        for word in self._vocabulary.prefixed(prefix):
+            for entry in self._postings[word]:
+                scanned += 1
+                if scanned > max_scan:
+                    return matches, True
+                if entry not in seen:
+                    seen.add(entry)
+                    matches.append((entry, 0, len(self._words[entry])))
+        return matches, False
+
+    def search(self, query: str, limit: int = 20, kind: Optional[str] = None,
+               degree: Optional[Callable[[str], int]] = None, max_scan: int = 1_000) -> Dict[str, Any]:
+        """
+        The best `limit` entities and predicates for `query`, one result per
+        entity even when several of its aliases match. `degree` weighs entities
+        against each other. `truncated` is set when the scan budget ran out
+        before every candidate was seen.
+        """
+        if kind is not None and kind not in KINDS:
+            raise ValueError(f"Unknown kind {kind!r}; choose one of {', '.join(KINDS)}")
+        words = tokenize(query)
+        if not words:
+            return {"query": query, "results": [], "truncated": False}
+        matches, truncated = self._candidates(words, kind, limit, max_scan)
+        n = len(words)
+        entries, predicate_counts = self._entries, self.predicate_counts
+        best: Dict[Tuple[str, str], Tuple[Tuple[int, float, int], str]] = {}
+        for entry, tier, length in matches:
+            entry_kind, target, text = entries[entry]
+            if kind is not None and entry_kind != kind:
+                continue
+            if entry_kind == "entity":
+                weight = degree(target) if degree else 0
+            else:
+                weight = predicate_counts[target]
+            rank = (tier, n / length, weight)
+            current = best.get((entry_kind, target))
+            if current is None or rank > current[0]:
+                best[(entry_kind, target)] = (rank, text)
+        results = []
+        for (entry_kind, target), ((tier, coverage, weight), text) in heapq.nlargest(
+                limit, best.items(), key=lambda item: item[1][0]):
+            result = {"kind": entry_kind, "name": target, "score": round(tier + coverage, 3),
+                      "degree" if entry_kind == "entity" else "triplets": weight}
+            if text != target:
+                result["matched"] = text
+            results.append(result)
+        return {"query": query, "results": results, "truncated": truncated}
+
+    def complete(self, prefix: str, limit: int = 10, kind: Optional[str] = None,
+                 degree: Optional[Callable[[str], int]] = None) -> Dict[str, Any]:
+        """Completions for a partly typed name: the texts of the best matches, on a smaller scan budget."""
+        found = self.search(prefix, limit=limit, kind=kind, degree=degree, max_scan=500)
+        suggestions = [{"text": result.get("matched", result["name"]), "kind": result["kind"], "name": result["name"]}
+                       for result in found["results"]]
+        return {"prefix": prefix, "suggestions": suggestions, "truncated": found["truncated"]}
+
+
+if __name__ == "__main__":
+    import random
+
+    rng = random.Random(0)
+    syllables = ["an", "ber", "cor", "dal", "el", "fen", "gor", "hal", "is", "jor", "ka", "lin", "mor", "nel",
+                 "or", "pra", "quin", "ros", "sal", "tor", "ul", "ven", "wil", "xan", "yor", "zen"]
+
+    def word() -> str:
+        return "".join(rng.choices(syllables, k=rng.randint(2, 4)))
+
+    index = SearchIndex()
+    names: List[str] = []
+    degrees: Dict[str, int] = {}
+    for size in (10_000, 100_000, 1_000_000):
+        before, start = len(names), time.perf_counter()
+        while len(names) < size:
+            name = " ".join(word().title() for _ in range(rng.randint(1, 3)))
+            names.append(name)
+            degrees[name] = int(rng.paretovariate(1.5))
+            index.add_entity(name)
+            if rng.random() < 0.1:
+                index.add_entity(name, alias=name.upper().replace(" ", "-"))
+        insert_us = (time.perf_counter() - start) / (len(names) - before) * 1e6
+        probes = [rng.choice(names) for _ in range(200)]
+        queries = {
+            "exact name": probes,
+            "first word": [probe.split()[0] for probe in probes],
+            "prefix (3 chars)": [probe[:3] for probe in probes],
+            "two words, partial": [probe.rsplit(" ", 1)[0] + " " + probe.split()[-1][:2] if " " in probe
+                                   else probe[:4] for probe in probes],
+        }
+        print(f"{len(index):>8} entries ({len(names)} entities, {len(index._postings)} words), "
+              f"{insert_us:.1f} us/insert")
+        for label, texts in queries.items():
+            timings = []
+            for text in texts:
+                started = time.perf_counter()
+                index.search(text, degree=degrees.get)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            print(f"  search {label:<20} median {timings[len(timings) // 2] * 1e3:6.3f} ms  "
+                  f"p99 {timings[int(len(timings) * 0.99)] * 1e3:6.3f} ms")
+        # What clients did until now: scan the node list for a substring.
+        started = time.perf_counter()
+        for text in queries["first word"][:20]:
+            needle = text.casefold()
+            [name for name in names if needle in name.casefold()]
+        print(f"  client-side scan{'':<13} {(time.perf_counter() - started) / 20 * 1e3:8.3f} ms")
+        timings = []
+        for probe in probes:
+            started = time.perf_counter()
+            index.complete(probe[:2], degree=degrees.get)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(f"  complete 2 chars{'':<13} median {timings[len(timings) // 2] * 1e3:6.3f} ms  "
+              f"p99 {timings[int(len(timings) * 0.99)] * 1e3:6.3f} ms")
@@ -1,12 +1,53 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+import asyncio
 import os
-import base64
-from knowledge_graph_agent.main import run_agent
+import json
+import zlib
+from dotenv import load_dotenv
 
-app = FastAPI(title="Dynamic Knowledge Graph Agent API")
+# Loaded here as well as in main.py, which is now only imported on first use.
+load_dotenv()
+
+from knowledge_graph_agent.jobs import JobQueue, QueueFullError
+from knowledge_graph_agent.metrics import REGISTRY
+from knowledge_graph_agent.artifacts import get_artifact_store
+from knowledge_graph_agent.graph_tools import find_graph
+from knowledge_graph_agent.corpus import get_corpus
+from knowledge_graph_agent import export, graph_queries
+from knowledge_graph_agent.warmup import get_warmup
+
+# Bounded pool of pipeline workers behind the /jobs API
+job_queue = JobQueue(
+    workers=int(os.environ.get("KG_WORKERS", "2")),
+    max_queued=int(os.environ.get("KG_QUEUE_SIZE", "16")),
+    job_timeout=float(os.environ.get("KG_JOB_TIMEOUT", "600")),
+)
+
+# "background" warms up after start-up, "blocking" before accepting requests,
+# "off" leaves it to the first /ready probe (see warmup.py).
+WARMUP_MODE = os.environ.get("KG_WARMUP", "background")
+
+def _pipeline():
+    # main.py pulls in the whole ADK stack, so it is imported on first use (or by warm-up).
+    from knowledge_graph_agent import main
+    return main
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue.start()
+    if WARMUP_MODE == "blocking":
+        await get_warmup().wait()
+    elif WARMUP_MODE == "background":
+        get_warmup().start()
+    yield
+    await job_queue.stop()
+
+app = FastAPI(title="Dynamic Knowledge Graph Agent API", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -25,27 +66,252 @@ class GenerateRequest(BaseModel):
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up. See /ready for whether it can serve requests quickly."""
     return {"status": "ok"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once warm-up has finished, 503 (starting warm-up if needed) until then."""
+    warmup = get_warmup()
+    warmup.start()
+    if not warmup.ready:
+        return JSONResponse(warmup.get_status(), status_code=503)
+    return warmup.get_status()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of agent, model, tool, layout and render timings."""
+    return PlainTextResponse(REGISTRY.expose(), media_type="text/plain; version=0.0.4")
+
 @app.post("/generate")
 async def generate_graph(request: GenerateRequest):
     try:
         # Run the agent
-        result = await run_agent(request.topic)
-        
-        # Read the generated image and encode to base64
-        image_path = result.get("image_path")
-        if image_path and os.path.exists(image_path):
-            with open(image_path, "rb") as img_file:
-                encoded_string = base64.b64encode(img_file.read()).decode('utf-8')
-                result["image_base64"] = encoded_string
-        else:
-            result["image_base64"] = None
-            
-        return result
+        return await _pipeline().run_agent(request.topic)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/generate/stream")
+async def generate_graph_stream(request: GenerateRequest):
+    """
+    Server-Sent Events version of /generate.
+    Emits 'text', 'triplet' and 'artifact' events while the pipeline runs,
+    then a final 'done' event carrying the same payload as /generate.
+    """
+    async def event_source():
+        try:
+            async for update in _pipeline().stream_agent(request.topic):
+                yield f"event: {update['type']}\ndata: {json.dumps(update)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+
+    return StreamingResponse(event_source(), media_type="text/event-stream")
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: GenerateRequest):
+    """Queues a graph generation job and returns its id immediately."""
+    try:
+        job = job_queue.submit(request.topic)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Returns the job's status and progress, plus the /generate payload once it succeeded."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    response = job.to_dict()
+    if job.result is not None:
+        response["result"] = job.result
+    return response
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/jobs")
+async def job_stats():
+    return job_queue.get_stats()
+
+@app.api_route("/artifacts/{artifact_id}", methods=["GET", "HEAD"])
+async def get_artifact(artifact_id: str, request: Request):
+    """
+    Streams a stored artifact. Artifacts are immutable and named by content hash,
+    so the ID doubles as a strong ETag and responses may be cached forever.
+    Range requests are answered with 206 partial content.
+    """
+    store = get_artifact_store()
+    if not artifact_id.isalnum() or not store.exists(artifact_id):
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    etag = f'"{artifact_id}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(store.path(artifact_id), media_type="image/png", headers=headers)
+
+# Read-only queries over finished graphs, addressed by the graph_id in /generate results.
+# Every query is bounded, so a client can explore a large graph a piece at a time.
+
+def _graph_or_404(graph_id: str, finished: bool = False):
+    """
+    The graph, or a 404. Pass finished=True for queries run in a worker thread:
+    a running graph is still being changed on the event loop, so those get a 409.
+    """
+    kb = find_graph(graph_id, running=not finished)
+    if kb is None:
+        if finished and find_graph(graph_id) is not None:
+            raise HTTPException(status_code=409, detail="Graph is still being built")
+        raise HTTPException(status_code=404, detail="Graph not found or expired")
+    return kb
+
+def _query(fn, *args, **kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except graph_queries.UnknownEntityError as e:
+        raise HTTPException(status_code=404, detail=f"Entity not found: {e.args[0]}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/graphs/{graph_id}/ego")
+async def graph_ego(graph_id: str, node: str, max_nodes: int = Query(100, ge=1, le=1000)):
+    """An entity and its direct neighbours, with the edges among them."""
+    return _query(graph_queries.neighborhood, _graph_or_404(graph_id), node, hops=1, max_nodes=max_nodes)
+
+@app.get("/graphs/{graph_id}/subgraph")
+async def graph_subgraph(graph_id: str, node: str, hops: int = Query(2, ge=1, le=5),
+                         max_nodes: int = Query(200, ge=1, le=1000),
+                         max_edges: int = Query(500, ge=1, le=5000)):
+    """Everything within `hops` of an entity, cut off at `max_nodes` / `max_edges`."""
+    return _query(graph_queries.neighborhood, _graph_or_404(graph_id), node,
+                  hops=hops, max_nodes=max_nodes, max_edges=max_edges)
+
+@app.get("/graphs/{graph_id}/path")
+async def graph_path(graph_id: str, source: str, target: str, max_hops: int = Query(6, ge=1, le=10)):
+    """Shortest connection between two entities, ignoring edge direction."""
+    return _query(graph_queries.shortest_path, _graph_or_404(graph_id), source, target, max_hops=max_hops)
+
+@app.get("/graphs/{graph_id}/summary")
+async def graph_summary(graph_id: str, max_nodes: int = Query(100, ge=2, le=500),
+                        max_edges: int = Query(300, ge=1, le=2000), level: int = Query(None, ge=0),
+                        community: str = None):
+    """
+    Level-of-detail view: communities as super-nodes, at most `max_nodes` of them.
+    `levels` lists the available zoom levels; pass a community ID to zoom into it.
+    """
+    kb = _graph_or_404(graph_id, finished=True)
+    # Community detection is CPU-bound on big graphs (cached per graph version).
+    return await asyncio.to_thread(_query, kb.get_summary, max_nodes=max_nodes, max_edges=max_edges,
+                                   level=level, community=community)
+
+@app.get("/graphs/{graph_id}/layout")
+async def graph_layout(graph_id: str, mode: str = "force"):
+    """Node coordinates for a layout mode, computed on the first request and cached until the graph changes."""
+    kb = _graph_or_404(graph_id, finished=True)
+    # Layout is CPU-bound on big graphs, so keep it off the event loop.
+    return await asyncio.to_thread(_query, kb.get_layout, mode)
+
+@app.get("/graphs/{graph_id}/importance")
+async def graph_importance(graph_id: str, limit: int = Query(None, ge=1)):
+    """
+    Node importance (degree, PageRank, sampled betweenness) and edges ranked by
+    it, most important first; `limit` keeps the top edges. Cached like /layout.
+    """
+    kb = _graph_or_404(graph_id, finished=True)
+    return await asyncio.to_thread(_query, kb.get_importance, limit)
+
+@app.get("/graphs/{graph_id}/search")
+async def graph_search(graph_id: str, q: str, kind: str = None, limit: int = Query(20, ge=1, le=100)):
+    """
+    Entities (by name or alias) and predicates matching `q`, best first; the
+    last word matches as a prefix. `kind` is "entity" or "predicate".
+    """
+    return _query(_graph_or_404(graph_id).search, q, limit=limit, kind=kind)
+
+@app.get("/graphs/{graph_id}/autocomplete")
+async def graph_autocomplete(graph_id: str, prefix: str, kind: str = None, limit: int = Query(10, ge=1, le=50)):
+    """Completions for a partly typed entity or predicate name, best first."""
+    return _query(_graph_or_404(graph_id).autocomplete, prefix, limit=limit, kind=kind)
+
+@app.get("/graphs/{graph_id}/nodes")
+async def graph_nodes(graph_id: str, cursor: str = None, limit: int = Query(100, ge=1, le=1000)):
+    return _query(graph_queries.list_nodes, _graph_or_404(graph_id), cursor, limit)
+
+@app.get("/graphs/{graph_id}/edges")
+async def graph_edges(graph_id: str, cursor: str = None, limit: int = Query(100, ge=1, le=1000)):
+    return _query(graph_queries.list_edges, _graph_or_404(graph_id), cursor, limit)
+
+# The long-lived corpus graph every finished run is merged into (KG_CORPUS_PATH, see corpus.py).
+# Only the part a query needs is read from disk.
+
+def _corpus_or_404():
+    corpus = get_corpus()
+    if corpus is None:
+        raise HTTPException(status_code=404, detail="No corpus configured (set KG_CORPUS_PATH)")
+    return corpus
+
+@app.get("/corpus")
+async def corpus_stats():
+    return await asyncio.to_thread(_corpus_or_404().get_stats)
+
+@app.get("/corpus/subgraph")
+async def corpus_subgraph(node: str, hops: int = Query(1, ge=1, le=5),
+                          max_nodes: int = Query(200, ge=1, le=1000),
+                          max_edges: int = Query(500, ge=1, le=5000)):
+    """Everything within `hops` of an entity across all runs, cut off at `max_nodes` / `max_edges`."""
+    corpus = _corpus_or_404()
+    kb = await asyncio.to_thread(_query, corpus.load_subgraph, node, hops=hops,
+                                 max_nodes=max_nodes, max_edges=max_edges)
+    return _query(graph_queries.neighborhood, kb, node, hops=hops, max_nodes=max_nodes, max_edges=max_edges)
+
+@app.get("/corpus/provenance")
+async def corpus_provenance(subject: str = None, predicate: str = None, object: str = None,
+                            limit: int = Query(100, ge=1, le=1000)):
+    """The triplets matching a pattern, each with the runs (and topics) that added it."""
+    corpus = _corpus_or_404()
+    return await asyncio.to_thread(_query, corpus.provenance, subject, predicate, object, limit=limit)
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+@app.get("/graphs/{graph_id}/export")
+async def graph_export(graph_id: str, request: Request, format: str = None, compress: bool = True):
+    """
+    The whole graph as a download. The format comes from ?format= or the Accept
+    header: json, compact (dictionary-encoded JSON), ndjson (streamed), graphml
+    or columnar (numpy .npz columns). Text formats are gzipped for clients that
+    accept it, unless compress=false; columnar archives are compressed internally.
+    """
+    kb = _graph_or_404(graph_id, finished=True)
+    try:
+        name = export.negotiate(request.headers.get("accept"), format)
+    except export.UnsupportedFormatError as e:
+        # A bad ?format= is a bad request; an Accept header we cannot satisfy is 406.
+        raise HTTPException(status_code=400 if format else 406, detail=str(e))
+    headers = {
+        "Content-Disposition": f'attachment; filename="{graph_id}.{export.EXTENSIONS[name]}"',
+        "Vary": "Accept, Accept-Encoding",
+    }
+    # Encode the snapshot once, off the event loop; the writers then stream from it.
+    await asyncio.to_thread(kb.get_encoded_state)
+    if name == "columnar":
+        body = await asyncio.to_thread(export.to_columnar, kb, compress)
+        return Response(body, media_type=export.FORMATS[name], headers=headers)
+    chunks = export.export(kb, name)
+    if compress and "gzip" in request.headers.get("accept-encoding", ""):
+        chunks = _gzip(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=export.FORMATS[name], headers=headers)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,235 @@
+"""
+Hexastore-style in-memory triple store.
+
+Terms are interned to integer IDs and every triple is indexed three ways:
+SPO (subject -> predicate -> objects), POS and OSP. Any triple pattern with
+wildcards is answered from the index whose leading keys are the bound terms,
+so a lookup costs time proportional to the number of results, and a pair of
+entities can hold any number of distinct predicates.
+"""
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+Triple = Tuple[str, str, str]
+
+# Ordered "sets" are dicts with None values: O(1) membership, stable iteration order.
+_Index = Dict[int, Dict[int, Dict[int, None]]]
+
+
+def _insert(index: _Index, a: int, b: int, c: int) -> bool:
+    inner = index.setdefault(a, {}).setdefault(b, {})
+    if c in inner:
+        return False
+    inner[c] = None
+    return True
+
+
+def _remove(index: _Index, a: int, b: int, c: int):
+    inner = index[a][b]
+    del inner[c]
+    if not inner:
+        del index[a][b]
+        if not index[a]:
+            del index[a]
+
+
+class TripleStore:
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._terms: List[str] = []
+        self._nodes: Dict[int, None] = {}
+        self._spo: _Index = {}
+        self._pos: _Index = {}
+        self._osp: _Index = {}
+        self._out_degree: Dict[int, int] = {}
+        self._in_degree: Dict[int, int] = {}
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, triple: Triple) -> bool:
+        s, p, o = (self._ids.get(term) for term in triple)
+        return None not in (s, p, o) and o in self._spo.get(s, {}).get(p, {})
+
+    def _intern(self, term: str) -> int:
+        term_id = self._ids.get(term)
+        if term_id is None:
+            term_id = len(self._terms)
+            self._ids[term] = term_id
+            self._terms.append(term)
+        return term_id
+
+    def add_node(self, name: str):
+        self._nodes.setdefault(self._intern(name))
+
+    def has_node(self, name: str) -> bool:
+        term_id = self._ids.get(name)
+        return term_id is not None and term_id in self._nodes
+
+    def nodes(self) -> List[str]:
+        return [self._terms[i] for i in self._nodes]
+
+    def num_nodes(self) -> int:
+        return len(self._nodes)
+
+    def add(self, subject: str, predicate: str, object_: str) -> bool:
+        """Adds a triple; returns False if it was already present."""
+        s, p, o = self._intern(subject), self._intern(predicate), self._intern(object_)
+        if not _insert(self._spo, s, p, o):
+            return False
+        _insert(self._pos, p, o, s)
+        _insert(self._osp, o, s, p)
+        self._nodes.setdefault(s)
+        self._nodes.setdefault(o)
+        self._out_degree[s] = self._out_degree.get(s, 0) + 1
+        self._in_degree[o] = self._in_degree.get(o, 0) + 1
+        self._count += 1
+        return True
+
+    def add_many(self, triples: Iterable[Triple]) -> int:
+        return sum(self.add(s, p, o) for s, p, o in triples)
+
+    def discard(self, subject: str, predicate: str, object_: str) -> bool:
+        """Removes a triple if present. Its entities stay in the store as nodes."""
+        if (subject, predicate, object_) not in self:
+            return False
+        s, p, o = self._ids[subject], self._ids[predicate], self._ids[object_]
+        _remove(self._spo, s, p, o)
+        _remove(self._pos, p, o, s)
+        _remove(self._osp, o, s, p)
+        self._out_degree[s] -= 1
+        self._in_degree[o] -= 1
+        self._count -= 1
+        return True
+
+    def clear(self):
+        self.__init__()
+
+    def match(self, subject: Optional[str] = None, predicate: Optional[str] = None,
+              object_: Optional[str] = None) -> Iterator[Triple]:
+        """Yields every triple matching the pattern; None is a wildcard."""
+        ids = self._ids
+        s = ids.get(subject) if subject is not None else None
+        p = ids.get(predicate) if predicate is not None else None
+        o = ids.get(object_) if object_ is not None else None
+        # A bound term we have never seen cannot match anything.
+        if (subject is not None and s is None) or (predicate is not None and p is None) \
+                or (object_ is not None and o is None):
+            return
+        t = self._terms
+
+        if s is not None and p is not None and o is not None:
+            if o in self._spo.get(s, {}).get(p, {}):
+                yield subject, predicate, object_
+        elif s is not None and p is not None:
+            for oo in self._spo.get(s, {}).get(p, {}):
+                yield subject, predicate, t[oo]
+        elif s is not None and o is not None:
+            for pp in self._osp.get(o, {}).get(s, {}):
+                yield subject, t[pp], object_
+        elif p is not None and o is not None:
+            for ss in self._pos.get(p, {}).get(o, {}):
+                yield t[ss], predicate, object_
+        elif s is not None:
+            for pp, objects in self._spo.get(s, {}).items():
+                for oo in objects:
+                    yield subject, t[pp], t[oo]
+        elif p is not None:
+            for oo, subjects in self._pos.get(p, {}).items():
+                for ss in subjects:
+                    yield t[ss], predicate, t[oo]
+        elif o is not None:
+            for ss, predicates in self._osp.get(o, {}).items():
+                for pp in predicates:
+                    yield t[ss], t[pp], object_
+        else:
+            for ss, by_predicate in self._spo.items():
+                for pp, objects in by_predicate.items():
+                    for oo in objects:
+                        yield t[ss], t[pp], t[oo]
+
+    def encode(self) -> Tuple[List[str], List[str], List[Tuple[int, int, int]]]:
+        """
+        Dictionary-encoded copy of the store: (nodes, predicates, triples), each
+        triple being (subject, predicate, object) indexes into the two lists.
+        Built from the interned IDs, so no term is hashed again. Triples come in
+        the same order as `match()`.
+        """
+        position = [0] * len(self._terms)  # term ID -> node index; a list is faster than a dict here
+        for i, term_id in enumerate(self._nodes):
+            position[term_id] = i
+        predicate_index: Dict[int, int] = {}
+        triples = []
+        append = triples.append
+        for s, by_predicate in self._spo.items():
+            si = position[s]
+            for p, objects in by_predicate.items():
+                pi = predicate_index.setdefault(p, len(predicate_index))
+                for o in objects:
+                    append((si, pi, position[o]))
+        t = self._terms
+        return [t[i] for i in self._nodes], [t[p] for p in predicate_index], triples
+
+    def out_degree(self, node: str) -> int:
+        term_id = self._ids.get(node)
+        return self._out_degree.get(term_id, 0) if term_id is not None else 0
+
+    def in_degree(self, node: str) -> int:
+        term_id = self._ids.get(node)
+        return self._in_degree.get(term_id, 0) if term_id is not None else 0
+
+    def count(self, subject: Optional[str] = None, predicate: Optional[str] = None,
+              object_: Optional[str] = None) -> int:
+        return sum(1 for _ in self.match(subject, predicate, object_))
+
+    def to_networkx(self):
+        """Builds a MultiDiGraph view (one edge per triple, keyed by predicate) for layout and algorithms."""
+        import networkx as nx
+
+        graph = nx.MultiDiGraph()
+        graph.add_nodes_from(self.nodes())
+        graph.add_edges_from((s, o, p, {"relation": p}) for s, p, o in self.match())
+        return graph
+
+
+if __name__ == "__main__":
+    # Microbenchmark against the plain DiGraph it replaces: python -m knowledge_graph_agent.triplestore
+    import random
+
+    import networkx as nx
+
+    rng = random.Random(0)
+    entities = [f"entity_{i}" for i in range(20_000)]
+    predicates = [f"relation_{i}" for i in range(50)]
+    triples = [(rng.choice(entities), rng.choice(predicates), rng.choice(entities)) for _ in range(200_000)]
+
+    start = time.perf_counter()
+    graph = nx.DiGraph()
+    for s, p, o in triples:
+        graph.add_edge(s, o, relation=p)
+    digraph_insert = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store = TripleStore()
+    store.add_many(triples)
+    store_insert = time.perf_counter() - start
+    print(f"insert {len(triples)} triples: DiGraph {digraph_insert:.2f}s "
+          f"({graph.number_of_edges()} edges kept), TripleStore {store_insert:.2f}s ({len(store)} triples kept)")
+
+    queries = [
+        ("predicate=X", lambda: [e for e in graph.edges(data=True) if e[2]["relation"] == "relation_7"],
+         lambda: list(store.match(predicate="relation_7"))),
+        ("object=Y, predicate=Z", lambda: [(u, v) for u, v, r in graph.in_edges("entity_42", data="relation") if r == "relation_7"],
+         lambda: list(store.match(predicate="relation_7", object_="entity_42"))),
+        ("subject=X", lambda: list(graph.out_edges("entity_42", data="relation")),
+         lambda: list(store.match(subject="entity_42"))),
+    ]
+    for name, scan, indexed in queries:
+        timings = []
+        for fn in (scan, indexed):
+            start = time.perf_counter()
+            for _ in range(20):
+                fn()
+            timings.append((time.perf_counter() - start) / 20 * 1e3)
+        print(f"{name:<22} DiGraph {timings[0]:8.3f} ms   TripleStore {timings[1]:8.3f} ms")
@@ -0,0 +1,170 @@
+"""
+Start-up warm-up and readiness.
+
+Importing the server only loads FastAPI and the graph code. The ADK agent
+stack (main.py -> architect.py -> agents.py), the render workers with
+matplotlib and its font cache, and the model clients are loaded here
+instead, by `WarmUp.start()`: in the background at start-up by default
+(KG_WARMUP=background), before the server accepts requests
+(KG_WARMUP=blocking), or on the first /ready probe (KG_WARMUP=off). /ready
+answers 503 until every step has finished; /health only says the process is
+up. Anything warm-up has not loaded yet is loaded on first use instead.
+
+    python -m knowledge_graph_agent.warmup   # import-time profile and start-up timings
+"""
+import asyncio
+import importlib
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def _import_pipeline():
+    # Loads .env, the ADK stack, the agents and the shared runtime.
+    importlib.import_module("knowledge_graph_agent.main")
+
+
+def _import_graph_libraries():
+    importlib.import_module("networkx")
+
+
+def _create_model_clients() -> int:
+    """Builds the API client of every Gemini model up front; a no-op under replay or without credentials."""
+    from google.adk.models.google_llm import Gemini
+    from knowledge_graph_agent import agents
+
+    if "GOOGLE_API_KEY" not in os.environ and not os.environ.get("GOOGLE_GENAI_USE_VERTEXAI"):
+        return 0
+    models = [agent.model for agent in (agents.research_agent, agents.ontology_agent, agents.viz_agent,
+                                        agents.planner_agent, agents.chunk_ontology_agent)]
+    clients = 0
+    for model in models:
+        if isinstance(model, Gemini):
+            model.api_client  # cached on the model
+            clients += 1
+    return clients
+
+
+async def _start_render_workers() -> int:
+    from knowledge_graph_agent.rendering import start_workers
+
+    return await start_workers()
+
+
+# (name, step) in order. Blocking steps run in a thread, so /health stays responsive meanwhile.
+STEPS: List[Tuple[str, Callable[[], Any]]] = [
+    ("pipeline", _import_pipeline),
+    ("graph_libraries", _import_graph_libraries),
+    ("model_clients", _create_model_clients),
+    ("render_workers", _start_render_workers),
+]
+
+
+class WarmUp:
+    def __init__(self, steps: List[Tuple[str, Callable[[], Any]]] = STEPS):
+        self.steps = steps
+        self.status = "pending"  # pending -> warming -> ready | failed
+        self.timings: Dict[str, float] = {}
+        self.results: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def start(self) -> asyncio.Task:
+        """Starts warm-up unless it is running or done; a failed warm-up is retried."""
+        if self._task is None or self.status == "failed":
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self._task
+
+    async def wait(self):
+        await asyncio.shield(self.start())
+
+    async def _run(self):
+        self.status, self.error = "warming", None
+        started = time.perf_counter()
+        try:
+            for name, step in self.steps:
+                step_started = time.perf_counter()
+                if asyncio.iscoroutinefunction(step):
+                    result = await step()
+                else:
+                    result = await asyncio.to_thread(step)
+                self.timings[name] = time.perf_counter() - step_started
+                if result is not None:
+                    self.results[name] = result
+        except Exception as e:
+            self.status, self.error = "failed", f"{name}: {e}"
+            print(f"⚠️ Warm-up failed at {self.error}")
+            return
+        self.timings["total"] = time.perf_counter() - started
+        self.status = "ready"
+
+    def get_status(self) -> Dict[str, Any]:
+        status = {"status": self.status, "timings": self.timings, **self.results}
+        if self.error:
+            status["error"] = self.error
+        return status
+
+
+_warmup: Optional[WarmUp] = None
+
+
+def get_warmup() -> WarmUp:
+    global _warmup
+    if _warmup is None:
+        _warmup = WarmUp()
+    return _warmup
+
+
+def profile_imports(module: str = "knowledge_graph_agent.server", top: int = 15) -> List[Tuple[str, float, float]]:
+    """(module, self seconds, cumulative seconds) for the slowest imports under `module`, from -X importtime."""
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             capture_output=True, text=True, check=True)
+    rows = []
+    for line in process.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if match:
+            rows.append((match.group(4), int(match.group(1)) / 1e6, int(match.group(2)) / 1e6))
+    return sorted(rows, key=lambda row: -row[2])[:top]
+
+
+# Run in a fresh interpreter, so nothing is imported or cached beforehand.
+_STARTUP_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+import knowledge_graph_agent.server
+imported = time.perf_counter() - started
+from knowledge_graph_agent.warmup import get_warmup
+warmup = get_warmup()
+asyncio.run(warmup.wait())
+print(json.dumps({"import_s": imported, "warmup_s": warmup.timings["total"],
+                  "ready_s": time.perf_counter() - started, "steps": warmup.timings}))
+"""
+
+
+def measure_startup() -> Dict[str, Any]:
+    """Seconds to import the server and to finish warm-up, in a fresh interpreter."""
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT], capture_output=True, text=True, check=True)
+    import json
+
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["process_s"] = time.perf_counter() - started
+    return result
+
+
+if __name__ == "__main__":
+    print("Slowest imports of knowledge_graph_agent.server (cumulative):")
+    for name, self_s, cumulative_s in profile_imports():
+        print(f"  {cumulative_s * 1e3:8.1f} ms  {self_s * 1e3:7.1f} ms self  {name}")
+    startup = measure_startup()
+    print(f"Import {startup['import_s']:.2f}s, warm-up {startup['warmup_s']:.2f}s, "
+          f"ready after {startup['ready_s']:.2f}s ({startup['process_s']:.2f}s with interpreter start)")
+    for name, seconds in startup["steps"].items():
+        print(f"  {name:<16} {seconds:.2f}s")
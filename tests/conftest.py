@@ -0,0 +1,23 @@
+"""
+Every test runs offline against the synthetic replay model (see replay.py),
+with no injected latency, and with caches, checkpoints and artifacts in a
+temporary directory.
+"""
+import os
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="kg_tests_")
+# Must be set before main.py (or bench.py) is imported.
+os.environ.update({
+    "KG_REPLAY": "synthetic",
+    "KG_REPLAY_LATENCY": "0",
+    "KG_REPLAY_LATENCY_PER_CHAR": "0",
+    "KG_CACHE_DIR": os.path.join(_workdir, "cache"),
+    "KG_ARTIFACT_DIR": os.path.join(_workdir, "artifacts"),
+    "KG_WARMUP": "off",
+    # Small retention caps, so a soak run reaches its steady state in a few dozen requests.
+    "KG_SESSION_RETENTION": "16",
+    "KG_GRAPH_RETENTION": "8",
+    "KG_CACHE_SIZE": "8",
+})
+os.environ.pop("KG_CORPUS_PATH", None)
@@ -0,0 +1,56 @@
+"""The artifact store and its HTTP endpoint: validators, ranges and eviction."""
+import hashlib
+import os
+import time
+
+from knowledge_graph_agent.artifacts import ArtifactStore, get_artifact_store
+from tests.test_server import _requests
+
+
+def _put(store, data):
+    artifact_id = hashlib.sha256(data).hexdigest()[:32]
+    with open(store.path(artifact_id), "wb") as f:
+        f.write(data)
+    store.register(artifact_id)
+    return artifact_id
+
+
+def test_etag_revalidation_and_ranges():
+    data = bytes(range(256)) * 4
+    artifact_id = _put(get_artifact_store(), data)
+    url = f"/artifacts/{artifact_id}"
+    full, cached, ranged, head, missing = _requests(
+        lambda client: client.get(url),
+        lambda client: client.get(url, headers={"If-None-Match": f'"{artifact_id}"'}),
+        lambda client: client.get(url, headers={"Range": "bytes=10-19"}),
+        lambda client: client.head(url),
+        lambda client: client.get("/artifacts/0123abcd"),
+    )
+    assert full.status_code == 200 and full.content == data
+    assert full.headers["etag"] == f'"{artifact_id}"'
+    assert full.headers["content-type"] == "image/png"
+    assert cached.status_code == 304 and cached.content == b""
+    assert ranged.status_code == 206 and ranged.content == data[10:20]
+    assert head.status_code == 200 and int(head.headers["content-length"]) == len(data)
+    assert missing.status_code == 404
+
+
+def test_expired_artifacts_are_evicted_on_lookup(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_age_seconds=60)
+    old, new = _put(store, b"old"), _put(store, b"new")
+    created, size = store._index[old]
+    store._index[old] = (created - 3600, size)
+    assert not store.exists(old)
+    assert not os.path.exists(store.path(old))
+    assert store.exists(new)
+    assert store.get_stats()["bytes"] == len(b"new")
+
+
+def test_size_cap_evicts_oldest_first(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=10)
+    first = _put(store, b"123456")
+    time.sleep(0.01)
+    second = _put(store, b"abcdef")
+    assert not store.exists(first) and store.exists(second)
+    assert store.describe(first) is None
+    assert store.describe(second)["size"] == 6
@@ -0,0 +1,71 @@
+"""The benchmark scenarios from bench.py at small sizes, checked for the properties they measure."""
+import pytest
+
+from knowledge_graph_agent import bench, export
+from knowledge_graph_agent.graph_tools import KnowledgeBase
+from knowledge_graph_agent.layout import LAYOUT_MODES
+
+
+def test_kb_insert():
+    [result] = bench.bench_kb_insert(sizes=(1_000,))
+    assert result["params"] == {"triplets": 1_000}
+    assert result["metrics"]["seconds"] > 0
+
+    # The same batched workload, checked for what it builds.
+    triplets = bench._random_triplets(1_000)
+    kb = KnowledgeBase()
+    for start in range(0, len(triplets), 50):
+        kb.add_triplets(triplets[start:start + 50])
+    assert kb.num_edges() == len(set(triplets))
+    assert kb.num_nodes() == len({s for s, _, _ in triplets} | {o for _, _, o in triplets})
+    assert kb.version == kb.num_nodes() + kb.num_edges()
+
+
+def test_get_state():
+    [result] = bench.bench_get_state(sizes=(1_000,))
+    metrics = result["metrics"]
+    assert 0 < metrics["compact_bytes"] < metrics["full_bytes"]
+    assert metrics["delta_10_seconds"] < metrics["full_seconds"]
+
+
+def test_export():
+    [result] = bench.bench_export(sizes=(1_000,))
+    metrics = result["metrics"]
+    for name in export.FORMATS:
+        assert metrics[f"{name}_bytes"] > 0
+    assert metrics["compact_bytes"] < metrics["json_bytes"] < metrics["pretty_json_bytes"]
+    assert metrics["columnar_bytes"] < metrics["compact_bytes"]
+
+
+def test_layout():
+    [result] = bench.bench_layout(sizes=(200,))
+    assert set(result["metrics"]) == {f"{mode}_seconds" for mode in LAYOUT_MODES}
+
+    kb = KnowledgeBase()
+    kb.add_triplets(bench._random_triplets(200))
+    for mode in LAYOUT_MODES:
+        assert set(kb.compute_layout(mode)) == set(kb.store.nodes())
+
+
+def test_render():
+    [result] = bench.bench_render(nodes=30)
+    metrics = result["metrics"]
+    assert metrics["cached_hit"]
+    assert metrics["cached_seconds"] < metrics["cold_seconds"]
+
+
+def test_generate():
+    results = bench.bench_generate(concurrency_levels=(1, 4), requests_per_level=4)
+    assert [r["params"]["concurrency"] for r in results] == [1, 4]
+    for result in results:
+        metrics = result["metrics"]
+        assert metrics["requests"] == 4
+        assert metrics["throughput_rps"] > 0
+        assert metrics["p50_seconds"] <= metrics["p95_seconds"] <= metrics["max_seconds"]
+
+
+@pytest.mark.slow
+def test_startup():
+    [result] = bench.bench_startup(runs=1)
+    metrics = result["metrics"]
+    assert 0 < metrics["import_seconds"] <= metrics["ready_seconds"]
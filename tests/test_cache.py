@@ -0,0 +1,111 @@
+"""Single-flight runs in the topic cache."""
+import asyncio
+
+import pytest
+
+from knowledge_graph_agent.cache import TopicCache
+
+
+def _producer(runs, started=None, release=None):
+    async def produce():
+        runs.append(1)
+        yield {"type": "text", "text": "first"}
+        if started is not None:
+            started.set()
+        if release is not None:
+            await release.wait()
+        yield {"type": "text", "text": "second"}
+        yield {"type": "done", "result": {"value": len(runs)}}
+    return produce
+
+
+async def _collect(cache, topic, produce):
+    return [(update, hit) async for update, hit in cache.stream_or_follow(topic, produce)]
+
+
+def test_concurrent_streams_share_one_run(tmp_path):
+    async def scenario():
+        cache = TopicCache(cache_dir=str(tmp_path))
+        runs, started, release = [], asyncio.Event(), asyncio.Event()
+        first = asyncio.create_task(_collect(cache, "Topic", _producer(runs, started, release)))
+        await started.wait()
+        # Attaches mid-run, under a differently spelled topic with the same key.
+        second = asyncio.create_task(_collect(cache, "topic!", _producer(runs)))
+        third = asyncio.create_task(cache.get_or_compute("TOPIC", lambda: pytest.fail("ran twice")))
+        await asyncio.sleep(0)
+        release.set()
+        return await first, await second, await third, runs, cache
+
+    first, second, third, runs, cache = asyncio.run(scenario())
+    assert runs == [1]
+    assert [update for update, _ in first] == [update for update, _ in second]
+    assert [update["type"] for update, _ in second] == ["text", "text", "done"]
+    assert {hit for _, hit in first} == {False} and {hit for _, hit in second} == {True}
+    assert third == (first[-1][0]["result"], True)
+    assert cache.get_stats()["shared_inflight"] == 2
+    assert not cache._inflight
+    # Finished: the next caller gets the cached result alone.
+    assert asyncio.run(_collect(cache, "Topic", _producer(runs))) == [
+        ({"type": "done", "result": {"value": 1}}, True)]
+
+
+def test_run_is_cancelled_when_every_follower_leaves(tmp_path):
+    async def scenario():
+        cache = TopicCache(cache_dir=str(tmp_path))
+        runs, cancelled = [], asyncio.Event()
+
+        async def produce():
+            runs.append(1)
+            try:
+                yield {"type": "text", "text": "first"}
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        updates = cache.stream_or_follow("Topic", produce)
+        await updates.__anext__()
+        await updates.aclose()
+        await asyncio.wait_for(cancelled.wait(), timeout=5)
+        await asyncio.sleep(0)
+        assert not cache._inflight
+        # A new request starts a fresh run rather than following the abandoned one.
+        return await cache.get_or_compute("Topic", lambda: asyncio.sleep(0, {"value": 2})), runs
+
+    (result, hit), runs = asyncio.run(scenario())
+    assert result == {"value": 2} and not hit
+    assert runs == [1]
+
+
+def test_failed_run_raises_for_every_follower(tmp_path):
+    async def scenario():
+        cache = TopicCache(cache_dir=str(tmp_path))
+        release = asyncio.Event()
+
+        async def produce():
+            yield {"type": "text", "text": "first"}
+            await release.wait()
+            raise RuntimeError("model unavailable")
+
+        followers = [asyncio.create_task(_collect(cache, "Topic", produce)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        release.set()
+        return await asyncio.gather(*followers, return_exceptions=True), cache
+
+    outcomes, cache = asyncio.run(scenario())
+    assert [type(outcome) for outcome in outcomes] == [RuntimeError, RuntimeError]
+    assert cache.get(cache.key("Topic")) is None
+
+
+def test_disk_tier_keeps_the_newest_entries(tmp_path):
+    cache = TopicCache(cache_dir=str(tmp_path), max_entries=2, max_disk_entries=3)
+    for i in range(5):
+        cache.put(cache.key(f"Topic {i}"), {"value": i})
+    assert cache._db.execute("SELECT COUNT(*) FROM entries").fetchone() == (3,)
+    # A fresh process starts from disk alone.
+    reopened = TopicCache(cache_dir=str(tmp_path), max_entries=2, max_disk_entries=3)
+    assert [reopened.get(reopened.key(f"Topic {i}")) for i in range(5)] == [
+        None, None, {"value": 2}, {"value": 3}, {"value": 4}]
+    plan = " ".join(row[-1] for row in reopened._db.execute(
+        "EXPLAIN QUERY PLAN DELETE FROM entries WHERE created < 0"))
+    assert "entries_created" in plan
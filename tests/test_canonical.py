@@ -0,0 +1,63 @@
+"""Entity resolution: spelling variants merge, numbered entities stay apart."""
+import pytest
+
+from knowledge_graph_agent.canonical import EntityIndex, _numerals, normalize_entity
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Henry VIII", "Henry VII"),
+    ("Mary I of England", "Mary II of England"),
+    ("Pope John Paul I", "Pope John Paul II"),
+    ("Apollo 11", "Apollo 13"),
+    ("The 1st Infantry Division", "The 2nd Infantry Division"),
+    ("The First Crusade Army", "The Second Crusade Army"),
+])
+def test_numbered_names_stay_apart(first, second):
+    index = EntityIndex()
+    assert index.resolve(first) == first
+    assert index.resolve(second) == second
+    assert len(index) == 2
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Henry VIII", "henry viii."),
+    ("Pope John Paul II", "Pope John-Paul II"),
+    ("J.K. Rowling", "J. K. Rowling"),
+    ("Hermione Granger", "Hermione Grangers"),
+])
+def test_spelling_variants_merge(first, second):
+    index = EntityIndex()
+    index.resolve(first)
+    assert index.resolve(second) == first
+    assert len(index) == 1
+
+
+def test_numerals():
+    assert _numerals("henry viii") == [8]
+    assert _numerals("louis xiv of france") == [14]
+    assert _numerals("the 21st century") == [21]
+    assert _numerals("the third reich") == [3]
+    assert _numerals("civil war") == []
+
+
+def test_roman_numerals_only_follow_a_name():
+    assert _numerals("mix") == []
+    assert _numerals("radio mix") == []
+    assert _numerals("i robot") == []
+    assert _numerals("v for vendetta") == []
+    assert _numerals("tom and i") == []
+    assert _numerals("mary i of england") == [1]
+
+
+@pytest.mark.parametrize("names", [("C++", "C#", "C"), ("F#", "F")])
+def test_symbols_keep_languages_apart(names):
+    assert len({normalize_entity(name) for name in names}) == len(names)
+    index = EntityIndex()
+    assert [index.resolve(name) for name in names] == list(names)
+    assert len(index) == len(names)
+
+
+def test_symbols_are_dropped_elsewhere():
+    assert normalize_entity("C++ ") == normalize_entity("c++")
+    assert normalize_entity("#1 Hit") == normalize_entity("1 Hit")
+    assert normalize_entity("Romeo + Juliet") == normalize_entity("Romeo Juliet")
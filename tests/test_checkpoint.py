@@ -0,0 +1,64 @@
+"""Checkpoint journal round-trips and expiry of abandoned checkpoints."""
+import os
+import time
+
+from knowledge_graph_agent.checkpoint import CheckpointStore, TripletJournal
+
+
+def _age(directory, seconds):
+    past = time.time() - seconds
+    for name in os.listdir(directory):
+        os.utime(os.path.join(directory, name), (past, past))
+    os.utime(directory, (past, past))
+
+
+def test_journal_round_trip(tmp_path):
+    path = str(tmp_path / "triplets.journal")
+    journal = TripletJournal(path, sync_every=2)
+    batches = [[("a", "knows", "b")], [("b", "knows", "c"), ("c", "knows", "a")], [("a", "is", "d")]]
+    for batch in batches:
+        journal.append(batch)
+    journal.sync()
+    assert list(TripletJournal.read(path)) == batches
+    assert journal.syncs >= 1
+    journal.close()
+
+
+def test_journal_drops_torn_tail(tmp_path):
+    path = str(tmp_path / "triplets.journal")
+    journal = TripletJournal(path)
+    journal.append([("a", "knows", "b")])
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('[["b","kno')
+    assert list(TripletJournal.read(path)) == [[("a", "knows", "b")]]
+
+
+def test_expired_checkpoints_of_other_topics_are_swept(tmp_path):
+    root = str(tmp_path)
+    store = CheckpointStore(root, ttl_seconds=60)
+    for key in ("abandoned", "recent"):
+        checkpoint = store.open(key)
+        checkpoint.complete("ResearchAgent", "notes")
+        checkpoint.close()
+    _age(os.path.join(root, "abandoned"), 3600)
+
+    checkpoint = store.open("other")
+    assert sorted(os.listdir(root)) == ["other", "recent"]
+    checkpoint.close(keep=False)
+
+    _age(os.path.join(root, "recent"), 3600)
+    CheckpointStore(root, ttl_seconds=60)
+    assert os.listdir(root) == []
+
+
+def test_held_checkpoints_are_not_swept(tmp_path):
+    root = str(tmp_path)
+    store = CheckpointStore(root, ttl_seconds=60)
+    held = store.open("held")
+    held.complete("ResearchAgent", "notes")
+    _age(held.directory, 3600)
+    assert store.sweep() == 0
+    assert store.open("held") is None
+    assert os.path.isdir(held.directory)
+    held.close(keep=False)
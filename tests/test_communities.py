@@ -0,0 +1,30 @@
+"""Community detection and level-of-detail summaries."""
+import numpy as np
+import pytest
+
+from knowledge_graph_agent.communities import summarize
+from knowledge_graph_agent.graph_tools import KnowledgeBase
+
+
+def test_summarize_empty_graph():
+    empty = np.zeros(0, dtype=np.int64)
+    summary = summarize([], empty, empty, empty, [], [], np.zeros(0))
+    assert summary["nodes"] == [] and summary["edges"] == []
+    assert not summary["truncated"]
+    with pytest.raises(ValueError):
+        summarize([], empty, empty, empty, [], [], np.zeros(0), community="c1.0")
+
+
+def test_get_summary_empty_graph():
+    summary = KnowledgeBase().get_summary()
+    assert summary["nodes"] == [] and summary["edges"] == []
+    assert summary["version"] == 0
+
+
+def test_get_summary_fits_budget():
+    kb = KnowledgeBase()
+    kb.add_triplets([(f"Entity {i}", "related_to", f"Entity {(i * 7 + 1) % 300}") for i in range(300)])
+    summary = kb.get_summary(max_nodes=20, max_edges=30)
+    assert 0 < len(summary["nodes"]) <= 20
+    assert len(summary["edges"]) <= 30
+    assert sum(node["size"] for node in summary["nodes"]) == kb.num_nodes()
@@ -0,0 +1,63 @@
+"""The persistent corpus graph: merging runs, provenance and paged-in subgraphs."""
+import pytest
+
+from knowledge_graph_agent.corpus import CorpusStore
+from knowledge_graph_agent.graph_queries import UnknownEntityError
+from knowledge_graph_agent.graph_tools import KnowledgeBase
+
+
+def _kb(triplets):
+    kb = KnowledgeBase()
+    kb.add_triplets(triplets)
+    return kb
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    store = CorpusStore(str(tmp_path / "corpus.sqlite3"), batch_size=2)
+    yield store
+    store.close()
+
+
+def test_runs_merge_by_normalized_name(corpus):
+    first = corpus.merge(_kb([("Harry Potter", "friend of", "Ron Weasley"),
+                              ("Harry Potter", "attends", "Hogwarts")]), "run-1", "Harry Potter")
+    second = corpus.merge(_kb([("harry potter", "friend of", "Ron Weasley"),
+                               ("Ron Weasley", "attends", "Hogwarts")]), "run-2", "Ron Weasley")
+    assert (first["new_triples"], second["new_triples"]) == (2, 1)
+    stats = corpus.get_stats()
+    assert (stats["nodes"], stats["triples"], stats["runs"]) == (3, 3, 2)
+
+    # Merging a run again changes nothing.
+    assert corpus.merge(_kb([("Ron Weasley", "attends", "Hogwarts")]), "run-2", "Ron Weasley")["new_triples"] == 0
+    assert corpus.get_stats()["triples"] == 3
+
+
+def test_symbols_keep_entities_apart(corpus):
+    corpus.merge(_kb([("C++", "influenced", "C#"), ("C", "influenced", "C++")]), "run-1", "Languages")
+    assert corpus.get_stats()["nodes"] == 3
+
+
+def test_provenance_lists_every_run(corpus):
+    corpus.merge(_kb([("Harry Potter", "friend of", "Ron Weasley")]), "run-1", "Harry Potter")
+    corpus.merge(_kb([("Harry Potter", "friend of", "Ron Weasley"),
+                      ("Harry Potter", "attends", "Hogwarts")]), "run-2", "Hogwarts")
+    found = corpus.provenance(subject="harry potter", predicate="friend of")
+    [triplet] = found["triplets"]
+    assert (triplet["subject"], triplet["object"]) == ("Harry Potter", "Ron Weasley")
+    assert sorted(source["topic"] for source in triplet["sources"]) == ["Harry Potter", "Hogwarts"]
+    assert len(corpus.provenance(subject="Harry Potter")["triplets"]) == 2
+    assert corpus.provenance(limit=1)["truncated"]
+    with pytest.raises(UnknownEntityError):
+        corpus.provenance(subject="Voldemort")
+
+
+def test_subgraph_pages_in_a_bounded_neighbourhood(corpus):
+    corpus.merge(_kb([(f"Entity {i}", "next", f"Entity {i + 1}") for i in range(20)]), "run-1", "Chain")
+    kb = corpus.load_subgraph("entity 5", hops=2)
+    assert set(kb.store.nodes()) == {f"Entity {i}" for i in range(3, 8)}
+    assert kb.num_edges() == 4
+    bounded = corpus.load_subgraph("Entity 5", hops=5, max_nodes=4, max_edges=2)
+    assert bounded.num_nodes() == 4 and bounded.num_edges() == 2
+    with pytest.raises(UnknownEntityError):
+        corpus.load_subgraph("Entity 99")
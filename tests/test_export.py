@@ -0,0 +1,61 @@
+"""Graph exports and their content negotiation."""
+import json
+
+import pytest
+
+from knowledge_graph_agent import export
+from knowledge_graph_agent.graph_tools import create_kb, release_kb, retain_kb
+from tests.test_server import _requests
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, "json"),
+    ("*/*", "json"),
+    ("application/x-ndjson", "ndjson"),
+    ("application/graphml+xml;q=0.5, application/vnd.kg.compact+json", "compact"),
+    ("text/html, application/*;q=0.1", "json"),
+])
+def test_negotiate(accept, expected):
+    assert export.negotiate(accept) == expected
+
+
+def test_negotiate_rejects_what_it_cannot_serve():
+    assert export.negotiate("text/html", format="graphml") == "graphml"
+    with pytest.raises(export.UnsupportedFormatError):
+        export.negotiate("text/html")
+    with pytest.raises(export.UnsupportedFormatError):
+        export.negotiate("application/json;q=0")
+    with pytest.raises(export.UnsupportedFormatError):
+        export.negotiate(None, format="csv")
+
+
+def test_export_endpoint():
+    kb = create_kb("test-export")
+    kb.add_triplets([("Ada", "knows", "Bob"), ("Bob", "knows", "Cy")])
+    retain_kb("test-export")
+    url = "/graphs/test-export/export"
+    try:
+        default, ndjson, compact, columnar, gzipped, bad_format, unacceptable = _requests(
+            lambda client: client.get(url),
+            lambda client: client.get(url, headers={"Accept": "application/x-ndjson"}),
+            lambda client: client.get(url, params={"format": "compact"}, headers={"Accept": "application/json"}),
+            lambda client: client.get(url, params={"format": "columnar"}),
+            lambda client: client.get(url, headers={"Accept-Encoding": "gzip"}),
+            lambda client: client.get(url, params={"format": "csv"}),
+            lambda client: client.get(url, headers={"Accept": "text/html"}),
+        )
+    finally:
+        release_kb("test-export")
+
+    assert default.headers["content-type"] == "application/json"
+    assert default.json() == kb.get_state()
+    assert "Accept" in default.headers["vary"]
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert all(json.loads(line) for line in ndjson.text.splitlines())
+    assert compact.headers["content-type"] == export.FORMATS["compact"]
+    assert export.from_compact(compact.json())["edges"] == kb.get_state()["edges"]
+    assert columnar.headers["content-disposition"].endswith('.npz"')
+    assert export.from_compact(export.read_columnar(columnar.content))["edges"] == kb.get_state()["edges"]
+    assert gzipped.headers["content-encoding"] == "gzip" and gzipped.json() == kb.get_state()
+    assert bad_format.status_code == 400
+    assert unacceptable.status_code == 406
@@ -0,0 +1,29 @@
+"""Bounded graph queries: neighbourhoods report truncation only when something was left out."""
+from knowledge_graph_agent import graph_queries
+from knowledge_graph_agent.graph_tools import KnowledgeBase
+
+
+def _star(leaves):
+    kb = KnowledgeBase()
+    kb.add_triplets([("Hub", "links", f"Leaf {i}") for i in range(leaves)])
+    return kb
+
+
+def test_whole_neighbourhood_is_not_truncated():
+    # Exactly max_nodes nodes in reach: nothing is skipped.
+    result = graph_queries.neighborhood(_star(4), "Hub", hops=2, max_nodes=5)
+    assert len(result["nodes"]) == 5 and len(result["edges"]) == 4
+    assert not result["truncated"]
+
+
+def test_node_budget_truncates():
+    result = graph_queries.neighborhood(_star(6), "Hub", hops=1, max_nodes=5)
+    assert len(result["nodes"]) == 5
+    assert result["truncated"]
+
+
+def test_edge_budget_truncates_only_when_an_edge_is_left_out():
+    kb = _star(4)
+    assert not graph_queries.neighborhood(kb, "Hub", max_edges=4)["truncated"]
+    cut = graph_queries.neighborhood(kb, "Hub", max_edges=3)
+    assert len(cut["edges"]) == 3 and cut["truncated"]
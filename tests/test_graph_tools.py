@@ -0,0 +1,88 @@
+"""KnowledgeBase snapshots that are computed on demand and cached per graph version, and the triplet tools."""
+from types import SimpleNamespace
+
+import pytest
+
+from knowledge_graph_agent import graph_tools
+from knowledge_graph_agent.graph_tools import KnowledgeBase
+from knowledge_graph_agent.layout import LAYOUT_MODES
+
+
+def _kb():
+    kb = KnowledgeBase()
+    kb.add_triplets([(f"Entity {i}", "related_to", f"Entity {(i * 3 + 1) % 40}") for i in range(40)])
+    return kb
+
+
+def test_layout_is_cached_per_version():
+    kb = _kb()
+    first = kb.compute_layout("force")
+    assert set(first) == set(kb.store.nodes())
+    assert kb.compute_layout("force") is first
+
+    kb.add_triplet("Entity 0", "part_of", "Newcomer")
+    second = kb.get_layout("force")
+    assert second["version"] == kb.version
+    assert set(second["positions"]) == set(kb.store.nodes())
+    with pytest.raises(ValueError):
+        kb.get_layout("circular")
+
+
+def test_state_has_no_layout_or_importance_unless_asked():
+    kb = _kb()
+    assert set(kb.get_state()) == {"nodes", "edges"}
+    assert not kb.positions
+
+    state = kb.get_state(include_positions=True, include_importance=True)
+    assert set(state["positions"]) == set(LAYOUT_MODES)
+    assert set(state["node_importance"]) == set(kb.store.nodes())
+
+
+def test_importance_ranks_edges():
+    kb = _kb()
+    top = kb.get_importance(limit=5)
+    assert len(top["edges"]) == 5
+    scores = [edge["importance"] for edge in kb.get_importance()["edges"]]
+    assert scores == sorted(scores, reverse=True)
+    assert top["edges"] == kb.get_importance()["edges"][:5]
+
+
+def test_add_triplets_counts_only_new_triplets():
+    context = SimpleNamespace(state={}, session=SimpleNamespace(id="test-add-triplets"))
+    try:
+        graph_tools.add_triplets([{"subject": "Ada", "predicate": "knows", "object": "Bob"}], context)
+        result = graph_tools.add_triplets([
+            {"subject": "ada", "predicate": "knows", "object": "Bob"},
+            {"subject": "Bob", "predicate": "knows", "object": "Cy"},
+            {"subject": "Bob", "predicate": "knows", "object": "Cy"},
+            {"subject": "Bob", "predicate": "knows"},
+        ], context)
+    finally:
+        graph_tools.release_kb("test-add-triplets")
+    assert (result["added"], result["duplicates"]) == (1, 2)
+    assert [outcome["status"] for outcome in result["results"]] == ["duplicate", "success", "duplicate", "error"]
+    assert result["results"][0]["triplet"] == {"subject": "Ada", "predicate": "knows", "object": "Bob"}
+
+
+def test_add_triplet_reports_duplicates():
+    context = SimpleNamespace(state={}, session=SimpleNamespace(id="test-add-triplet"))
+    try:
+        first = graph_tools.add_triplet("Ada", "knows", "Bob", context)
+        again = graph_tools.add_triplet("ada", "knows", "bob", context)
+    finally:
+        graph_tools.release_kb("test-add-triplet")
+    assert (first["status"], again["status"]) == ("success", "duplicate")
+    assert again["triplet"] == first["triplet"] == {"subject": "Ada", "predicate": "knows", "object": "Bob"}
+
+
+def test_snapshot_built_across_a_change_is_not_cached():
+    kb = _kb()
+
+    def build():
+        kb.add_triplet("Entity 1", "part_of", "Latecomer")
+        return {"nodes": 40}
+
+    assert kb._snapshot("test", build) == {"nodes": 40}
+    assert "test" not in kb._snapshots
+    assert kb._snapshot("test", lambda: {"nodes": 41}) == {"nodes": 41}
+    assert kb._snapshots["test"] == (kb.version, {"nodes": 41})
@@ -0,0 +1,46 @@
+"""Node and edge importance scores."""
+import networkx as nx
+import numpy as np
+import pytest
+
+from knowledge_graph_agent.importance import compute_importance, pagerank, sampled_betweenness
+
+
+def test_pagerank_is_the_stationary_distribution():
+    edges = [(0, 1), (1, 2), (2, 0), (2, 3), (3, 4)]  # node 4 is dangling
+    src, dst = np.array([u for u, _ in edges]), np.array([v for _, v in edges])
+    rank = pagerank(5, src, dst, tol=1e-12)
+    assert rank.sum() == pytest.approx(1.0)
+    # One more step of the random surfer (dangling mass spread evenly) changes nothing.
+    out_degree = np.bincount(src, minlength=5)
+    step = np.full(5, 0.15 / 5) + 0.85 * rank[4] / 5
+    for u, v in edges:
+        step[v] += 0.85 * rank[u] / out_degree[u]
+    assert step == pytest.approx(rank, abs=1e-9)
+
+
+def test_exact_betweenness_when_every_node_is_sampled():
+    edges = [(0, 1), (1, 2), (2, 3), (1, 4)]
+    nodes, edge_scores = sampled_betweenness(5, edges, samples=5)
+    expected = nx.betweenness_centrality(nx.Graph(edges), normalized=False)
+    assert list(nodes) == pytest.approx([expected[i] for i in range(5)])
+    expected_edges = nx.edge_betweenness_centrality(nx.Graph(edges), normalized=False)
+    assert edge_scores == pytest.approx({tuple(sorted(e)): v for e, v in expected_edges.items()})
+
+
+def test_bridges_outrank_leaves():
+    # Two triangles joined through "Bridge".
+    edges = [("A", "B"), ("B", "C"), ("C", "A"), ("C", "Bridge"), ("Bridge", "D"),
+             ("D", "E"), ("E", "F"), ("F", "D")]
+    nodes = sorted({node for edge in edges for node in edge})
+    result = compute_importance(nodes, edges)
+    scores = {node: values["score"] for node, values in result["nodes"].items()}
+    assert max(scores, key=scores.get) in ("C", "Bridge", "D")
+    assert scores["Bridge"] > scores["A"]
+    assert max(scores.values()) <= 1.0
+    edge_scores = dict(zip(edges, result["edges"]))
+    assert edge_scores[("C", "Bridge")] > edge_scores[("A", "B")]
+
+
+def test_empty_graph():
+    assert compute_importance([], []) == {"nodes": {}, "edges": []}
@@ -0,0 +1,56 @@
+"""The bounded /jobs queue."""
+import asyncio
+
+import pytest
+
+from knowledge_graph_agent.jobs import JobQueue, QueueFullError
+
+
+def test_cancelled_jobs_free_their_slots():
+    async def scenario():
+        # No workers, so submitted jobs stay queued.
+        jobs = JobQueue(workers=0, max_queued=2)
+        jobs.start()
+        first, second = jobs.submit("first"), jobs.submit("second")
+        with pytest.raises(QueueFullError):
+            jobs.submit("third")
+
+        assert jobs.cancel(first.id).status == "cancelled"
+        assert jobs.get_stats()["queue_depth"] == 1
+        third = jobs.submit("third")
+        with pytest.raises(QueueFullError):
+            jobs.submit("fourth")
+
+        # Cancelling twice, or after the job is done, changes nothing.
+        assert jobs.cancel(first.id).status == "cancelled"
+        assert jobs.get_stats()["queue_depth"] == 2
+        assert [job.status for job in (second, third)] == ["queued", "queued"]
+        await jobs.stop()
+
+    asyncio.run(scenario())
+
+
+def test_worker_skips_jobs_cancelled_while_queued(monkeypatch):
+    ran = []
+
+    async def fake_run(self, job):
+        ran.append(job.topic)
+        job.status = "succeeded"
+
+    monkeypatch.setattr(JobQueue, "_run", fake_run)
+
+    async def scenario():
+        jobs = JobQueue(workers=1, max_queued=4)
+        jobs.start()
+        first, second, third = jobs.submit("first"), jobs.submit("second"), jobs.submit("third")
+        jobs.cancel(second.id)
+        for _ in range(10):
+            await asyncio.sleep(0)
+        stats = jobs.get_stats()
+        await jobs.stop()
+        return [job.status for job in (first, second, third)], stats
+
+    statuses, stats = asyncio.run(scenario())
+    assert ran == ["first", "third"]
+    assert statuses == ["succeeded", "cancelled", "succeeded"]
+    assert stats["queue_depth"] == 0
@@ -0,0 +1,89 @@
+"""Pipeline runs through main.py against the synthetic replay model."""
+import asyncio
+from types import SimpleNamespace
+
+from knowledge_graph_agent import main
+from knowledge_graph_agent.architect import fanout_architect
+from knowledge_graph_agent.graph_tools import find_graph
+from knowledge_graph_agent.main import run_agent, stream_agent
+
+
+def test_concurrent_runs_are_isolated():
+    topics = ["Solar System", "Roman Empire", "Jazz Music", "Plate Tectonics"]
+
+    async def run_all():
+        return await asyncio.gather(*(run_agent(topic, use_cache=False) for topic in topics))
+
+    results = asyncio.run(run_all())
+    assert len({result["graph_id"] for result in results}) == len(topics)
+    node_sets = []
+    for topic, result in zip(topics, results):
+        # Synthetic research names every entity after the topic it was asked about.
+        prefix = f"{topic.title()} Entity "
+        state = result["graph_state"]
+        nodes = set(state["nodes"])
+        assert nodes and all(node.startswith(prefix) for node in nodes)
+        assert state["edges"]
+        for edge in state["edges"]:
+            assert edge["source"] in nodes and edge["target"] in nodes
+        # The graph kept for the /graphs API is the same one, not a shared one.
+        kept = find_graph(result["graph_id"]).get_state()
+        assert set(kept["nodes"]) == nodes
+        assert len(kept["edges"]) == len(state["edges"])
+        node_sets.append(nodes)
+    for i, nodes in enumerate(node_sets):
+        for other in node_sets[i + 1:]:
+            assert not nodes & other
+
+
+def test_concurrent_streams_share_one_pipeline_run(monkeypatch):
+    runs = []
+    pipeline = main._stream_pipeline
+
+    def counted(topic, user_id):
+        runs.append(topic)
+        return pipeline(topic, user_id)
+
+    monkeypatch.setattr(main, "_stream_pipeline", counted)
+
+    async def collect():
+        return [update async for update in stream_agent("Single Flight Streams")]
+
+    async def run_all():
+        first = asyncio.create_task(collect())
+        await asyncio.sleep(0.05)  # the second request arrives mid-run
+        return await asyncio.gather(first, collect(), run_agent("single flight streams"))
+
+    first, second, result = asyncio.run(run_all())
+    assert runs == ["Single Flight Streams"]
+    # The late stream replays every update it missed.
+    assert [u for u in first if u["type"] == "triplet"] == [u for u in second if u["type"] == "triplet"]
+    done = [stream[-1]["result"] for stream in (first, second)] + [result]
+    assert len({r["graph_id"] for r in done}) == 1
+    assert [r["stats"]["cache"]["hit"] for r in done] == [False, True, True]
+
+
+def test_only_inserted_triplets_are_streamed():
+    triplet = {"subject": "Ada", "predicate": "knows", "object": "Bob"}
+    single = SimpleNamespace(name="add_triplet", args={"subject": "ada", "predicate": "knows", "object_": "Bob"})
+    batch = SimpleNamespace(name="add_triplets", args={})
+    assert list(main._landed_triplets(single, {"status": "success", "triplet": triplet})) == [triplet]
+    assert list(main._landed_triplets(single, {"status": "duplicate", "triplet": triplet})) == []
+    assert list(main._landed_triplets(single, {"error": "Tool failed"})) == []
+    results = [{"status": "success", "triplet": triplet}, {"status": "duplicate", "triplet": triplet},
+               {"status": "error", "message": "Missing object"}]
+    assert list(main._landed_triplets(batch, {"added": 1, "results": results})) == [triplet]
+
+
+def test_fanout_pipeline(monkeypatch):
+    monkeypatch.setattr(main, "runner", main.runtime.runner(fanout_architect, main.APP_NAME))
+    result = asyncio.run(run_agent("Volcanoes", use_cache=False))
+    agents = result["stats"]["timings"]["agents"]
+    researchers = [name for name in agents if name.startswith("ResearchAgent_")]
+    assert len(researchers) == fanout_architect.max_subtopics
+    assert any(name.startswith("ChunkOntologyAgent_") for name in agents)
+    nodes, edges = result["graph_state"]["nodes"], result["graph_state"]["edges"]
+    # Every sub-topic's research made it into the one graph.
+    assert {node.split(" Entity ")[0] for node in nodes} >= {f"Volcanoes Aspect {i}" for i in range(len(researchers))}
+    assert len(edges) == result["stats"]["total_triplets_added"]
+    assert result["image"] is not None
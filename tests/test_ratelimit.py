@@ -0,0 +1,75 @@
+"""Admission control for model calls: rate, concurrency and cancellation."""
+import asyncio
+import time
+
+import pytest
+from google.genai.errors import APIError
+
+from knowledge_graph_agent.ratelimit import ModelRateLimiter
+
+
+def test_rpm_paces_calls_after_the_burst():
+    async def scenario():
+        limiter = ModelRateLimiter(rpm=600, burst=2)  # a token every 0.1 s
+        started = time.monotonic()
+        for _ in range(4):
+            await limiter.acquire()
+            limiter.release("ok", 0.0)
+        return time.monotonic() - started
+
+    assert 0.18 <= asyncio.run(scenario()) < 1.0
+
+
+def test_cancelled_while_waiting_for_a_token_frees_the_slot():
+    async def scenario():
+        limiter = ModelRateLimiter(rpm=60, burst=1, max_concurrency=1)
+        await limiter.acquire()
+        limiter.release("ok", 0.0)
+        waiting = asyncio.create_task(limiter.acquire())  # the bucket is empty for a second
+        await asyncio.sleep(0.05)
+        assert limiter.in_flight == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert limiter.in_flight == 0
+        # The next caller gets the slot (and only waits for the rate).
+        limiter.rpm = 0
+        await asyncio.wait_for(limiter.acquire(), 1)
+        assert limiter.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_while_queued_for_a_slot_does_not_take_one():
+    async def scenario():
+        limiter = ModelRateLimiter(max_concurrency=1)
+        await limiter.acquire()
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        limiter.release("ok", 0.0)
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_throttled_calls_are_retried_under_the_limiter():
+    async def scenario():
+        limiter = ModelRateLimiter(base_backoff_s=0.01, max_backoff_s=0.01, attempts=3, seed=0)
+        calls = []
+
+        async def respond():
+            calls.append(1)
+            if len(calls) == 1:
+                raise APIError(429, {"error": {"code": 429, "message": "Resource exhausted"}})
+            yield "ok"
+
+        items = [item async for item in limiter.call(respond)]
+        return items, len(calls), limiter
+
+    items, calls, limiter = asyncio.run(scenario())
+    assert items == ["ok"] and calls == 2
+    assert limiter.stats["throttled"] == 1 and limiter.stats["retries"] == 1
+    assert limiter.in_flight == 0
@@ -0,0 +1,22 @@
+"""A run killed mid-ontology resumes from its checkpoint (see checkpoint.py)."""
+import pytest
+
+from knowledge_graph_agent import bench
+
+
+@pytest.mark.slow
+def test_killed_run_resumes_from_checkpoint():
+    runs = bench.recovery_runs("Recovery test topic")
+    cold, resumed = runs["cold"], runs["resumed"]
+    assert runs["killed_after_seconds"] is not None, "the run finished before it could be killed"
+
+    checkpoint = resumed["stats"]["checkpoint"]
+    assert checkpoint["resumed_stages"] == ["ResearchAgent"]
+    assert checkpoint["replayed_triplets"] > 0
+    # Checkpointed stages are skipped, the rest run again.
+    ran = set(resumed["stats"]["timings"]["agents"])
+    assert not ran & set(checkpoint["resumed_stages"])
+    assert {"OntologyAgent", "VisualizationAgent"} <= ran
+    assert resumed["stats"]["timings"]["model"]["calls"] < cold["stats"]["timings"]["model"]["calls"]
+    # And it ends with the same graph as a run that was never interrupted.
+    assert resumed["edges"] == cold["edges"]
@@ -0,0 +1,48 @@
+"""Entity and predicate search over a graph's names and aliases."""
+import pytest
+
+from knowledge_graph_agent.graph_tools import KnowledgeBase
+from knowledge_graph_agent.search import SearchIndex
+
+
+def _names(found):
+    return [result["name"] for result in found["results"]]
+
+
+def test_ranking_tiers():
+    index = SearchIndex()
+    for name in ("Harry Potter", "Harry", "Prince Harry", "Dirty Harry Callahan"):
+        index.add_entity(name)
+    assert _names(index.search("harry")) == ["Harry", "Harry Potter", "Prince Harry", "Dirty Harry Callahan"]
+    # The last word matches as a prefix.
+    assert _names(index.search("harry pot")) == ["Harry Potter"]
+
+
+def test_aliases_count_once_before_the_early_stop():
+    index = SearchIndex()
+    index.add_entity("Foo Bar")
+    for alias in ("Foo Baz", "Foo Qux", "Foo Quux"):
+        index.add_entity("Foo Bar", alias=alias)
+    index.add_entity("Big Foo")
+    found = index.search("foo", limit=2)
+    assert _names(found) == ["Foo Bar", "Big Foo"]
+    assert not found["truncated"]
+
+
+def test_kind_filter_and_degree():
+    kb = KnowledgeBase()
+    kb.add_triplets([("Marie Curie", "won", "Nobel Prize"), ("Pierre Curie", "won", "Nobel Prize"),
+                     ("Marie Curie", "married", "Pierre Curie"), ("Marie Curie", "worked with", "Radium")])
+    assert _names(kb.search("curie", kind="entity")) == ["Marie Curie", "Pierre Curie"]
+    predicates = kb.search("w", kind="predicate")["results"]
+    assert [(result["name"], result["triplets"]) for result in predicates] == [("won", 2), ("worked with", 1)]
+    with pytest.raises(ValueError):
+        kb.search("curie", kind="place")
+
+
+def test_scan_budget_truncates():
+    index = SearchIndex()
+    for i in range(50):
+        index.add_entity(f"Entity {i}")
+    found = index.search("entity", limit=100, max_scan=10)
+    assert found["truncated"] and len(found["results"]) == 10
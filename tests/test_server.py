@@ -0,0 +1,69 @@
+"""The HTTP API, in process."""
+import asyncio
+
+import httpx
+
+from knowledge_graph_agent.graph_tools import create_kb, find_graph, release_kb, retain_kb
+from knowledge_graph_agent.server import app
+
+
+def _requests(*calls):
+    """Runs `calls` (coroutine functions taking the client) in order and returns their responses."""
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+            return [await call(client) for call in calls]
+    return asyncio.run(run())
+
+
+def test_layout_and_importance_are_computed_on_request():
+    [generated] = _requests(lambda client: client.post("/generate", json={"topic": "Lazy layout topic"}))
+    generated.raise_for_status()
+    result = generated.json()
+    assert "positions" not in result["graph_state"] and "node_importance" not in result["graph_state"]
+    assert "layout" not in result["stats"]["timings"]
+    graph_id, nodes = result["graph_id"], set(result["graph_state"]["nodes"])
+    kb = find_graph(graph_id)
+    assert not kb.positions
+
+    base = f"/graphs/{graph_id}"
+    force, again, hierarchical, importance, unknown, missing = _requests(
+        lambda client: client.get(f"{base}/layout"),
+        lambda client: client.get(f"{base}/layout", params={"mode": "force"}),
+        lambda client: client.get(f"{base}/layout", params={"mode": "hierarchical"}),
+        lambda client: client.get(f"{base}/importance", params={"limit": 3}),
+        lambda client: client.get(f"{base}/layout", params={"mode": "circular"}),
+        lambda client: client.get("/graphs/nope/layout"),
+    )
+    assert set(force.json()["positions"]) == nodes
+    assert again.json() == force.json()
+    assert set(hierarchical.json()["positions"]) == nodes
+    # Computed once per graph version, then served from the snapshot cache.
+    assert kb._snapshots["layout:force"][0] == kb.version
+    assert len(importance.json()["edges"]) == 3
+    assert set(importance.json()["nodes"]) == nodes
+    assert unknown.status_code == 400
+    assert missing.status_code == 404
+
+
+def test_threaded_queries_wait_for_the_graph_to_finish():
+    kb = create_kb("test-running-graph")
+    kb.add_triplets([(f"Entity {i}", "related_to", f"Entity {i + 1}") for i in range(10)])
+    base = "/graphs/test-running-graph"
+    try:
+        layout, importance, summary, export, ego = _requests(
+            lambda client: client.get(f"{base}/layout"),
+            lambda client: client.get(f"{base}/importance"),
+            lambda client: client.get(f"{base}/summary"),
+            lambda client: client.get(f"{base}/export"),
+            lambda client: client.get(f"{base}/ego", params={"node": "Entity 0"}),
+        )
+        assert [r.status_code for r in (layout, importance, summary, export)] == [409] * 4
+        # Queries answered on the event loop may read a running graph.
+        assert ego.status_code == 200
+
+        retain_kb("test-running-graph")
+        [layout] = _requests(lambda client: client.get(f"{base}/layout"))
+        assert layout.status_code == 200
+    finally:
+        release_kb("test-running-graph")
@@ -0,0 +1,21 @@
+"""Sequential /generate requests must not grow the process without bound."""
+import pytest
+
+from knowledge_graph_agent import bench, graph_tools
+from knowledge_graph_agent.main import runtime, topic_cache
+
+# Resident memory may grow by this much between the first sample (once the
+# retention caps are full) and the last one.
+MAX_RSS_GROWTH_MB = 8.0
+
+
+@pytest.mark.slow
+def test_soak_memory_is_bounded():
+    soak, _ = bench.bench_soak(requests=80, sample_every=20)
+    metrics = soak["metrics"]
+    assert metrics["rss_growth_mb"] < MAX_RSS_GROWTH_MB, metrics
+    # Per-run state is either released or held within its cap.
+    assert metrics["sessions_retained"] <= runtime.session_service.max_sessions
+    assert len(graph_tools._finished_graphs) <= graph_tools.GRAPH_RETENTION
+    assert not graph_tools._knowledge_bases
+    assert topic_cache.get_stats()["memory_entries"] <= topic_cache.max_entries